@@ -0,0 +1,70 @@
+"""
+Single-loop asyncio runtime (python -m app.main --asyncio).
+
+Runs the controller, the LED renderer and the motor scheduler as coroutines
+on one event loop instead of their threads. GPIO edge callbacks still fire on
+the GPIO library's thread; events.notify() hands them to the loop with
+loop.call_soon_threadsafe. Audio fades and memory-mapped playback are stepped
+by the controller tick, which already sleeps only until their next deadline.
+
+A monitor coroutine measures loop lag: how late a timer fires compared to
+when it was due, the delay any of the coroutines sees on top of its own.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+from . import config, events, metrics, motors
+
+# Recent loop lag samples in seconds
+loop_lags = deque(maxlen=1000)
+
+def get_loop_lag_ms() -> tuple[float, float] | None:
+    """Returns the (mean, max) loop lag in ms over the recent samples, or None if no samples yet."""
+    samples = list(loop_lags)
+    if not samples:
+        return None
+    return (sum(samples) / len(samples) * 1000.0, max(samples) * 1000.0)
+
+async def _monitor_lag(interval_s: float, report_s: float):
+    """Sleeps for fixed intervals and records how late each wake-up is."""
+    last_report = time.monotonic()
+    while True:
+        expected = time.monotonic() + interval_s
+        await asyncio.sleep(interval_s)
+        now = time.monotonic()
+        lag = max(0.0, now - expected)
+        loop_lags.append(lag)
+        metrics.loop_lag_seconds.observe(lag)
+        if now - last_report >= report_s:
+            last_report = now
+            mean_ms, max_ms = get_loop_lag_ms()
+            logging.info(f"Event loop lag: mean {mean_ms:.2f} ms, max {max_ms:.2f} ms.")
+
+async def _run_controller(controller):
+    """The main loop: a tick, then sleep until an edge or the next deadline."""
+    while True:
+        controller.update()
+        await events.wait_async(controller.next_timeout())
+
+async def run(controller, led):
+    """Runs the service on the current event loop until cancelled (e.g. Ctrl+C)."""
+    events.attach_loop(asyncio.get_running_loop())
+    tasks = [
+        asyncio.create_task(_run_controller(controller), name="controller"),
+        asyncio.create_task(led.run_async(), name="led"),
+        asyncio.create_task(motors.run_scheduler_async(), name="motors"),
+        asyncio.create_task(_monitor_lag(config.LOOP_LAG_INTERVAL_S, config.LOOP_LAG_REPORT_S), name="loop-lag"),
+    ]
+    logging.info("Starting asyncio runtime.")
+    try:
+        # The first task to fail takes the others down with it
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        events.detach_loop()
@@ -0,0 +1,408 @@
+"""
+Visitor analytics: what the controller did, stored for later analysis.
+
+The controller records activations, dwell completions and cancels, switches,
+departures and intro starts/skips with record(), which only appends a tuple
+to an in-memory queue. A background thread writes the queue every
+ANALYTICS_FLUSH_S to append-only segment files in ANALYTICS_DIR, and every
+ANALYTICS_ROLLUP_S rolls the new records up into per-hour, per-station
+tables in a small SQLite database (ANALYTICS_DB).
+
+Segment format: a 16-byte header ('<8sHH4x': MAGIC, version, record size),
+then 16-byte records packed as '<dBbbxf':
+
+    time     wall-clock time (time.time()): rollups are by calendar hour
+    kind     one of the EVENT_* constants below
+    station  0-based station index, or -1
+    other    the previous station of a switch, or -1
+    value    seconds: how long the visitor had been there, or into the intro
+
+Records have a fixed width, so a segment can be memory-mapped and read at
+any record boundary; a record cut short by a power loss is dropped. A new
+segment is started past ANALYTICS_SEGMENT_MAX_BYTES, and the oldest ones
+are deleted past ANALYTICS_KEEP_SEGMENTS once they are rolled up.
+
+Tables of the rollup database (stations are 1-based, as in the logs and
+metrics; `hour` is the Unix time of the start of the hour, UTC):
+
+    station_hour     activations, dwell completions/cancels, switches in,
+                     visits and seconds visited per station
+    completion_rate  view: dwell completions / (completions + cancels)
+    dwell_histogram  visit durations, bucketed by ANALYTICS_DWELL_BUCKETS_S
+    switch_matrix    switches from one station to another
+    intro_hour       intro starts and skips
+
+Print a summary with `python -m app.analytics`, or dump a segment with
+`python -m app.analytics --dump PATH`.
+"""
+import os
+import sys
+import mmap
+import time
+import bisect
+import struct
+import logging
+import argparse
+import threading
+from pathlib import Path
+from collections import deque
+from typing import NamedTuple
+
+from . import config
+
+MAGIC = b'DOMEANA1'
+VERSION = 1
+_HEADER = struct.Struct('<8sHH4x')
+_RECORD = struct.Struct('<dBbbxf')
+
+EVENT_ACTIVATION = 1   # A station started for a visitor
+EVENT_DWELL = 2        # A visitor stayed for the station's dwell time
+EVENT_CANCEL = 3       # A pending switch was canceled
+EVENT_SWITCH = 4       # The audio switched to another station
+EVENT_LEAVE = 5        # A visitor left a station
+EVENT_INTRO = 6        # The intro started
+EVENT_INTRO_SKIP = 7   # The intro was skipped
+
+EVENT_NAMES = {
+    EVENT_ACTIVATION: 'activation', EVENT_DWELL: 'dwell', EVENT_CANCEL: 'cancel',
+    EVENT_SWITCH: 'switch', EVENT_LEAVE: 'leave', EVENT_INTRO: 'intro', EVENT_INTRO_SKIP: 'intro_skip',
+}
+
+# Bounded, so a stalled writer cannot grow memory without limit
+_QUEUE_MAX = 65536
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS station_hour (
+    hour INTEGER NOT NULL,
+    station INTEGER NOT NULL,
+    activations INTEGER NOT NULL DEFAULT 0,
+    dwell_completions INTEGER NOT NULL DEFAULT 0,
+    dwell_cancels INTEGER NOT NULL DEFAULT 0,
+    switches_in INTEGER NOT NULL DEFAULT 0,
+    visits INTEGER NOT NULL DEFAULT 0,
+    visit_seconds REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, station)
+);
+CREATE TABLE IF NOT EXISTS dwell_histogram (
+    hour INTEGER NOT NULL,
+    station INTEGER NOT NULL,
+    le REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (hour, station, le)
+);
+CREATE TABLE IF NOT EXISTS switch_matrix (
+    hour INTEGER NOT NULL,
+    from_station INTEGER NOT NULL,
+    to_station INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (hour, from_station, to_station)
+);
+CREATE TABLE IF NOT EXISTS intro_hour (
+    hour INTEGER PRIMARY KEY,
+    starts INTEGER NOT NULL DEFAULT 0,
+    skips INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS rollup_progress (
+    segment TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL
+);
+CREATE VIEW IF NOT EXISTS completion_rate AS
+    SELECT hour, station, dwell_completions, dwell_cancels,
+           CAST(dwell_completions AS REAL) / NULLIF(dwell_completions + dwell_cancels, 0) AS rate
+    FROM station_hour;
+"""
+
+class Event(NamedTuple):
+    time: float
+    kind: int
+    station: int | None
+    other: int | None
+    value: float
+
+_pending = None  # deque of event tuples while the writer runs
+_thread = None
+_stop = threading.Event()
+
+# --- Recording (control loop) ---
+
+def record(kind: int, station: int | None = None, other: int | None = None, value: float = 0.0):
+    """Queues an event. Costs an in-memory append; a no-op unless start() was called."""
+    if _pending is not None:
+        _pending.append((time.time(), kind, -1 if station is None else station,
+                         -1 if other is None else other, value))
+
+# --- Segments ---
+
+def _segments(directory) -> list[Path]:
+    """Returns the segment files, oldest first (their names sort by creation time)."""
+    return sorted(Path(directory).glob('events-*.bin'))
+
+def _new_segment(directory) -> Path:
+    path = Path(directory) / time.strftime('events-%Y%m%dT%H%M%S.bin')
+    n = 1
+    while path.exists():
+        n += 1
+        path = Path(directory) / time.strftime(f'events-%Y%m%dT%H%M%S-{n}.bin')
+    return path
+
+class _SegmentWriter:
+    """Appends records to the newest segment, starting a new one past max_bytes."""
+
+    def __init__(self, directory, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._file = None
+        segments = _segments(self.directory)
+        if segments:
+            self._resume(segments[-1])
+        if self._file is None:
+            self._open(_new_segment(self.directory))
+
+    def _open(self, path: Path):
+        self._file = open(path, 'wb')
+        self._file.write(_HEADER.pack(MAGIC, VERSION, _RECORD.size))
+        self._file.flush()
+
+    def _resume(self, path: Path):
+        """Keeps appending to the last segment, dropping a record cut short by a crash."""
+        try:
+            size = path.stat().st_size
+            if size < _HEADER.size or size >= self.max_bytes:
+                return
+            with open(path, 'rb') as f:
+                if _HEADER.unpack(f.read(_HEADER.size)) != (MAGIC, VERSION, _RECORD.size):
+                    return
+            self._file = open(path, 'r+b')
+            self._file.truncate(size - (size - _HEADER.size) % _RECORD.size)
+            self._file.seek(0, os.SEEK_END)
+        except (OSError, struct.error):
+            self._file = None
+
+    def write(self, events):
+        self._file.write(b''.join(_RECORD.pack(*event) for event in events))
+        self._file.flush()
+        if self._file.tell() >= self.max_bytes:
+            self._file.close()
+            self._open(_new_segment(self.directory))
+
+    def close(self):
+        self._file.close()
+
+def _read_records(path, offset: int = 0) -> tuple[list, int]:
+    """Returns the whole records of a segment from byte `offset`, and the offset after them."""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _HEADER.size:
+            return [], offset
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            if _HEADER.unpack_from(view) != (MAGIC, VERSION, _RECORD.size):
+                raise ValueError(f"{path} is not a dome analytics segment")
+            start = max(offset, _HEADER.size)
+            end = size - (size - _HEADER.size) % _RECORD.size
+            if end <= start:
+                return [], start
+            return list(_RECORD.iter_unpack(view[start:end])), end
+
+def read_events(path):
+    """Yields the Events of a segment."""
+    records, _ = _read_records(path)
+    for t, kind, station, other, value in records:
+        yield Event(t, kind, None if station < 0 else station, None if other < 0 else other, value)
+
+# --- Rollup ---
+
+def _connect(path=None):
+    import sqlite3  # Only the rollup needs it, off the startup path
+    path = Path(path or config.ANALYTICS_DB)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(path, timeout=30.0, isolation_level=None)
+    db.executescript(_SCHEMA)
+    return db
+
+def _aggregate(records, buckets) -> tuple:
+    stations, histogram, switches, intros = {}, {}, {}, {}
+    for t, kind, station, other, value in records:
+        hour = int(t // 3600) * 3600
+        if kind in (EVENT_INTRO, EVENT_INTRO_SKIP):
+            row = intros.setdefault(hour, [0, 0])
+            row[kind == EVENT_INTRO_SKIP] += 1
+            continue
+        if station < 0:
+            continue
+        # activations, dwell completions, dwell cancels, switches in, visits, visit seconds
+        row = stations.setdefault((hour, station + 1), [0, 0, 0, 0, 0, 0.0])
+        if kind == EVENT_ACTIVATION:
+            row[0] += 1
+        elif kind == EVENT_DWELL:
+            row[1] += 1
+        elif kind == EVENT_CANCEL:
+            row[2] += 1
+        elif kind == EVENT_SWITCH:
+            row[3] += 1
+            if other >= 0:
+                key = (hour, other + 1, station + 1)
+                switches[key] = switches.get(key, 0) + 1
+        elif kind == EVENT_LEAVE:
+            row[4] += 1
+            row[5] += value
+            index = bisect.bisect_left(buckets, value)
+            key = (hour, station + 1, buckets[index] if index < len(buckets) else float('inf'))
+            histogram[key] = histogram.get(key, 0) + 1
+    return stations, histogram, switches, intros
+
+def rollup(db_path=None, directory=None) -> int:
+    """
+    Adds the records written since the last rollup to the database, and
+    deletes old segments that are fully rolled up. Returns how many records
+    were added. Safe to run from several processes at once.
+    """
+    directory = Path(directory or config.ANALYTICS_DIR)
+    buckets = tuple(sorted(config.ANALYTICS_DWELL_BUCKETS_S))
+    segments = _segments(directory)
+    db = _connect(db_path)
+    added = 0
+    try:
+        # Taken before reading the progress, so concurrent rollups never count a record twice
+        db.execute('BEGIN IMMEDIATE')
+        progress = dict(db.execute('SELECT segment, offset FROM rollup_progress'))
+        for path in segments:
+            try:
+                records, end = _read_records(path, progress.get(path.name, 0))
+            except (OSError, ValueError) as e:
+                logging.warning(f"Skipping analytics segment {path.name}: {e}",
+                                extra={'rate_key': ('analytics_segment', path.name)})
+                continue
+            if not records:
+                continue
+            stations, histogram, switches, intros = _aggregate(records, buckets)
+            db.executemany("""
+                INSERT INTO station_hour VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (hour, station) DO UPDATE SET
+                    activations = activations + excluded.activations,
+                    dwell_completions = dwell_completions + excluded.dwell_completions,
+                    dwell_cancels = dwell_cancels + excluded.dwell_cancels,
+                    switches_in = switches_in + excluded.switches_in,
+                    visits = visits + excluded.visits,
+                    visit_seconds = visit_seconds + excluded.visit_seconds
+            """, [(*key, *row) for key, row in stations.items()])
+            db.executemany("""
+                INSERT INTO dwell_histogram VALUES (?, ?, ?, ?)
+                ON CONFLICT (hour, station, le) DO UPDATE SET count = count + excluded.count
+            """, [(*key, count) for key, count in histogram.items()])
+            db.executemany("""
+                INSERT INTO switch_matrix VALUES (?, ?, ?, ?)
+                ON CONFLICT (hour, from_station, to_station) DO UPDATE SET count = count + excluded.count
+            """, [(*key, count) for key, count in switches.items()])
+            db.executemany("""
+                INSERT INTO intro_hour VALUES (?, ?, ?)
+                ON CONFLICT (hour) DO UPDATE SET starts = starts + excluded.starts, skips = skips + excluded.skips
+            """, [(hour, *row) for hour, row in intros.items()])
+            db.execute('INSERT OR REPLACE INTO rollup_progress VALUES (?, ?)', (path.name, end))
+            progress[path.name] = end
+            added += len(records)
+        db.execute('COMMIT')
+    except BaseException:
+        if db.in_transaction:
+            db.execute('ROLLBACK')
+        raise
+    finally:
+        db.close()
+
+    # The newest segments are kept; older ones go once every record is in the database
+    for path in segments[:-config.ANALYTICS_KEEP_SEGMENTS]:
+        try:
+            size = path.stat().st_size
+            if progress.get(path.name, 0) >= size - (size - _HEADER.size) % _RECORD.size:
+                path.unlink()
+        except OSError:
+            pass
+    return added
+
+# --- Background writer ---
+
+def _run(writer: _SegmentWriter):
+    next_rollup = time.monotonic() + config.ANALYTICS_ROLLUP_S
+    while True:
+        stopping = _stop.wait(config.ANALYTICS_FLUSH_S)
+        try:
+            batch = []
+            while _pending:
+                batch.append(_pending.popleft())
+            if batch:
+                writer.write(batch)
+            if stopping or time.monotonic() >= next_rollup:
+                next_rollup = time.monotonic() + config.ANALYTICS_ROLLUP_S
+                rollup()
+        except Exception as e:
+            logging.error(f"Analytics: {e}", extra={'rate_key': 'analytics_error'})
+        if stopping:
+            writer.close()
+            return
+
+def start():
+    """Starts recording events, with a background thread writing and rolling them up."""
+    global _pending, _thread
+    if _thread is not None:
+        return
+    try:
+        writer = _SegmentWriter(config.ANALYTICS_DIR, config.ANALYTICS_SEGMENT_MAX_BYTES)
+    except OSError as e:
+        logging.error(f"Analytics disabled: {e}")
+        return
+    _stop.clear()
+    _pending = deque(maxlen=_QUEUE_MAX)
+    _thread = threading.Thread(target=_run, args=(writer,), name="analytics", daemon=True)
+    _thread.start()
+    logging.info(f"Recording visitor analytics to {config.ANALYTICS_DIR}")
+
+def stop():
+    """Writes the queued events, rolls them up and stops the thread."""
+    global _thread
+    if _thread is None:
+        return
+    _stop.set()
+    _thread.join(timeout=30.0)
+    _thread = None
+
+# --- Command line ---
+
+def _summary(db_path=None):
+    db = _connect(db_path)
+    try:
+        rows = db.execute("""
+            SELECT station, SUM(activations), SUM(switches_in), SUM(visits), SUM(visit_seconds),
+                   SUM(dwell_completions), SUM(dwell_cancels)
+            FROM station_hour GROUP BY station ORDER BY station
+        """).fetchall()
+        intro = db.execute('SELECT SUM(starts), SUM(skips) FROM intro_hour').fetchone()
+    finally:
+        db.close()
+    print(f"{'station':>7} {'activations':>11} {'switches':>8} {'visits':>6} {'mean visit':>10} {'completion':>10}")
+    for station, activations, switches, visits, seconds, completed, canceled in rows:
+        mean = f"{seconds / visits:.1f}s" if visits else "-"
+        rate = f"{completed / (completed + canceled):.0%}" if completed + canceled else "-"
+        print(f"{station:>7} {activations:>11} {switches:>8} {visits:>6} {mean:>10} {rate:>10}")
+    starts, skips = intro
+    if starts:
+        print(f"Intro: {starts} started, {skips or 0} skipped")
+
+def main():
+    parser = argparse.ArgumentParser(description="Visitor analytics of the dome.")
+    parser.add_argument("--dump", metavar="SEGMENT", help="Print the events of a segment file.")
+    parser.add_argument("--db", help=f"Rollup database (default: {config.ANALYTICS_DB}).")
+    args = parser.parse_args()
+
+    if args.dump:
+        for event in read_events(args.dump):
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(event.time))
+            station = '-' if event.station is None else event.station + 1
+            other = '' if event.other is None else f" from {event.other + 1}"
+            print(f"{stamp} {EVENT_NAMES.get(event.kind, event.kind):<10} {station}{other} {event.value:.2f}s")
+        return
+    added = rollup(args.db)
+    print(f"Rolled up {added} new events.", file=sys.stderr)
+    _summary(args.db)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Multi-sensor arbitration policies.
+
+When several sensors are active at once, a policy picks the one the
+controller should follow. Policies work on the bitmask of active sensors, so
+a decision only walks the active bits, never every pin.
+"""
+import abc
+import math
+from array import array
+
+from . import config
+
+def _bits(mask: int):
+    """Yields the indexes of the set bits of a mask, lowest first."""
+    while mask:
+        bit = mask & -mask
+        mask ^= bit
+        yield bit.bit_length() - 1
+
+class ArbitrationPolicy(abc.ABC):
+    """Base class: picks one sensor out of the active set."""
+    name = None
+
+    def __init__(self, num_sensors: int):
+        self.num_sensors = num_sensors
+
+    @abc.abstractmethod
+    def select(self, mask: int, activated_at, current: int | None, now: float, playing: bool) -> int | None:
+        """
+        Returns the sensor to follow, or None if the mask is empty.
+
+        Args:
+            mask: Bitmask of active sensors.
+            activated_at: Activation time of each sensor, indexed by sensor.
+            current: The sensor whose audio is current, if any.
+            now: Current monotonic time.
+            playing: Whether the current sensor's audio is still playing.
+        """
+
+    def served(self, sensor_index: int):
+        """Called when the controller starts the audio of a sensor."""
+
+class EarliestArrival(ArbitrationPolicy):
+    """First come, first served: the sensor that became active first wins."""
+    name = 'earliest_arrival'
+
+    def select(self, mask, activated_at, current, now, playing):
+        best = None
+        for i in _bits(mask):
+            if best is None or activated_at[i] < activated_at[best]:
+                best = i
+        return best
+
+class LongestDwell(ArbitrationPolicy):
+    """
+    The sensor with the most presence over the last ARBITRATION_WINDOW_S wins.
+
+    Presence is integrated with exponential decay, so a visitor passing by
+    earns little priority, while one who steps out for a moment keeps most
+    of theirs.
+    """
+    name = 'longest_dwell'
+
+    def __init__(self, num_sensors: int, window_s: float = config.ARBITRATION_WINDOW_S):
+        super().__init__(num_sensors)
+        self.window_s = window_s
+        self._scores = array('d', [0.0] * num_sensors)
+        self._scored_mask = 0
+        self._last_update = None
+
+    def select(self, mask, activated_at, current, now, playing):
+        dt = 0.0 if self._last_update is None else max(0.0, now - self._last_update)
+        self._last_update = now
+        decay = math.exp(-dt / self.window_s)
+
+        best = None
+        scored = 0
+        for i in _bits(mask | self._scored_mask):
+            score = self._scores[i] * decay
+            if mask >> i & 1:
+                score += dt
+                if best is None or score > self._scores[best]:
+                    best = i
+            if score > 1e-3:
+                scored |= 1 << i
+            else:
+                score = 0.0
+            self._scores[i] = score
+        self._scored_mask = scored
+        return best
+
+class RoundRobin(ArbitrationPolicy):
+    """
+    Active sensors take turns in pin order. The current sensor keeps the turn
+    while it is active and its audio is playing; then the next active sensor
+    after it gets the turn.
+    """
+    name = 'round_robin'
+
+    def __init__(self, num_sensors: int):
+        super().__init__(num_sensors)
+        self._full_mask = (1 << num_sensors) - 1
+        self._last_served = num_sensors - 1
+
+    def select(self, mask, activated_at, current, now, playing):
+        if not mask:
+            return None
+        if current is not None and playing and mask >> current & 1:
+            return current
+        # Rotate the mask so the sensor after the last served one is bit 0
+        shift = (self._last_served + 1) % self.num_sensors
+        rotated = ((mask >> shift) | (mask << (self.num_sensors - shift))) & self._full_mask
+        return ((rotated & -rotated).bit_length() - 1 + shift) % self.num_sensors
+
+    def served(self, sensor_index):
+        self._last_served = sensor_index
+
+POLICIES = {policy.name: policy for policy in (EarliestArrival, LongestDwell, RoundRobin)}
+
+def create_policy(name: str, num_sensors: int) -> ArbitrationPolicy:
+    """Creates an arbitration policy by name (see POLICIES)."""
+    try:
+        return POLICIES[name](num_sensors)
+    except KeyError:
+        raise ValueError(f"Unknown arbitration policy '{name}'. Valid: {', '.join(POLICIES)}") from None
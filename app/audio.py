@@ -1,62 +1,762 @@
-import pygame.mixer
+import os
+import math
+import mmap
+import struct
+import time
+import wave
 import logging
+import threading
+from collections import OrderedDict
 from pathlib import Path
 
-from . import config
+from . import clock, config, events, metrics, stations, transcode
+from . import mixer as _backend
+from .watcher import DirectoryWatcher
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Set by init_mixer(): importing the backend (pygame) is deferred until then
+mixer = None
+MixerError = _backend.MixerError
 
 _audio_paths = {}
+_audio_mask = 0     # Bit i set when sensor i has an audio file
 _intro_path = None
 _is_initialized = False
 
+# Key used for the intro in the decoded audio bank (sensors use their index)
+_INTRO_KEY = 'intro'
+
+# Decoded tracks, in least-recently-used order
+_bank = OrderedDict()
+_bank_bytes = 0
+_bank_lock = threading.Lock()
+_streamed = set()   # Keys too large for the budget, always streamed from disk
+_decoding = set()   # Keys being decoded in the background (cache miss or reload)
+_generation = 0     # Bumped on every library swap, so stale decodes are dropped
+
+# Hot reload: the watcher thread scans and decodes changed files, then leaves
+# the result in _pending_reload for the controller to swap in between ticks.
+_file_stamps = {}   # key -> (mtime_ns, size) of the mapped version of each file
+_pending_reload = None
+_reload_lock = threading.Lock()
+_watcher = None
+
+# Playback voices: two reserved channels for decoded tracks (so one can fade
+# in while the other fades out) plus the single mixer.music stream. In
+# multi-voice mode there is a channel per voice, plus a spare for a voice
+# fading out after it was taken over.
+_channel_voices = []
+_music_voice = None
+_voices = []        # Both of the above, built once by init_mixer()
+_current_voice = None
+_crossfade = None
+
+# Multi-voice mode: stations with a sounding voice, and how many share the mix
+_station_mask = 0
+_mixed_voices = 0
+
+# Gain changes of voices that keep playing are ramped, so they never click
+_GAIN_RAMP_S = 0.25
+
 def init_mixer():
     """Initializes the Pygame mixer with the defined settings."""
-    global _is_initialized
+    global _is_initialized, _music_voice, mixer, MixerError
+    mixer, MixerError = _backend.load()
     try:
-        pygame.mixer.init(
+        mixer.init(
             frequency=config.MIXER_FREQUENCY,
             size=config.MIXER_SIZE,
             channels=config.MIXER_CHANNELS,
             buffer=config.MIXER_BUFFER
         )
+        # Reserve the channels for decoded tracks so nothing else grabs them.
+        channels = config.AUDIO_MAX_VOICES + 1 if config.AUDIO_MULTI_VOICE else 2
+        mixer.set_num_channels(max(mixer.get_num_channels(), channels))
+        mixer.set_reserved(channels)
+        _channel_voices[:] = [_Voice(mixer.Channel(i)) for i in range(channels)]
+        _music_voice = _Voice()
+        _voices[:] = _channel_voices + [_music_voice]
         _is_initialized = True
         logging.info("Pygame mixer initialized successfully.")
-    except pygame.error as e:
+    except MixerError as e:
         logging.error(f"Could not initialize pygame.mixer: {e}")
         logging.error("Ensure the Raspberry Pi's audio system is configured (e.g., `sudo raspi-config`).")
         _is_initialized = False
 
+def _scan_library() -> dict:
+    """Returns {key: path} for the audio files present in AUDIO_DIR."""
+    library = {}
+    for i, name in enumerate(stations.table.audio_files):
+        audio_file = config.AUDIO_DIR / name
+        if audio_file.is_file():
+            library[i] = str(audio_file)  # Keyed by station index
+    intro_file = config.AUDIO_DIR / config.INTRO_AUDIO_FILE
+    if intro_file.is_file():
+        library[_INTRO_KEY] = str(intro_file)
+    return library
+
+def _stamp(path: str):
+    """Identifies a version of a file: (mtime_ns, size), or None if it is gone."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _mask_of(library: dict) -> int:
+    mask = 0
+    for key in library:
+        if key != _INTRO_KEY:
+            mask |= 1 << key
+    return mask
+
 def load_audio_mappings():
     """
     Scans the audio directory and maps the found files to sensors.
     Only sensors with a corresponding audio file will be active.
     """
-    global _audio_paths, _intro_path
-    _audio_paths.clear()
+    global _audio_paths, _audio_mask, _intro_path, _bank_bytes, _generation
+    _audio_paths = {}
+    _audio_mask = 0
     _intro_path = None
+    _file_stamps.clear()
+    with _bank_lock:
+        _bank.clear()
+        _bank_bytes = 0
+        _streamed.clear()
+        _generation += 1
     
     if not config.AUDIO_DIR.is_dir():
         logging.warning(f"Audio directory does not exist: {config.AUDIO_DIR}")
         return
 
+    library = _scan_library()
+    for key, path in library.items():
+        _file_stamps[key] = _stamp(path)
+
     # Map Sensor Audios
-    for i in range(1, len(config.SENSOR_PINS) + 1):
-        audio_file = config.AUDIO_DIR / config.AUDIO_FILES.get(i, "")
-        if audio_file.is_file():
-            _audio_paths[i - 1] = str(audio_file)  # Use 0-9 index
-            logging.info(f"Audio mapped for sensor {i}: {audio_file.name}")
+    for i, expected in enumerate(stations.table.audio_files):
+        if i in library:
+            _audio_paths[i] = library[i]
+            logging.info(f"Audio mapped for sensor {i + 1}: {expected}")
         else:
-            logging.warning(f"Audio not found for sensor {i} (expected file: {audio_file.name})")
+            logging.warning(f"Audio not found for sensor {i + 1} (expected file: {expected})")
+    _audio_mask = _mask_of(library)
 
     # Check Intro Audio
-    intro_file = config.AUDIO_DIR / config.INTRO_AUDIO_FILE
-    if intro_file.is_file():
-        _intro_path = str(intro_file)
-        logging.info(f"Intro audio found: {intro_file.name}")
+    if _INTRO_KEY in library:
+        _intro_path = library[_INTRO_KEY]
+        logging.info(f"Intro audio found: {config.INTRO_AUDIO_FILE}")
+    else:
+        logging.warning(f"Intro audio not found: {config.INTRO_AUDIO_FILE}")
+
+def _path_for(key) -> str | None:
+    return _intro_path if key == _INTRO_KEY else _audio_paths.get(key)
+
+def _budget_bytes() -> int:
+    return config.AUDIO_PRELOAD_BUDGET_MB * 1024 * 1024
+
+def _decoded_size(sound) -> int:
+    """Size in bytes of a decoded track, without copying its samples."""
+    frequency, size, channels = mixer.get_init()
+    return int(sound.get_length() * frequency * channels * abs(size) // 8)
+
+def _playable(path: str) -> str:
+    """The transcoded copy of a track if it is cached, else the source file."""
+    if config.AUDIO_USE_CACHE:
+        return transcode.lookup(path) or path
+    return path
+
+def _load_sound(path: str):
+    """Decodes a file. Returns (sound, nbytes), or None if it cannot be decoded."""
+    start = time.perf_counter()
+    try:
+        sound = mixer.Sound(_playable(path))
+    except MixerError as e:
+        logging.error(f"Could not decode {path}: {e}")
+        return None
+    metrics.mixer_load_seconds.observe(time.perf_counter() - start)
+    return sound, _decoded_size(sound)
+
+def _store(key, sound, nbytes: int):
+    """Puts a decoded track in the bank, evicting least recently used tracks to fit.
+    Must be called with _bank_lock held."""
+    global _bank_bytes
+    if key in _bank:
+        _bank_bytes -= _bank.pop(key)[1]
+    if nbytes > _budget_bytes():
+        _streamed.add(key)
+        logging.info(f"{Path(_path_for(key)).name} ({nbytes // 2**20} MB) exceeds the preload budget; it will be streamed.")
+        return
+    _streamed.discard(key)
+    while _bank and _bank_bytes + nbytes > _budget_bytes():
+        evicted, (_, evicted_bytes) = _bank.popitem(last=False)
+        _bank_bytes -= evicted_bytes
+        logging.info(f"Evicted {Path(_path_for(evicted)).name} from the audio bank.")
+    _bank[key] = (sound, nbytes)
+    _bank_bytes += nbytes
+
+def _decode(key):
+    """Decodes a track into the bank."""
+    path = _path_for(key)
+    if path is None:
+        return
+    generation = _generation
+    loaded = _load_sound(path)
+    if loaded is None:
+        return
+    with _bank_lock:
+        # The library was reloaded meanwhile: this decode may be of an old version
+        if generation == _generation:
+            _store(key, *loaded)
+
+def _decode_in_background(*keys, normalize: bool = False):
+    """
+    Decodes tracks into the bank on a background thread, one after another.
+    With `normalize`, new or changed files are transcoded first (hot reload).
+    """
+    def run():
+        for key in keys:
+            try:
+                path = _path_for(key)
+                if normalize and config.AUDIO_USE_CACHE and path is not None:
+                    transcode.ensure(path)
+                if _is_initialized and config.AUDIO_PRELOAD and _mapped_path(key) is None:
+                    _decode(key)  # Memory-mapped tracks need no decoding
+            finally:
+                with _bank_lock:
+                    _decoding.discard(key)
+
+    with _bank_lock:
+        keys = [key for key in keys if key not in _decoding and key not in _streamed]
+        _decoding.update(keys)
+    if keys:
+        threading.Thread(target=run, name="audio-decode", daemon=True).start()
+
+def preload_audio():
+    """
+    Decodes every mapped track (and the intro) into memory, so playback
+    starts without reading or parsing files on the hot path.
+    """
+    if not _is_initialized or not config.AUDIO_PRELOAD:
+        return
+    keys = list(_audio_paths)
+    if _intro_path:
+        # Decoded last: it plays once, so it is the first to go if memory is short
+        keys.append(_INTRO_KEY)
+    mapped = 0
+    for key in keys:
+        if _mapped_path(key) is not None:
+            mapped += 1  # Played from its memory-mapped PCM instead
+        else:
+            _decode(key)
+    logging.info(f"Preloaded {len(_bank)} tracks ({_bank_bytes // 2**20} MB), memory-mapping {mapped}, streaming {len(_streamed)}.")
+
+def _get_decoded(key):
+    """Returns the decoded track and marks it as recently used, or None on a miss."""
+    with _bank_lock:
+        entry = _bank.get(key)
+        if entry is None:
+            return None
+        _bank.move_to_end(key)
+        return entry[0]
+
+def _mapped_path(key) -> str | None:
+    """The transcoded WAV to memory-map for a track, if mmap playback applies."""
+    if not config.AUDIO_MMAP or _path_for(key) is None:
+        return None
+    return transcode.lookup(_path_for(key))
+
+def _wav_data_range(buffer) -> tuple:
+    """Returns (start, end) byte offsets of the PCM samples in a WAV file."""
+    if buffer[0:4] != b'RIFF' or buffer[8:12] != b'WAVE':
+        raise ValueError("not a WAV file")
+    pos = 12
+    while pos + 8 <= len(buffer):
+        chunk_id, size = struct.unpack_from('<4sI', buffer, pos)
+        if chunk_id == b'data':
+            return pos + 8, min(pos + 8 + size, len(buffer))
+        pos += 8 + size + (size & 1)  # Chunks are padded to an even size
+    raise ValueError("no data chunk")
+
+class _PcmTrack:
+    """
+    A transcoded WAV (already in the mixer's format) mapped into memory. It is
+    fed to a channel one chunk at a time, and pages that have been copied to
+    the mixer are dropped from this process: the kernel page cache keeps hot
+    tracks, and RSS does not grow with the number or length of tracks.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.start, self.end = _wav_data_range(self._map)
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                self._map.madvise(mmap.MADV_SEQUENTIAL)  # Read ahead generously
+        except ValueError:
+            self._map.close()
+            raise
+
+    def sound(self, offset: int, nbytes: int):
+        """Returns a mixer Sound with the bytes [offset, offset + nbytes)."""
+        stop = min(offset + nbytes, self.end)
+        with memoryview(self._map) as whole, whole[offset:stop] as view:
+            sound = mixer.Sound(buffer=view)  # The only copy: into the mixer
+        if hasattr(mmap, 'MADV_DONTNEED'):
+            first = offset // mmap.PAGESIZE * mmap.PAGESIZE
+            last = stop // mmap.PAGESIZE * mmap.PAGESIZE
+            if last > first:
+                self._map.madvise(mmap.MADV_DONTNEED, first, last - first)
+        return sound
+
+    def close(self):
+        self._map.close()
+
+def _wav_length(path: str) -> float | None:
+    """Length in seconds of a WAV file, from its header. None for other formats."""
+    try:
+        with wave.open(path, 'rb') as w:
+            return w.getnframes() / float(w.getframerate())
+    except (wave.Error, EOFError, OSError):
+        return None
+
+def _chunk_bytes(ms: int) -> int:
+    """Bytes in `ms` milliseconds of mixer-format PCM, rounded to whole frames."""
+    frequency, size, channels = mixer.get_init()
+    frame = channels * abs(size) // 8
+    return max(1, frequency * ms // 1000) * frame
+
+class _Voice:
+    """
+    A playback slot: a reserved mixer channel, or the mixer.music stream.
+    A channel plays either a decoded Sound or a memory-mapped track, which
+    pump() feeds to it in chunks through the channel queue.
+    """
+
+    def __init__(self, channel=None):
+        self.channel = channel
+        # Keeps the playing track alive even if a reload drops it from the bank:
+        # freeing a Sound stops every channel playing it.
+        self.sound = None
+        # Memory-mapped track and the offset of its next chunk to queue
+        self.track = None
+        self.offset = 0
+        # Software fade: (start, duration_s, from, to). Used for memory-mapped
+        # tracks, where the channel's own fadeout would start the queued chunk
+        # when it ends, and in multi-voice mode, where it combines with the gain.
+        self.fade = None
+        self.level = 1.0
+        # Multi-voice mode: the gain compensation (ramped by pump() as
+        # (start, from, to)) and the station this voice plays
+        self.gain = 1.0
+        self.gain_ramp = None
+        self.station = None
+        self.priority = 0
+        self.occupied = False
+        self.started_at = 0.0
+        # When the playback will end (clock.monotonic()), so the main loop is
+        # woken for it instead of polling; None when idle or not known
+        self.ends_at = None
+
+    def play(self, key, sound=None, fade_in_ms: int = 0, volume: float = 1.0, track=None):
+        # Volume is set before and after play() so the first buffer is never loud
+        self._close_track()
+        self.sound = sound
+        self.fade = None
+        self.set_volume(volume)
+        if fade_in_ms > 0 and (track is not None or config.AUDIO_MULTI_VOICE):
+            self.fade = (clock.monotonic(), fade_in_ms / 1000.0, 0.0, volume)
+            volume, fade_in_ms = 0.0, 0
+            self.set_volume(volume)
+        if track is not None:
+            # play() replaces whatever the channel had queued; pump() queues the next chunk
+            nbytes = _chunk_bytes(config.AUDIO_MMAP_CHUNK_MS)
+            self.channel.play(track.sound(track.start, nbytes))
+            self.track, self.offset = track, track.start + nbytes
+            self.ends_at = clock.monotonic() + (track.end - track.start) / _chunk_bytes(1000)
+            self.pump(clock.monotonic())
+        elif self.channel is not None:
+            self.channel.play(sound, loops=0, fade_ms=fade_in_ms)
+            self.ends_at = clock.monotonic() + sound.get_length()
+        else:
+            path = _playable(_path_for(key))
+            mixer.music.load(path)
+            mixer.music.play(loops=0, fade_ms=fade_in_ms)
+            length = _wav_length(path)
+            self.ends_at = None if length is None else clock.monotonic() + length
+        self.set_volume(volume)
+
+    def pump(self, now: float):
+        """Advances a software fade and keeps a chunk queued behind the playing one."""
+        if self.gain_ramp is not None:
+            start, begin, end = self.gain_ramp
+            t = min(1.0, (now - start) / _GAIN_RAMP_S)
+            self.gain = begin + (end - begin) * t
+            if t >= 1.0:
+                self.gain_ramp = None
+            if self.fade is None:
+                self.set_volume(self.level)
+        if self.fade is not None:
+            start, duration, begin, end = self.fade
+            t = min(1.0, (now - start) / duration)
+            self.set_volume(begin + (end - begin) * t)
+            if t >= 1.0:
+                self.fade = None
+                if end == 0.0:
+                    self.stop()
+                    return
+        if self.track is None or self.channel.get_queue() is not None:
+            return
+        if self.offset < self.track.end:
+            # queue() on an idle channel plays right away, so an underrun recovers
+            self.channel.queue(self.track.sound(self.offset, _chunk_bytes(config.AUDIO_MMAP_CHUNK_MS)))
+            self.offset += _chunk_bytes(config.AUDIO_MMAP_CHUNK_MS)
+        elif not self.channel.get_busy():
+            self._close_track()
+
+    def set_volume(self, volume: float):
+        self.level = volume
+        if self.channel is not None:
+            self.channel.set_volume(volume * self.gain)
+        else:
+            mixer.music.set_volume(volume * self.gain)
+
+    def set_gain(self, gain: float, now: float):
+        """Ramps the gain compensation to a new value."""
+        if gain != self.gain:
+            self.gain_ramp = (now, self.gain, gain)
+
+    def fading_out(self) -> bool:
+        return self.fade is not None and self.fade[3] == 0.0
+
+    def fadeout(self, fade_out_ms: int):
+        if fade_out_ms <= 0:
+            self.stop()
+            return
+        if self.get_busy():
+            ends_at = clock.monotonic() + fade_out_ms / 1000.0
+            self.ends_at = ends_at if self.ends_at is None else min(self.ends_at, ends_at)
+        if self.track is not None or config.AUDIO_MULTI_VOICE:
+            self.fade = (clock.monotonic(), fade_out_ms / 1000.0, self.level, 0.0)
+        elif self.channel is not None:
+            self.channel.fadeout(fade_out_ms)
+        else:
+            mixer.music.fadeout(fade_out_ms)
+
+    def stop(self):
+        self.fade = None
+        self.station = None
+        self.occupied = False
+        self.ends_at = None
+        if self.channel is not None:
+            self.channel.stop()
+            self._close_track()
+        else:
+            mixer.music.stop()
+
+    def get_busy(self) -> bool:
+        if self.channel is not None:
+            return self.channel.get_busy() or self.track is not None
+        return mixer.music.get_busy()
+
+    def _close_track(self):
+        if self.track is not None:
+            self.track.close()
+            self.track = None
+
+def _all_voices():
+    return _voices
+
+def _open_track(key):
+    """Maps a track's transcoded PCM for playback, or returns None."""
+    path = _mapped_path(key)
+    if path is None:
+        return None
+    try:
+        return _PcmTrack(path)
+    except (OSError, ValueError) as e:
+        logging.error(f"Could not map {path}: {e}")
+        return None
+
+def _start(key, fade_in_ms: int = 0, volume: float = 1.0, keep=None):
+    """
+    Plays a track on a free voice and returns it. Decoded tracks use a reserved
+    channel, others are streamed from disk. `keep` is a voice that must not be
+    interrupted (the outgoing side of a crossfade).
+    """
+    global _current_voice
+    track = _open_track(key)
+    sound = _get_decoded(key) if track is None else None
+    if track is not None or sound is not None:
+        voice = _channel_voices[1] if keep is _channel_voices[0] else _channel_voices[0]
     else:
-        logging.warning(f"Intro audio not found: {intro_file.name}")
+        voice = _music_voice
+        if config.AUDIO_PRELOAD:
+            # Evicted earlier: decode it again off the hot path for the next time
+            _decode_in_background(key)
+    for other in _all_voices():
+        if other is not voice and other is not keep:
+            other.stop()
+    voice.play(key, sound, fade_in_ms, volume, track)
+    _current_voice = voice
+    return voice
+
+# --- Crossfade engine ---
+
+def _linear(t: float) -> float:
+    return t
+
+def _equal_power(t: float) -> float:
+    # Keeps the summed power constant: in^2 + out^2 == 1
+    return math.sin(t * math.pi / 2)
+
+FADE_CURVES = {
+    'linear': _linear,
+    'equal_power': _equal_power,
+}
+
+class _Crossfade:
+    """
+    Volume envelopes for an outgoing and an incoming voice, advanced by
+    update_crossfade(). When both tracks need the single music stream they
+    cannot overlap, so the outgoing one fades out over the first half and the
+    incoming one starts and fades in over the second half.
+    """
+
+    def __init__(self, outgoing, incoming_key, duration_s: float, curve):
+        self.outgoing = outgoing
+        self.incoming = None
+        self.incoming_key = incoming_key
+        self.duration_s = duration_s
+        self.curve = curve
+        self.start_time = clock.monotonic()
+        self.sequential = (
+            outgoing is _music_voice and _get_decoded(incoming_key) is None
+            and _mapped_path(incoming_key) is None
+        )
+        if not self.sequential:
+            self.incoming = _start(incoming_key, volume=0.0, keep=outgoing)
+
+    def step(self, now: float) -> bool:
+        """Applies the envelopes for the given time. Returns False once finished."""
+        t = min(1.0, (now - self.start_time) / self.duration_s) if self.duration_s > 0 else 1.0
+        if self.sequential:
+            out_t, in_t = max(0.0, 1.0 - 2.0 * t), max(0.0, 2.0 * t - 1.0)
+            if self.incoming is None and t >= 0.5:
+                self.outgoing.stop()
+                self.incoming = _start(self.incoming_key, volume=0.0)
+        else:
+            out_t, in_t = 1.0 - t, t
+
+        if self.outgoing is not None and self.outgoing is not self.incoming:
+            self.outgoing.set_volume(self.curve(out_t))
+        if self.incoming is not None:
+            self.incoming.set_volume(self.curve(in_t))
+
+        if t < 1.0:
+            return True
+        if self.outgoing is not None and self.outgoing is not self.incoming:
+            self.outgoing.stop()
+            self.outgoing.set_volume(1.0)
+        return False
+
+# --- Multi-voice mode ---
+
+VOICE_GAINS = {
+    'equal_amplitude': lambda n: 1.0 / n,
+    'equal_power': lambda n: 1.0 / math.sqrt(n),
+}
+
+def _voice_gain(count: int) -> float:
+    gain = VOICE_GAINS.get(config.AUDIO_VOICE_GAIN, VOICE_GAINS['equal_amplitude'])
+    return gain(max(1, count))
+
+def _sounding_voices() -> list:
+    """Voices playing a station, except those fading out."""
+    return [voice for voice in _all_voices()
+            if voice.station is not None and not voice.fading_out() and voice.get_busy()]
+
+def _update_mix():
+    """Refreshes the station mask and ramps every voice to the gain for the new count."""
+    global _station_mask, _mixed_voices
+    sounding = _sounding_voices()
+    mask = 0
+    for voice in sounding:
+        mask |= 1 << voice.station
+    _station_mask = mask
+    if len(sounding) != _mixed_voices:
+        _mixed_voices = len(sounding)
+        gain = _voice_gain(_mixed_voices)
+        now = clock.monotonic()
+        for voice in sounding:
+            voice.set_gain(gain, now)
+
+def _rank(voice) -> tuple:
+    """Voices that rank lowest are taken over first: left, low priority, oldest."""
+    return voice.occupied, voice.priority, voice.started_at
+
+def _can_take(voice, priority: int) -> bool:
+    """Whether an occupied station with `priority` may take over a voice."""
+    return (voice.occupied, voice.priority) < (True, priority)
+
+def play_station(sensor_index: int, fade_in_ms: int = 0, priority: int = 0) -> tuple[bool, int | None]:
+    """
+    Multi-voice mode: plays the audio of a station on its own voice, mixed with
+    the stations already sounding.
+
+    When AUDIO_MAX_VOICES stations are sounding, the voice of a station whose
+    visitor has left, or else of a station with a lower priority, fades out to
+    make room. A station never takes a voice from an occupied station of the
+    same or higher priority.
+
+    Returns:
+        tuple: (started, taken) - whether the audio started, and the station
+        whose voice was taken over, if any.
+    """
+    global _current_voice
+    if not _is_initialized or not has_audio_for_sensor(sensor_index):
+        return False, None
+    sounding = _sounding_voices()
+    if len(sounding) >= config.AUDIO_MAX_VOICES and not any(_can_take(v, priority) for v in sounding):
+        return False, None  # Checked first: the controller retries on every tick
+
+    track = _open_track(sensor_index)
+    sound = _get_decoded(sensor_index) if track is None else None
+    if track is not None or sound is not None:
+        pool = _channel_voices
+    else:
+        pool = [_music_voice]  # Only one track can stream from disk
+        if config.AUDIO_PRELOAD:
+            _decode_in_background(sensor_index)
+    voice = next((v for v in pool if not v.get_busy()), None) or next((v for v in pool if v.fading_out()), None)
+
+    victim = None
+    if len(sounding) >= config.AUDIO_MAX_VOICES or voice is None:
+        candidates = sounding if voice is not None else [v for v in sounding if v in pool]
+        victim = min(candidates, key=_rank, default=None)
+        if victim is None or not _can_take(victim, priority):
+            if track is not None:
+                track.close()
+            return False, None
+    taken = None
+    if victim is not None:
+        taken = victim.station
+        logging.info(f"Station {sensor_index + 1} takes over the voice of station {taken + 1}.")
+        if voice is None:
+            voice = victim  # The only voice that can play this track: no time to fade
+            voice.stop()
+        else:
+            victim.fadeout(fade_in_ms)
+
+    logging.info(f"Playing audio for station {sensor_index + 1}: {Path(_audio_paths[sensor_index]).name}")
+    try:
+        voice.stop()
+        voice.gain = _voice_gain(len(sounding) + 1 - (victim is not None))
+        voice.gain_ramp = None
+        voice.play(sensor_index, sound, fade_in_ms, 1.0, track)
+    except MixerError as e:
+        logging.error(f"Error playing {_audio_paths[sensor_index]}: {e}")
+        return False, taken
+    voice.station = sensor_index
+    voice.priority = priority
+    voice.occupied = True
+    voice.started_at = clock.monotonic()
+    _current_voice = voice
+    _update_mix()
+    return True, taken
+
+def release_station(sensor_index: int):
+    """
+    Multi-voice mode: the visitor of a station has left. Its audio plays on,
+    but its voice is the first to be taken over.
+    """
+    for voice in _all_voices():
+        if voice.station == sensor_index:
+            voice.occupied = False
+
+def stop_station(sensor_index: int, fade_out_ms: int = 0):
+    """Multi-voice mode: stops the audio of a station, with an optional fade-out."""
+    for voice in _all_voices():
+        if voice.station == sensor_index and not voice.fading_out():
+            voice.fadeout(fade_out_ms)
+    _update_mix()
+
+def get_station_mask() -> int:
+    """Multi-voice mode: returns a bitmask of the stations sounding (bit i = station i)."""
+    return _station_mask
+
+# --- Hot reload ---
+
+def _prepare_reload():
+    """
+    Runs on the watcher thread: rescans AUDIO_DIR and queues the new and
+    changed files for apply_pending_reload(). Only stats files: transcoding
+    and decoding run on the background decode path once the mapping is swapped.
+    """
+    global _pending_reload
+    library = _scan_library()
+    stamps = {key: _stamp(path) for key, path in library.items()}
+    changed = [key for key in library if stamps[key] != _file_stamps.get(key)]
+    removed = [key for key in _file_stamps if key not in library]
+    if not changed and not removed:
+        return
+    with _reload_lock:
+        _pending_reload = (library, stamps, changed, removed)
+    events.notify()  # Wake the main loop so the swap happens right away
+    logging.info(f"Audio library changed: {len(changed)} new or updated, {len(removed)} removed. Applying on the next tick.")
+
+def apply_pending_reload() -> bool:
+    """
+    Swaps in a library prepared by the watcher, if any. Called by the controller
+    between ticks; cheap when there is nothing to apply. Voices keep their
+    current track, so nothing that is playing is cut off. New and changed
+    files are normalized and decoded in the background afterwards; until
+    then they play from disk. Returns True if a reload was applied.
+    """
+    global _pending_reload, _audio_paths, _audio_mask, _intro_path, _file_stamps, _generation, _bank_bytes
+    if _pending_reload is None:
+        return False
+    with _reload_lock:
+        library, stamps, changed, removed = _pending_reload
+        _pending_reload = None
+
+    with _bank_lock:
+        _generation += 1
+        for key in changed + removed:
+            if key in _bank:
+                _bank_bytes -= _bank.pop(key)[1]
+            _streamed.discard(key)
+        _audio_paths = {key: path for key, path in library.items() if key != _INTRO_KEY}
+        _audio_mask = _mask_of(library)
+        _intro_path = library.get(_INTRO_KEY)
+        _file_stamps = stamps
+    # Normalize new files, unless the sync already did, and decode them
+    _decode_in_background(*changed, normalize=True)
+
+    for key in changed:
+        logging.info(f"Reloaded {Path(library[key]).name}.")
+    for key in removed:
+        logging.info(f"Audio removed for {'intro' if key == _INTRO_KEY else f'sensor {key + 1}'}.")
+    return True
+
+def start_hot_reload():
+    """Starts watching AUDIO_DIR for added, changed and removed files."""
+    global _watcher
+    if _watcher is not None or not config.AUDIO_DIR.is_dir():
+        return
+    _watcher = DirectoryWatcher(
+        config.AUDIO_DIR, _prepare_reload,
+        settle_s=config.AUDIO_RELOAD_DELAY_S,
+        poll_interval_s=config.AUDIO_WATCH_POLL_S,
+    )
+    _watcher.start()
+
+def stop_hot_reload():
+    """Stops watching AUDIO_DIR."""
+    global _watcher
+    if _watcher is not None:
+        _watcher.stop()
+        _watcher = None
 
 def get_available_audio_map():
     """Returns the dictionary of loaded audio mappings."""
@@ -66,6 +766,10 @@ def has_audio_for_sensor(sensor_index: int) -> bool:
     """Checks if an audio file is mapped to a specific sensor."""
     return sensor_index in _audio_paths
 
+def get_audio_mask() -> int:
+    """Returns a bitmask of the sensors that have an audio file (bit i = sensor i)."""
+    return _audio_mask
+
 def has_intro() -> bool:
     """Checks if the intro audio file is available."""
     return _intro_path is not None
@@ -81,9 +785,9 @@ def play_intro():
 
     logging.info(f"Playing intro audio: {Path(_intro_path).name}")
     try:
-        pygame.mixer.music.load(_intro_path)
-        pygame.mixer.music.play(loops=0)
-    except pygame.error as e:
+        _cancel_crossfade()
+        _start(_INTRO_KEY)
+    except MixerError as e:
         logging.error(f"Error playing intro {_intro_path}: {e}")
 
 def play_audio(sensor_index: int, fade_in_ms: int = 0):
@@ -96,12 +800,9 @@ def play_audio(sensor_index: int, fade_in_ms: int = 0):
     audio_path = _audio_paths[sensor_index]
     logging.info(f"Playing audio for sensor {sensor_index + 1}: {Path(audio_path).name}")
     try:
-        pygame.mixer.music.load(audio_path)
-        if fade_in_ms > 0:
-            pygame.mixer.music.play(loops=0, fade_ms=fade_in_ms)
-        else:
-            pygame.mixer.music.play(loops=0)
-    except pygame.error as e:
+        _cancel_crossfade()
+        _start(sensor_index, fade_in_ms)
+    except MixerError as e:
         logging.error(f"Error playing {audio_path}: {e}")
 
 def stop_audio(fade_out_ms: int = 0):
@@ -109,15 +810,143 @@ def stop_audio(fade_out_ms: int = 0):
     if not _is_initialized:
         return
 
+    _cancel_crossfade()
+    for voice in _all_voices():
+        if fade_out_ms > 0:
+            voice.fadeout(fade_out_ms)
+        else:
+            voice.stop()
+    if config.AUDIO_MULTI_VOICE:
+        _update_mix()
     if fade_out_ms > 0:
-        pygame.mixer.music.fadeout(fade_out_ms)
         logging.info(f"Fading out audio over {fade_out_ms} ms.")
     else:
-        pygame.mixer.music.stop()
         logging.info("Audio stopped.")
 
+def restart_mixer():
+    """
+    Shuts the mixer down and starts it again with the same library, for the
+    supervisor to recover a wedged or failing mixer. Decoded tracks belong to
+    the old mixer, so they are dropped and decoded again in the background.
+    """
+    global _is_initialized, _crossfade, _current_voice, _station_mask, _mixed_voices, _bank_bytes, _generation
+    _crossfade = None
+    _current_voice = None
+    _station_mask = _mixed_voices = 0
+    for voice in _all_voices():
+        try:
+            voice.stop()
+        except Exception:
+            voice._close_track()  # The mixer is broken: just drop what it played
+    _is_initialized = False
+    try:
+        mixer.quit()
+    except Exception as e:
+        logging.warning(f"Error shutting the mixer down: {e}")
+    with _bank_lock:
+        _bank.clear()
+        _bank_bytes = 0
+        _streamed.clear()
+        _generation += 1  # Decodes still running are for the old mixer
+    init_mixer()
+    threading.Thread(target=preload_audio, name="audio-preload", daemon=True).start()
+    logging.warning("Mixer restarted.")
+
 def is_playing() -> bool:
     """Checks if any audio is currently playing."""
     if not _is_initialized:
         return False
-    return pygame.mixer.music.get_busy()
+    return any(voice.get_busy() for voice in _all_voices())
+
+def crossfade_to(sensor_index: int, duration_ms: int = config.FADE_MS, curve: str = config.FADE_CURVE):
+    """
+    Starts a crossfade from the current audio to the audio of a sensor.
+
+    Returns immediately: the fade is advanced by update_crossfade(), which the
+    controller calls on every tick.
+    """
+    global _crossfade
+    if not _is_initialized or not has_audio_for_sensor(sensor_index):
+        return
+
+    curve_fn = FADE_CURVES.get(curve)
+    if curve_fn is None:
+        logging.warning(f"Unknown fade curve '{curve}', using linear.")
+        curve_fn = _linear
+
+    # A new switch during a running fade: jump to the end of the running one
+    if _crossfade is not None:
+        _crossfade.step(float('inf'))
+        _crossfade = None
+
+    outgoing = _current_voice if _current_voice is not None and _current_voice.get_busy() else None
+    audio_path = _audio_paths[sensor_index]
+    logging.info(f"Crossfading to sensor {sensor_index + 1}: {Path(audio_path).name} ({curve}, {duration_ms} ms)")
+    try:
+        _crossfade = _Crossfade(outgoing, sensor_index, duration_ms / 1000.0, curve_fn)
+        _crossfade.step(_crossfade.start_time)
+    except MixerError as e:
+        logging.error(f"Error playing {audio_path}: {e}")
+        _crossfade = None
+
+def update_crossfade():
+    """Advances the running crossfade, if any. Cheap when there is none."""
+    global _crossfade
+    if _crossfade is None:
+        return
+    try:
+        if not _crossfade.step(clock.monotonic()):
+            _crossfade = None
+    except MixerError as e:
+        logging.error(f"Error during crossfade: {e}")
+        _crossfade = None
+
+def update_streams():
+    """
+    Feeds memory-mapped tracks, advances their fades and, in multi-voice mode,
+    the gain compensation. Cheap when idle.
+    """
+    now = clock.monotonic()
+    for voice in _all_voices():
+        if voice.track is not None or voice.fade is not None or voice.gain_ramp is not None:
+            voice.pump(now)
+    if config.AUDIO_MULTI_VOICE and _station_mask:
+        _update_mix()
+
+def next_timeout() -> float | None:
+    """
+    Returns how soon update_crossfade() and update_streams() need to run
+    again, or when the next track ends, so the controller sees it finish.
+    None when nothing is fading, being fed or playing.
+    """
+    if _crossfade is not None or any(voice.fade is not None or voice.gain_ramp is not None
+                                     for voice in _all_voices()):
+        return config.FADE_STEP_MS / 1000.0
+    if any(voice.track is not None for voice in _channel_voices):
+        # Refill the queue well before the playing chunk runs out
+        return config.AUDIO_MMAP_CHUNK_MS / 4000.0
+    timeout = None
+    now = clock.monotonic()
+    for voice in _all_voices():
+        if voice.ends_at is None:
+            if voice is _music_voice and voice.get_busy():
+                # A streamed file whose length is unknown: check on it now and then
+                timeout = config.LOOP_DELAY_S if timeout is None else min(timeout, config.LOOP_DELAY_S)
+            continue
+        if not voice.get_busy():
+            voice.ends_at = None
+            continue
+        # The mixer may finish a buffer late: past the end, check again shortly
+        remaining = voice.ends_at - now
+        remaining = remaining if remaining > 0 else config.LOOP_DELAY_S
+        timeout = remaining if timeout is None else min(timeout, remaining)
+    return timeout
+
+def is_crossfading() -> bool:
+    """Checks if a crossfade is in progress."""
+    return _crossfade is not None
+
+def _cancel_crossfade():
+    """Drops the running crossfade; the caller takes over the voices."""
+    global _crossfade
+    _crossfade = None
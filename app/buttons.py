@@ -1,57 +1,157 @@
-import time
 import logging
-import RPi.GPIO as GPIO
+from collections import deque
+from typing import NamedTuple
+
+from . import clock, config, events
+from .gpio import GPIO
+
+class Gesture(NamedTuple):
+    kind: str     # 'short_press', 'long_press', 'double_press' or 'hold_repeat'
+    at: float     # Monotonic time of the edge (or hold threshold) it comes from
 
 class StartButton:
-    def __init__(self, pin, long_press_duration):
+    """
+    The start button, driven by edge callbacks.
+
+    The GPIO callback thread only timestamps each raw edge and queues it. The
+    main loop turns the edges into gestures in check_status(): a level counts
+    once it has been stable for `debounce_s` (bounces and glitches shorter
+    than that are dropped), and durations are measured between the edge
+    timestamps, not between polls, so a tap shorter than a tick still counts.
+
+    Gestures:
+        'short_press'   released before `long_press_duration`
+        'double_press'  pressed again within `double_press_s` of a short
+                        press (instead of a second short press)
+        'long_press'    held for `long_press_duration`, also when the press
+                        is the second half of a double press
+        'hold_repeat'   every `repeat_s` while held after a long press (off
+                        unless `repeat_s` is set)
+    """
+
+    def __init__(self, pin, long_press_duration, debounce_s: float | None = None,
+                 double_press_s: float | None = None, repeat_s: float | None = None):
         self.pin = pin
         self.long_press_duration = long_press_duration
+        self.debounce_s = config.BUTTON_DEBOUNCE_S if debounce_s is None else debounce_s
+        self.double_press_s = config.BUTTON_DOUBLE_PRESS_S if double_press_s is None else double_press_s
+        self.repeat_s = config.BUTTON_REPEAT_S if repeat_s is None else repeat_s
+        # Raw (time, pressed) edges, appended by the callback thread
+        self._edges = deque()
+        self._raw_pressed = False
+        # Debounced state, only used from the main loop
+        self._candidate = None  # (time, pressed) of a change not yet stable for debounce_s
         self._is_pressed = False
         self._press_start_time = 0.0
         self._long_press_triggered = False
+        self._double = False  # The current press is the second of a double press
+        self._next_repeat = 0.0
+        self._last_short = None  # Release time of the last short press
+        self.gestures = deque()
 
     def setup(self):
         """Configures the GPIO pin for the button."""
-        # Using internal pull-up resistor. 
+        # Using internal pull-up resistor.
         # Button should connect Pin -> Ground.
         GPIO.setup(self.pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        self._raw_pressed = GPIO.input(self.pin) == GPIO.LOW
+        if self._raw_pressed:
+            # Held since boot: counts from now
+            self._settle(clock.monotonic(), True)
+        GPIO.add_event_detect(self.pin, GPIO.BOTH, callback=self._on_edge)
         logging.info(f"Start button configured on GPIO {self.pin}")
 
+    def _on_edge(self, pin):
+        """GPIO callback: timestamps the edge and wakes up the main loop."""
+        # Re-read the level: with BOTH edges the callback does not say which one fired
+        pressed = GPIO.input(pin) == GPIO.LOW
+        if pressed != self._raw_pressed:
+            self._raw_pressed = pressed
+            self._edges.append((clock.monotonic(), pressed))
+            events.notify()
+
+    def _emit(self, kind: str, at: float):
+        logging.debug(f"Button gesture: {kind}")
+        self.gestures.append(Gesture(kind, at))
+
+    def _settle(self, t: float, pressed: bool):
+        """Applies a debounced change of the button level that happened at t."""
+        if pressed:
+            self._is_pressed = True
+            self._press_start_time = t
+            self._long_press_triggered = False
+            self._double = self._last_short is not None and t - self._last_short <= self.double_press_s
+            if self._double:
+                self._last_short = None
+                self._emit('double_press', t)
+            return
+        self._is_pressed = False
+        if not self._long_press_triggered and t >= self._press_start_time + self.long_press_duration:
+            # Released after the threshold, before a tick noticed it
+            self._hold(t)
+        if not self._long_press_triggered and not self._double:
+            self._last_short = t
+            self._emit('short_press', t)
+
+    def _hold(self, now: float):
+        """Emits the long press and hold repeats that are due while the button is held."""
+        if not self._long_press_triggered:
+            if now < self._press_start_time + self.long_press_duration:
+                return
+            self._long_press_triggered = True
+            self._next_repeat = self._press_start_time + self.long_press_duration
+            self._emit('long_press', self._next_repeat)
+        if self.repeat_s and now >= self._next_repeat + self.repeat_s:
+            self._next_repeat += self.repeat_s
+            if now - self._next_repeat >= self.repeat_s:
+                # Late by more than a repeat: one repeat, not a burst of them
+                self._next_repeat = now
+            self._emit('hold_repeat', self._next_repeat)
+
+    def _process(self, now: float):
+        while self._edges:
+            t, pressed = self._edges.popleft()
+            if self._candidate is not None and t >= self._candidate[0] + self.debounce_s:
+                # Stable until this edge: a real change
+                self._settle(*self._candidate)
+            # A bounce back to the debounced level cancels the change
+            self._candidate = (t, pressed) if pressed != self._is_pressed else None
+        # Compared as in next_timeout(), so waking at a deadline always meets it
+        if self._candidate is not None and now >= self._candidate[0] + self.debounce_s:
+            self._settle(*self._candidate)
+            self._candidate = None
+        if self._is_pressed:
+            # A release still being debounced may end the press before now
+            self._hold(now if self._candidate is None else min(now, self._candidate[0]))
+
+    def next_timeout(self) -> float | None:
+        """Returns when check_status() has something to do, or None while the button is idle."""
+        if self.gestures or self._edges:
+            return 0.0
+        now = clock.monotonic()
+        deadlines = []
+        if self._candidate is not None:
+            deadlines.append(self._candidate[0] + self.debounce_s)
+        if self._is_pressed:
+            if not self._long_press_triggered:
+                deadlines.append(self._press_start_time + self.long_press_duration)
+            elif self.repeat_s:
+                deadlines.append(self._next_repeat + self.repeat_s)
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - now)
+
     def check_status(self):
         """
-        Checks the button state and returns an event string if applicable.
-        
+        Returns the next queued gesture, if any.
+
         Returns:
             None: No action
-            'short_press': Button was pressed and released quickly
-            'long_press': Button was held down for the configured duration
+            'short_press', 'long_press', 'double_press' or 'hold_repeat'
         """
-        # Read state (LOW = Pressed because of Pull-Up)
-        is_active = (GPIO.input(self.pin) == GPIO.LOW)
-        current_time = time.time()
-        result = None
-
-        if is_active:
-            if not self._is_pressed:
-                # Edge: Just pressed
-                self._is_pressed = True
-                self._press_start_time = current_time
-                self._long_press_triggered = False
-            else:
-                # State: Held down
-                duration = current_time - self._press_start_time
-                if duration >= self.long_press_duration and not self._long_press_triggered:
-                    self._long_press_triggered = True
-                    result = 'long_press'
-        else:
-            if self._is_pressed:
-                # Edge: Just released
-                self._is_pressed = False
-                duration = current_time - self._press_start_time
-                
-                # If it wasn't a long press, it's a short press
-                # (Simple debounce: ignore < 50ms presses)
-                if not self._long_press_triggered and duration > 0.05:
-                    result = 'short_press'
-                
-        return result
\ No newline at end of file
+        if not (self._edges or self._candidate or self._is_pressed or self.gestures):
+            return None  # Idle: nothing to do
+        self._process(clock.monotonic())
+        if self.gestures:
+            return self.gestures.popleft().kind
+        return None
@@ -0,0 +1,37 @@
+"""
+Time source for the control logic.
+
+Defaults to time.monotonic(). The replayer swaps in a VirtualClock so a
+recorded session runs faster than real time with the same timing decisions.
+Hardware timing (motor PWM, LED frames) always uses real time.
+"""
+import time
+
+_source = time.monotonic
+
+def monotonic() -> float:
+    """Returns the current time in seconds from the active time source."""
+    return _source()
+
+def use(source):
+    """Replaces the time source with a callable returning seconds."""
+    global _source
+    _source = source
+
+def reset():
+    """Goes back to the real monotonic clock."""
+    use(time.monotonic)
+
+class VirtualClock:
+    """A clock that only moves when told to."""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance_to(self, timestamp: float):
+        """Moves the clock forward to timestamp (never backwards)."""
+        if timestamp > self.now:
+            self.now = timestamp
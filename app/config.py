@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # --- Paths and Filenames ---
@@ -8,9 +9,20 @@ PROJECT_ROOT = Path(__file__).parent.parent
 # Directory where audio files are stored
 AUDIO_DIR = PROJECT_ROOT / "audios"
 
-# Mapping of audio filenames by index (1 to 10)
-# The system will look for these files in AUDIO_DIR
-AUDIO_FILES = {i: f"audio{i}.mp3" for i in range(1, 11)}
+# Cache of tracks converted to the mixer format and loudness-normalized
+# (see app/transcode.py)
+AUDIO_CACHE_DIR = PROJECT_ROOT / "audio_cache"
+
+# Station table: the sensor pin, motor pin and audio file (in AUDIO_DIR) of
+# each constellation, plus per-station settings. See app/stations.py.
+STATIONS_FILE = Path(os.environ.get("DOME_STATIONS", PROJECT_ROOT / "stations.toml"))
+
+
+# --- Runtime Backend ---
+
+# 'rpi' drives the real hardware; 'sim' uses the simulated GPIO backend
+# (app/fake_gpio.py) so the service can run without a Raspberry Pi.
+BACKEND = os.environ.get("DOME_BACKEND", "rpi")
 
 
 # --- Hardware Configuration (GPIO pins in BCM mode) ---
@@ -18,33 +30,30 @@ AUDIO_FILES = {i: f"audio{i}.mp3" for i in range(1, 11)}
 # Output pin for the feedback LED
 LED_PIN = 11
 
-# Input pins for the KY-033 sensors
-SENSOR_PINS = [
-    4,   # Sensor 1
-    5,   # Sensor 2
-    6,   # Sensor 3
-    12,  # Sensor 4
-    13,  # Sensor 5
-    17,  # Sensor 6
-    18,  # Sensor 7
-    19,  # Sensor 8
-    20,  # Sensor 9
-    21,  # Sensor 10
-]
-
-# Output pins for the ULN2803A driver (ERM motors)
-MOTOR_PINS = [
-    16,  # Motor 1
-    22,  # Motor 2
-    23,  # Motor 3
-    24,  # Motor 4
-    25,  # Motor 5
-    26,  # Motor 6
-    27,  # Motor 7
-    8,   # Motor 8
-    9,   # Motor 9
-    10,  # Motor 10
-]
+# The sensor (KY-033) and motor (ULN2803A input) pins are set per station in
+# STATIONS_FILE
+
+
+# --- Sensor Filtering ---
+
+# Sampling period in milliseconds while a sensor is changing. Once every
+# sensor has settled, no samples are taken until the next edge.
+SENSOR_SAMPLE_MS = 10
+
+# N-of-M majority vote: a sensor changes state when at least
+# SENSOR_VOTE_THRESHOLD of the last SENSOR_VOTE_WINDOW samples agree
+SENSOR_VOTE_WINDOW = 5
+SENSOR_VOTE_THRESHOLD = 3
+
+# Exponential moving average per sensor (0..1). It must rise above
+# SENSOR_EMA_ON to turn on and fall below SENSOR_EMA_OFF to turn off.
+SENSOR_EMA_ALPHA = 0.3
+SENSOR_EMA_ON = 0.6
+SENSOR_EMA_OFF = 0.4
+
+# Minimum time in milliseconds a filtered state is held before it can change
+SENSOR_MIN_ON_MS = 100
+SENSOR_MIN_OFF_MS = 100
 
 
 # --- Behavior Parameters ---
@@ -58,20 +67,143 @@ START_BUTTON_PIN = 7
 # Time in seconds to hold the button to restart the experience
 BUTTON_LONG_PRESS_S = 3.0
 
+# Button debounce: a press or release counts once the level has been stable
+# this long (seconds). Shorter bounces and glitches are ignored.
+BUTTON_DEBOUNCE_S = 0.03
+# A second press within this many seconds of a short press is a double press
+BUTTON_DOUBLE_PRESS_S = 0.4
+# While the button is held past a long press, a hold repeat every this many
+# seconds; None disables them. No controller action uses them yet.
+BUTTON_REPEAT_S = None
+
 # Name of the intro audio file
 INTRO_AUDIO_FILE = "intro.mp3"
 
 # Time in seconds a sensor must be active to trigger an audio change
+# (default for stations that do not set dwell_s)
 DWELL_SECONDS = 3.0
 
+# Who gets the audio when several sensors are active at once:
+#   'earliest_arrival' - first come, first served
+#   'longest_dwell'    - most presence over the last ARBITRATION_WINDOW_S
+#   'round_robin'      - active sensors take turns once the current audio ends
+ARBITRATION_POLICY = 'earliest_arrival'
+
+# Time window in seconds for the 'longest_dwell' policy
+ARBITRATION_WINDOW_S = 30.0
+
 # Duration of the confirmation vibration pulse in milliseconds
 PULSE_MS = 250
 
+# Haptic patterns for the ERM motors: name -> list of
+# (duration_ms, start_intensity, end_intensity) segments. Intensity is the
+# PWM duty cycle (0.0 to 1.0); a segment with different start and end
+# intensities is a linear ramp.
+HAPTIC_PATTERNS = {
+    'pulse': [(PULSE_MS, 1.0, 1.0)],
+    'soft': [(PULSE_MS, 0.4, 0.4)],
+    'ramp_up': [(600, 0.2, 1.0)],
+    'ramp_down': [(600, 1.0, 0.2)],
+    'double_tap': [(80, 1.0, 1.0), (100, 0.0, 0.0), (80, 1.0, 1.0)],
+    'heartbeat': [(90, 1.0, 1.0), (110, 0.0, 0.0), (140, 0.6, 0.6), (500, 0.0, 0.0),
+                  (90, 1.0, 1.0), (110, 0.0, 0.0), (140, 0.6, 0.6)],
+}
+
+# Pattern played on the motor of a sensor when its audio starts
+# (default for stations that do not set pattern)
+HAPTIC_PATTERN = 'pulse'
+
+# Software PWM frequency in Hz for the motor intensity levels
+MOTOR_PWM_HZ = 50
+
 # Duration of the audio fade-in/fade-out in milliseconds
+# (default for stations that do not set fade_ms)
 FADE_MS = 500
 
-# Delay in the main loop in seconds (controls reactivity)
-LOOP_DELAY_S = 0.05  # 50 ms, equivalent to 20 reads per second
+# Volume curve used when crossfading between sensors: 'linear' or 'equal_power'
+FADE_CURVE = 'equal_power'
+
+# Interval in milliseconds between volume updates during a crossfade
+FADE_STEP_MS = 20
+
+# The main loop blocks until an edge, a message or its next deadline (a
+# fade step, a debounce, a dwell or the end of a track). This paces the
+# end-of-audio checks only when the mixer is late to finish a track, or for
+# a streamed file whose length is unknown (seconds).
+LOOP_DELAY_S = 0.05  # 50 ms
+
+# Loop lag monitor of the asyncio runtime (--asyncio): sampling interval, and
+# how often the mean and max lag are logged, in seconds
+LOOP_LAG_INTERVAL_S = 0.1
+LOOP_LAG_REPORT_S = 60.0
+
+# Console log level: 'DEBUG', 'INFO', 'WARNING' or 'ERROR'
+LOG_LEVEL = 'INFO'
+
+# Repeating messages (e.g. a visitor hovering between two sensors) are logged
+# at most once per this many seconds each
+LOG_RATE_LIMIT_S = 5.0
+
+# Compact binary log of every record at LOG_EVENT_LEVEL or above, for
+# post-mortem analysis (read it with `python -m app.log PATH`). None disables
+# it. Rotated to PATH.1 when it reaches LOG_EVENT_FILE_MAX_BYTES.
+LOG_EVENT_FILE = None
+LOG_EVENT_LEVEL = 'DEBUG'
+LOG_EVENT_FILE_MAX_BYTES = 8 * 1024 * 1024
+
+# Visitor analytics (see app/analytics.py): activations, dwells, switches,
+# departures and intro skips are appended to fixed-width binary segments in
+# ANALYTICS_DIR every ANALYTICS_FLUSH_S seconds, and rolled up into per-hour,
+# per-station tables in the SQLite database ANALYTICS_DB every
+# ANALYTICS_ROLLUP_S. A new segment is started past
+# ANALYTICS_SEGMENT_MAX_BYTES; the oldest are deleted past
+# ANALYTICS_KEEP_SEGMENTS once rolled up. Off by default: it writes to the
+# SD card all day.
+ANALYTICS_ENABLED = False
+ANALYTICS_DIR = PROJECT_ROOT / "analytics"
+ANALYTICS_DB = ANALYTICS_DIR / "rollup.sqlite3"
+ANALYTICS_FLUSH_S = 5.0
+ANALYTICS_ROLLUP_S = 600.0
+ANALYTICS_SEGMENT_MAX_BYTES = 4 * 1024 * 1024
+ANALYTICS_KEEP_SEGMENTS = 16
+# Upper bounds, in seconds, of the visit duration histogram buckets
+ANALYTICS_DWELL_BUCKETS_S = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+# Coordination with other domes over UDP (see app/netbus.py): state changes
+# are published, and pressing start on one dome starts the intro on every
+# waiting dome at the same moment, NETBUS_INTRO_LEAD_MS after the press.
+# Domes find each other on the multicast group, or through NETBUS_PEERS
+# ("host:port" unicast addresses) if the network drops multicast.
+NETBUS_ENABLED = False
+NETBUS_GROUP = '239.255.77.77'
+NETBUS_PORT = 47800
+NETBUS_INTERFACE = '0.0.0.0'
+NETBUS_PEERS = []
+NETBUS_TTL = 1
+# Unique per dome; None derives one from the host name, which stays the same
+# across restarts. Set it when running several domes on one host.
+NETBUS_NODE_ID = None
+# Interval in seconds between clock offset measurements
+NETBUS_SYNC_INTERVAL_S = 2.0
+NETBUS_INTRO_LEAD_MS = 150
+# Pattern played on a station's motor when another dome starts that station
+# (a cross-dome effect); None disables it
+NETBUS_ECHO_PATTERN = 'soft'
+
+# Supervisor (python -m app.main --supervise, see app/supervisor.py): a main
+# loop iteration longer than SUPERVISOR_STALL_S seconds is a stall, and the
+# subsystem it was stuck in (mixer, LED or motors) is restarted. Past
+# SUPERVISOR_FATAL_STALL_S the process exits for systemd to restart it.
+SUPERVISOR_STALL_S = 2.0
+SUPERVISOR_FATAL_STALL_S = 30.0
+# Errors recovered from per minute before giving up (a crash loop)
+SUPERVISOR_MAX_RESTARTS_PER_MIN = 5
+
+# Metrics endpoint (Prometheus text format) on 127.0.0.1:METRICS_PORT, or on
+# the Unix socket METRICS_SOCKET if set. Off by default: it opens a listener.
+METRICS_ENABLED = False
+METRICS_PORT = 9101
+METRICS_SOCKET = None
 
 
 # --- Audio Configuration (Pygame Mixer) ---
@@ -87,3 +219,54 @@ MIXER_CHANNELS = 2
 
 # Buffer size (power of 2 recommended)
 MIXER_BUFFER = 2048
+
+# Decode all tracks into memory at startup so switching never touches the SD card
+AUDIO_PRELOAD = True
+
+# Play tracks from the transcode cache (AUDIO_CACHE_DIR) when available
+AUDIO_USE_CACHE = True
+
+# Loudness every track is normalized to, in LUFS (-23 is the EBU R128 target)
+LOUDNESS_TARGET_LUFS = -23.0
+
+# Ceiling for the sample peak after normalization, in dBFS. Quiet tracks with
+# loud peaks get less gain rather than clip.
+LOUDNESS_MAX_PEAK_DBFS = -1.0
+
+# Play tracks that are in the transcode cache straight from their PCM through
+# mmap, one chunk at a time, instead of decoding them into memory. Meant for
+# Pis with little RAM: the kernel page cache holds the tracks in use.
+AUDIO_MMAP = False
+
+# Length in milliseconds of each chunk handed to the mixer in mmap playback
+AUDIO_MMAP_CHUNK_MS = 1000
+
+# Multi-voice mode: every station with a visitor plays its own track on its
+# own mixer channel, instead of the dome following a single station. The
+# first visitor is served right away, later ones after their dwell time.
+AUDIO_MULTI_VOICE = False
+
+# Maximum number of stations sounding at once in multi-voice mode. When they
+# are all busy, a new visitor takes over the voice of a station whose visitor
+# has left, or else of a station with a lower priority (see stations.toml).
+AUDIO_MAX_VOICES = 4
+
+# Gain of each voice when several play at once:
+#   'equal_amplitude' - 1/n: the mix can never clip
+#   'equal_power'     - 1/sqrt(n): the mix stays as loud as a single track
+AUDIO_VOICE_GAIN = 'equal_amplitude'
+
+# Memory budget in MB for decoded tracks. Least recently used tracks are evicted
+# when it is exceeded; a track larger than the whole budget is always streamed.
+AUDIO_PRELOAD_BUDGET_MB = 256
+
+# Watch AUDIO_DIR and swap in added, changed or removed tracks while running.
+# The track that is playing is never cut off.
+AUDIO_HOT_RELOAD = True
+
+# Seconds the directory must stay quiet before a reload, so a sync in
+# progress is picked up once it has finished
+AUDIO_RELOAD_DELAY_S = 2.0
+
+# Polling interval in seconds when inotify is not available
+AUDIO_WATCH_POLL_S = 5.0
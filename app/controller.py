@@ -1,23 +1,45 @@
 import time
 import logging
 
-from . import config, sensors, motors, audio
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from . import clock, config, sensors, motors, audio, arbitration, metrics, analytics, netbus, stations
+from .timer_wheel import TimerWheel
 
 STATE_WAITING = 'waiting'
 STATE_INTRO = 'intro'
 STATE_RUNNING = 'running'
 
+# Dwell timer wheel: 50 ms slots, one turn every 12.8 s. Timers fire at their
+# exact deadline whatever the slot width; it only sets how they are bucketed.
+_DWELL_TICK_S = 0.05
+_DWELL_SLOTS = 256
+
 class DomeController:
     def __init__(self, led, button):
         self.led = led
         self.button = button
         self.current_sensor_index: int | None = None
         self.pending_sensor_index: int | None = None
-        self.dwell_timer_start: float | None = None
-        
+        # Multi-voice mode: bit i is set while station i has a visitor and has
+        # been given a voice. current_sensor_index is the latest one started.
+        self.active_stations = 0
+        # Synchronized intro (network bus): when to start it, on our clock
+        self._intro_at: float | None = None
+        self._published = None
+        # Per-station settings, indexed by sensor index
+        self.table = stations.table
+        # The sensor waiting to take over from the current one (every station
+        # waiting for a voice, in multi-voice mode) runs a dwell timer, keyed
+        # by sensor index. A sensor's bit is set in _dwelling while it
+        # is a candidate, and in _dwelled once its timer has fired.
+        self.dwell_timers = TimerWheel(_DWELL_TICK_S, _DWELL_SLOTS)
+        self._dwelling = 0
+        self._dwelled = 0
+        self._last_active = 0
+        # When the visitor at each station arrived, for the analytics
+        self._arrived = [0.0] * self.table.count
+        self._intro_started = 0.0
+        self.arbiter = arbitration.create_policy(config.ARBITRATION_POLICY, self.table.count)
+
         if config.DEBUG_SKIP_START_BUTTON:
             self.state = STATE_RUNNING
             logging.info("Debug mode: Skipping start button.")
@@ -31,18 +53,158 @@ class DomeController:
         audio.stop_audio()
         self.current_sensor_index = None
         self.pending_sensor_index = None
-        self.dwell_timer_start = None
+        self.active_stations = 0
+        self._intro_at = None
+        self._clear_dwell()
         
         if config.DEBUG_SKIP_START_BUTTON:
-            self.state = STATE_RUNNING
+            self._set_state(STATE_RUNNING)
             self.led.set_mode('pulsing')
         else:
-            self.state = STATE_WAITING
+            self._set_state(STATE_WAITING)
             self.led.set_mode('pulsing')
 
+    def reset(self):
+        """Returns to the initial state, e.g. after the supervisor recovered from an error."""
+        self._reset_to_start()
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            metrics.state_transitions.inc(self.state, state)
+            self.state = state
+
+    def _clear_dwell(self):
+        self.dwell_timers.clear()
+        self._dwelling = self._dwelled = self._last_active = 0
+
+    def _track_dwell(self, candidates: int, active_mask: int, activated_at):
+        """
+        Starts a dwell timer for each sensor that becomes a candidate (active,
+        and waiting to be served), cancels the timers of those that stop being
+        one and collects the timers that have fired.
+        """
+        changed = candidates ^ self._dwelling
+        if changed:
+            now = clock.monotonic()
+            for i in range(self.table.count):
+                bit = 1 << i
+                if not changed & bit:
+                    continue
+                if candidates & bit:
+                    # A new visitor dwells from the moment the filter saw them; a
+                    # sensor that was already active (e.g. the previous current
+                    # one) starts dwelling now
+                    start = now if self._last_active & bit else activated_at[i]
+                    self.dwell_timers.schedule(i, start + self.table.dwell_s[i])
+                else:
+                    self.dwell_timers.cancel(i)
+            self._dwelling = candidates
+            self._dwelled &= candidates
+        if active_mask != self._last_active:
+            self._track_visits(active_mask, activated_at)
+        self._last_active = active_mask
+        if self.dwell_timers:
+            now = clock.monotonic()
+            for i in self.dwell_timers.expire(now):
+                self._dwelled |= 1 << i
+                analytics.record(analytics.EVENT_DWELL, i, value=now - self._arrived[i])
+
+    def _track_visits(self, active_mask: int, activated_at):
+        """Notes when visitors arrive, and records how long they stayed when they leave."""
+        arrived = active_mask & ~self._last_active
+        left = self._last_active & ~active_mask
+        for i in range(self.table.count):
+            if arrived >> i & 1:
+                self._arrived[i] = activated_at[i]
+            elif left >> i & 1:
+                analytics.record(analytics.EVENT_LEAVE, i, value=activated_at[i] - self._arrived[i])
+
+    def _count_cancel(self, sensor_index: int):
+        """Counts a canceled switch to a sensor whose dwell had not completed."""
+        metrics.dwell_cancellations.inc(sensor_index + 1)
+        analytics.record(analytics.EVENT_CANCEL, sensor_index, value=clock.monotonic() - self._arrived[sensor_index])
+
+    def next_timeout(self) -> float | None:
+        """
+        Returns how long the main loop may block before calling update() again,
+        or None to block until an edge or another event wakes it up.
+        """
+        timeouts = []
+        audio_timeout = audio.next_timeout()
+        if audio_timeout is not None:
+            # A fade is running, a memory-mapped track needs its next chunk or a track ends
+            timeouts.append(audio_timeout)
+        sensor_timeout = sensors.next_timeout()
+        if sensor_timeout is not None:
+            # A sensor is still being debounced and needs another sample
+            timeouts.append(sensor_timeout)
+        button_timeout = self.button.next_timeout()
+        if button_timeout is not None:
+            # A press is being debounced or timed, or gestures are queued
+            timeouts.append(button_timeout)
+        if self._intro_at is not None:
+            # Start a synchronized intro on time
+            timeouts.append(max(0.0, self._intro_at - clock.monotonic()))
+        dwell_deadline = self.dwell_timers.next_deadline()
+        if dwell_deadline is not None:
+            # Wake up exactly when the next dwell time is reached
+            timeouts.append(max(0.0, dwell_deadline - clock.monotonic()))
+        return min(timeouts, default=None)
+
     def update(self):
         """Main method called in each iteration of the main loop."""
-        
+        start = time.perf_counter()
+        try:
+            self._tick()
+            if netbus.is_running():
+                self._publish()
+        finally:
+            metrics.tick_seconds.observe(time.perf_counter() - start)
+
+    def _publish(self):
+        """Tells the other domes when the state or the served stations change."""
+        if config.AUDIO_MULTI_VOICE:
+            served = self.active_stations
+        else:
+            served = 0 if self.current_sensor_index is None else 1 << self.current_sensor_index
+        snapshot = (self.state, self.current_sensor_index, served)
+        if snapshot != self._published:
+            self._published = snapshot
+            netbus.publish_state(*snapshot)
+
+    def _handle_bus(self, kind, value):
+        if kind == netbus.MSG_INTRO:
+            if self.state == STATE_WAITING and (self._intro_at is None or value < self._intro_at):
+                logging.info("Another dome started: starting the intro with it.")
+                self._intro_at = value
+        elif kind == netbus.MSG_STATE:
+            # Cross-dome effect: a buzz on the station another dome just started
+            if (config.NETBUS_ECHO_PATTERN and self.state == STATE_RUNNING
+                    and value.station < self.table.count):
+                motors.play_pattern(value.station, config.NETBUS_ECHO_PATTERN)
+
+    def _start_intro(self):
+        if audio.has_intro():
+            logging.info("Start button pressed. Playing intro.")
+            analytics.record(analytics.EVENT_INTRO)
+            self._intro_started = clock.monotonic()
+            self._set_state(STATE_INTRO)
+            audio.play_intro()
+            self.led.set_mode('on')
+        else:
+            logging.warning("Start button pressed. Intro missing, skipping directly to sensors. Add a intro.mp3 file to the audios folder.")
+            self._set_state(STATE_RUNNING)
+            self.led.set_mode('pulsing')
+
+    def _tick(self):
+        # Swap in a reloaded audio library, advance a running crossfade and
+        # feed memory-mapped tracks (all no-ops otherwise)
+        audio.apply_pending_reload()
+        audio.update_crossfade()
+        audio.update_streams()
+        for kind, value in netbus.drain():
+            self._handle_bus(kind, value)
+
         # --- Button & State Management ---
         btn_event = self.button.check_status()
         
@@ -52,43 +214,65 @@ class DomeController:
             return
 
         if self.state == STATE_WAITING:
-            if btn_event == 'short_press':
-                if audio.has_intro():
-                    logging.info("Start button pressed. Playing intro.")
-                    self.state = STATE_INTRO
-                    audio.play_intro()
-                    self.led.set_mode('on')
+            # A double press starts the experience too: its first tap may have
+            # been spent in another state (e.g. skipping an intro) just before
+            if btn_event in ('short_press', 'double_press') and self._intro_at is None:
+                if netbus.is_running():
+                    # Every waiting dome starts its intro at the same moment
+                    self._intro_at = netbus.announce_intro()
                 else:
-                    logging.warning("Start button pressed. Intro missing, skipping directly to sensors. Add a intro.mp3 file to the audios folder.")
-                    self.state = STATE_RUNNING
-                    self.led.set_mode('pulsing')
+                    self._start_intro()
+            if self._intro_at is not None and clock.monotonic() >= self._intro_at:
+                self._intro_at = None
+                self._start_intro()
             return
 
         if self.state == STATE_INTRO:
             # Allow skipping intro with short press
             if btn_event == 'short_press':
                 logging.info("Intro skipped by user.")
+                analytics.record(analytics.EVENT_INTRO_SKIP, value=clock.monotonic() - self._intro_started)
                 audio.stop_audio(fade_out_ms=500)
-                self.state = STATE_RUNNING
+                self._set_state(STATE_RUNNING)
                 self.led.set_mode('pulsing')
                 return
+            if btn_event == 'double_press':
+                # The second tap of the double tap that started the intro: not a skip
+                logging.info("Double press during the intro: not skipping it.")
 
             if not audio.is_playing():
                 logging.info("Intro finished. Enabling sensors.")
-                self.state = STATE_RUNNING
+                self._set_state(STATE_RUNNING)
                 self.led.set_mode('pulsing')
             return
 
         # --- Sensor Logic ---
-        active_sensor_index = sensors.read_active_sensor()
+        # Sensors without an audio file are ignored; the arbitration policy
+        # picks one sensor when several visitors are present.
+        active_mask, activated_at = sensors.read_active_sensors()
+        active_mask &= audio.get_audio_mask()
+        if config.AUDIO_MULTI_VOICE:
+            self._update_stations(active_mask, activated_at)
+            return
+        active_sensor_index = self.arbiter.select(
+            active_mask, activated_at, self.current_sensor_index, clock.monotonic(), audio.is_playing()
+        )
+        # Only the sensor the policy picks over the current one dwells: a
+        # visitor waiting behind the current one starts dwelling when it
+        # leaves, not on arrival
+        candidates = 0
+        if active_sensor_index is not None and active_sensor_index != self.current_sensor_index:
+            candidates = 1 << active_sensor_index
+        self._track_dwell(candidates, active_mask, activated_at)
 
         # Case 1: No sensor is active
         if active_sensor_index is None:
             # If we were waiting to switch to a sensor, cancel the wait.
             if self.pending_sensor_index is not None:
-                logging.info(f"Canceled switch to sensor {self.pending_sensor_index + 1}.")
+                logging.info(f"Canceled switch to sensor {self.pending_sensor_index + 1}.",
+                             extra={'rate_key': ('dwell_cancel', self.pending_sensor_index)})
+                self._count_cancel(self.pending_sensor_index)
                 self.pending_sensor_index = None
-                self.dwell_timer_start = None
                 
                 # Restore LED state
                 if self.current_sensor_index is not None:
@@ -104,10 +288,6 @@ class DomeController:
 
             return
 
-        # Ignore sensors that don't have an associated audio file
-        if not audio.has_audio_for_sensor(active_sensor_index):
-            return
-
         # Case 2: It's the first sensor to be activated
         if self.current_sensor_index is None:
             self._activate_new_sensor(active_sensor_index)
@@ -115,58 +295,103 @@ class DomeController:
 
         # Case 3: The active sensor is the same as the current one
         if active_sensor_index == self.current_sensor_index:
-            # Debug: Log every 5 seconds if we are stuck on the same sensor
-            if time.time() % 5 < config.LOOP_DELAY_S * 2: # Approximate check
-                 logging.debug(f"Still detecting sensor {active_sensor_index + 1}")
+            # Debug: rate-limited to one message per LOG_RATE_LIMIT_S. Runs on
+            # every tick, so nothing is formatted unless debug records are kept.
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(f"Still detecting sensor {active_sensor_index + 1}",
+                              extra={'rate_key': ('still_detecting', active_sensor_index)})
 
             # If a switch was pending, cancel it because the user returned to the current sensor.
             if self.pending_sensor_index is not None:
                 logging.info(f"Remained on sensor {self.current_sensor_index + 1}, canceling pending switch.")
+                self._count_cancel(self.pending_sensor_index)
                 self.pending_sensor_index = None
-                self.dwell_timer_start = None
                 self.led.set_mode('on') # Restore LED to solid on
             return
 
         # Case 4: A different sensor is detected
         if active_sensor_index != self.current_sensor_index:
-            # If we are already waiting on this sensor, check if the dwell time has passed
-            if active_sensor_index == self.pending_sensor_index:
-                if self.dwell_timer_start and (time.time() - self.dwell_timer_start >= config.DWELL_SECONDS):
-                    logging.info(f"Confirmed switch to sensor {active_sensor_index + 1} after {config.DWELL_SECONDS}s.")
-                    self._switch_to_sensor(active_sensor_index)
-            else:
-                # This is the first time we see this new sensor, start the timer
-                logging.info(f"Sensor {active_sensor_index + 1} detected. Starting {config.DWELL_SECONDS}s timer to switch.")
+            # Switch once the sensor's dwell timer has fired
+            if self._dwelled >> active_sensor_index & 1:
+                logging.info(f"Confirmed switch to sensor {active_sensor_index + 1} after {self.table.dwell_s[active_sensor_index]}s.")
+                self._switch_to_sensor(active_sensor_index)
+            elif active_sensor_index != self.pending_sensor_index:
+                # This is the first time this sensor is picked: wait for its timer
+                if self.pending_sensor_index is not None:
+                    self._count_cancel(self.pending_sensor_index)
+                logging.info(f"Sensor {active_sensor_index + 1} detected. Switching after {self.table.dwell_s[active_sensor_index]}s dwell.",
+                             extra={'rate_key': ('dwell_start', active_sensor_index)})
                 self.pending_sensor_index = active_sensor_index
-                self.dwell_timer_start = time.time()
                 self.led.set_mode('fast_blinking')  # Indicates that confirmation is pending
 
+    def _update_stations(self, active_mask: int, activated_at):
+        """Multi-voice mode: every station with a visitor plays its own audio."""
+        # Visitors who left: their audio plays on, but its voice can be taken over
+        left = self.active_stations & ~active_mask
+        if left:
+            for i in range(self.table.count):
+                if left >> i & 1:
+                    logging.info(f"Visitor left station {i + 1}.")
+                    audio.release_station(i)
+            self.active_stations &= active_mask
+
+        waiting = active_mask & ~self.active_stations
+        self._track_dwell(waiting, active_mask, activated_at)
+        if waiting:
+            sounding = audio.get_station_mask()
+            # First come, first served
+            for i in sorted((i for i in range(self.table.count) if waiting >> i & 1),
+                            key=activated_at.__getitem__):
+                # The first visitor is served right away, the others after their dwell time
+                if (self.active_stations or sounding) and not self._dwelled >> i & 1:
+                    continue
+                started, taken = audio.play_station(i, self.table.fade_ms[i], self.table.priorities[i])
+                if not started:
+                    logging.debug(f"No voice free for station {i + 1}.", extra={'rate_key': ('no_voice', i)})
+                    continue
+                if taken is not None:
+                    # Its visitor waits for a voice again
+                    self.active_stations &= ~(1 << taken)
+                metrics.activations.inc(i + 1)
+                analytics.record(analytics.EVENT_ACTIVATION, i, value=clock.monotonic() - self._arrived[i])
+                self.active_stations |= 1 << i
+                sounding |= 1 << i
+                self.current_sensor_index = i
+                motors.play_pattern(i, self.table.patterns[i])
+
+        if self.current_sensor_index is not None and not (self.active_stations or audio.is_playing()):
+            logging.info("All stations finished. Resetting state.")
+            self.current_sensor_index = None
+        self.led.set_mode('on' if self.active_stations else 'pulsing')
+
     def _activate_new_sensor(self, sensor_index: int):
         """Activates a sensor for the first time."""
         logging.info(f"Activating new sensor: {sensor_index + 1}")
+        metrics.activations.inc(sensor_index + 1)
+        analytics.record(analytics.EVENT_ACTIVATION, sensor_index, value=clock.monotonic() - self._arrived[sensor_index])
         self.current_sensor_index = sensor_index
+        self.arbiter.served(sensor_index)
         self.led.set_mode('on')  # Solid LED while active
-        motors.pulse(sensor_index)
+        motors.play_pattern(sensor_index, self.table.patterns[sensor_index])
         
         # Always play audio for new sensor activation
-        audio.play_audio(sensor_index, fade_in_ms=config.FADE_MS)
+        audio.play_audio(sensor_index, fade_in_ms=self.table.fade_ms[sensor_index])
 
     def _switch_to_sensor(self, new_sensor_index: int):
         """Performs the switch from one sensor to another after the dwell time."""
-        # 1. Stop the current audio with a fade-out
-        if audio.is_playing():
-            audio.stop_audio(fade_out_ms=config.FADE_MS)
-            # Allow time for the fade-out before starting the new audio
-            time.sleep(config.FADE_MS / 1000.0)
+        metrics.switches.inc(new_sensor_index + 1)
+        analytics.record(analytics.EVENT_SWITCH, new_sensor_index, other=self.current_sensor_index,
+                         value=clock.monotonic() - self._arrived[new_sensor_index])
 
-        # 2. Update the state
+        # 1. Update the state
         self.current_sensor_index = new_sensor_index
+        self.arbiter.served(new_sensor_index)
         self.led.set_mode('on') # The new sensor is now active
         self.pending_sensor_index = None
-        self.dwell_timer_start = None
 
-        # 3. Pulse the new motor
-        motors.pulse(new_sensor_index)
+        # 2. Pulse the new motor
+        motors.play_pattern(new_sensor_index, self.table.patterns[new_sensor_index])
 
-        # 4. Play the new audio with a fade-in
-        audio.play_audio(new_sensor_index, fade_in_ms=config.FADE_MS)
+        # 3. Crossfade to the new audio. This returns immediately; update()
+        #    advances the fade on each tick so the loop keeps running.
+        audio.crossfade_to(new_sensor_index, self.table.fade_ms[new_sensor_index], config.FADE_CURVE)
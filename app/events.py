@@ -0,0 +1,68 @@
+"""
+Wake-up signal for the main loop.
+
+Edge callbacks call notify() when an input changes; the main loop blocks in
+wait() instead of sleeping, so it runs as soon as something happens.
+
+Under the asyncio runtime (app/aio_runtime.py) the loop is attached with
+attach_loop(), and notify() also wakes wait_async() through
+loop.call_soon_threadsafe, since GPIO callbacks run on other threads.
+"""
+import threading
+
+_event = threading.Event()
+_loop = None
+_async_event = None
+
+def notify():
+    """Wakes up the main loop. Safe to call from any thread."""
+    _event.set()
+    loop = _loop
+    if loop is not None:
+        try:
+            loop.call_soon_threadsafe(_async_event.set)
+        except RuntimeError:
+            pass  # The loop closed while we were being notified
+
+def wait(timeout: float | None = None) -> bool:
+    """
+    Blocks until notify() is called or the timeout expires.
+
+    Returns:
+        bool: True if woken by notify(), False on timeout.
+    """
+    notified = _event.wait(timeout)
+    # Clearing after the wait is safe: whatever triggered the notification
+    # already updated its state, and the caller reads it next.
+    _event.clear()
+    return notified
+
+def attach_loop(loop):
+    """Routes notify() to an asyncio loop. Call from the loop's thread."""
+    global _loop, _async_event
+    import asyncio  # Only the asyncio runtime pays for importing it
+    _async_event = asyncio.Event()
+    _loop = loop
+
+def detach_loop():
+    """Stops routing notify() to the asyncio loop."""
+    global _loop
+    _loop = None
+
+async def wait_event(event, timeout: float | None = None) -> bool:
+    """Awaits an asyncio.Event with a timeout. Returns True if it was set."""
+    import asyncio
+    if timeout is None:
+        await event.wait()
+        return True
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+async def wait_async(timeout: float | None = None) -> bool:
+    """Async counterpart of wait(), for a loop set with attach_loop()."""
+    notified = await wait_event(_async_event, timeout)
+    _async_event.clear()
+    return notified
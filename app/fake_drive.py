@@ -0,0 +1,86 @@
+"""
+Simulated stand-in for the Google Drive v3 client used by sync_drive_audios.py.
+
+Serves the audio files of a local directory as if they were in a Drive
+folder: files().list() returns their metadata (id, name, mimeType,
+modifiedTime, md5Checksum, size) and files().get_media() honours HTTP
+Range headers. Set `fail_after_bytes` to make downloads break midway and
+exercise resuming.
+"""
+import os
+import hashlib
+import mimetypes
+from datetime import datetime, timezone
+
+_MIME_TYPES = {'.mp3': 'audio/mpeg', '.wav': 'audio/wav'}
+
+class FakeDriveError(IOError):
+    """Raised for injected download failures."""
+
+class _Request:
+    def __init__(self, execute, headers=None):
+        self._execute = execute
+        self.headers = headers if headers is not None else {}
+
+    def execute(self):
+        return self._execute(self)
+
+class _Files:
+    def __init__(self, service):
+        self._service = service
+
+    def list(self, q=None, spaces=None, fields=None, pageToken=None, pageSize=2):
+        # Small pages so pagination is exercised too
+        entries = self._service.entries()
+        start = int(pageToken or 0)
+        page = entries[start:start + pageSize]
+        resp = {'files': page}
+        if start + pageSize < len(entries):
+            resp['nextPageToken'] = str(start + pageSize)
+        return _Request(lambda request: resp)
+
+    def get_media(self, fileId):
+        return _Request(lambda request: self._service.read(fileId, request.headers.get('Range')))
+
+class FakeDriveService:
+    def __init__(self, directory, fail_after_bytes=None):
+        self.directory = directory
+        self.fail_after_bytes = fail_after_bytes
+        self.bytes_served = 0
+
+    def files(self):
+        return _Files(self)
+
+    def entries(self):
+        entries = []
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            mime = _MIME_TYPES.get(os.path.splitext(name)[1].lower())
+            if mime is None or not os.path.isfile(path):
+                continue
+            with open(path, 'rb') as fh:
+                md5 = hashlib.md5(fh.read()).hexdigest()
+            stat = os.stat(path)
+            entries.append({
+                'id': hashlib.sha1(name.encode()).hexdigest()[:16],
+                'name': name,
+                'mimeType': mime or mimetypes.guess_type(name)[0],
+                'modifiedTime': datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
+                'md5Checksum': md5,
+                'size': str(stat.st_size),
+            })
+        return entries
+
+    def read(self, file_id, byte_range=None):
+        entry = next((e for e in self.entries() if e['id'] == file_id), None)
+        if entry is None:
+            raise FileNotFoundError(file_id)
+        with open(os.path.join(self.directory, entry['name']), 'rb') as fh:
+            data = fh.read()
+        if byte_range:
+            start, _, end = byte_range.removeprefix('bytes=').partition('-')
+            data = data[int(start):int(end) + 1 if end else None]
+        if self.fail_after_bytes is not None and self.bytes_served + len(data) > self.fail_after_bytes:
+            raise FakeDriveError("Injected connection failure")
+        self.bytes_served += len(data)
+        return data
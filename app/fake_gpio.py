@@ -0,0 +1,226 @@
+"""
+Simulated stand-in for RPi.GPIO.
+
+Implements the subset of the RPi.GPIO API used by the service so it can run
+without a Raspberry Pi (e.g. in CI). Inputs are driven with set_input(), which
+fires the registered edge callbacks from a single dispatcher thread, the same
+way RPi.GPIO does.
+"""
+import queue
+import threading
+import time
+import traceback
+
+# Same values as RPi.GPIO
+BOARD = 10
+BCM = 11
+OUT = 0
+IN = 1
+LOW = 0
+HIGH = 1
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+RISING = 31
+FALLING = 32
+BOTH = 33
+
+_lock = threading.Lock()
+_mode = None
+_directions = {}   # pin -> IN/OUT
+_levels = {}       # pin -> current level
+_detectors = {}    # pin -> (edge, [callbacks], bouncetime_s)
+_last_edge = {}    # pin -> monotonic time of the last accepted edge
+_output_times = {} # pin -> monotonic time of the last output level change
+_hangs = {}        # pin -> seconds its next output blocks (inject_hang())
+_dispatch_queue = queue.Queue()
+_dispatcher = None
+_synchronous = False
+
+
+# --- RPi.GPIO API ---
+
+def setwarnings(flag):
+    pass
+
+def setmode(mode):
+    global _mode
+    _mode = mode
+
+def getmode():
+    return _mode
+
+def _as_list(channel):
+    return list(channel) if isinstance(channel, (list, tuple)) else [channel]
+
+def setup(channel, direction, pull_up_down=PUD_OFF, initial=None):
+    with _lock:
+        for pin in _as_list(channel):
+            _directions[pin] = direction
+            if direction == OUT:
+                _levels[pin] = LOW if initial is None else initial
+            elif pin not in _levels:
+                # A floating input settles to its pull resistor's level
+                _levels[pin] = HIGH if pull_up_down == PUD_UP else LOW
+
+def input(channel):
+    with _lock:
+        if channel not in _directions:
+            raise RuntimeError("You must setup() the GPIO channel first")
+        return _levels[channel]
+
+def _maybe_hang(pins):
+    for pin in pins:
+        seconds = _hangs.pop(pin, None)
+        if seconds:
+            time.sleep(seconds)
+
+def output(channel, value):
+    pins = _as_list(channel)
+    values = _as_list(value) if isinstance(value, (list, tuple)) else [value] * len(pins)
+    _maybe_hang(pins)
+    with _lock:
+        for pin, level in zip(pins, values):
+            if _directions.get(pin) != OUT:
+                raise RuntimeError("The GPIO channel has not been set up as an OUTPUT")
+            level = HIGH if level else LOW
+            if _levels[pin] != level:
+                _levels[pin] = level
+                _output_times[pin] = time.monotonic()
+
+def add_event_detect(channel, edge, callback=None, bouncetime=None):
+    with _lock:
+        if _directions.get(channel) != IN:
+            raise RuntimeError("You must setup() the GPIO channel as an input first")
+        if channel in _detectors:
+            raise RuntimeError("Conflicting edge detection already enabled for this GPIO channel")
+        callbacks = [callback] if callback else []
+        _detectors[channel] = (edge, callbacks, (bouncetime or 0) / 1000.0)
+
+def add_event_callback(channel, callback):
+    with _lock:
+        if channel not in _detectors:
+            raise RuntimeError("Add event detection using add_event_detect first before adding a callback")
+        _detectors[channel][1].append(callback)
+
+def remove_event_detect(channel):
+    with _lock:
+        _detectors.pop(channel, None)
+
+def cleanup(channel=None):
+    with _lock:
+        pins = list(_directions) if channel is None else _as_list(channel)
+        for pin in pins:
+            _directions.pop(pin, None)
+            _levels.pop(pin, None)
+            _detectors.pop(pin, None)
+            _last_edge.pop(pin, None)
+            _output_times.pop(pin, None)
+
+
+class PWM:
+    """Software PWM on an output pin. Only the duty cycle is tracked."""
+
+    def __init__(self, channel, frequency):
+        if _directions.get(channel) != OUT:
+            raise RuntimeError("You must setup() the GPIO channel as an output first")
+        self.channel = channel
+        self.frequency = frequency
+        self.duty_cycle = 0.0
+        self.running = False
+
+    def start(self, duty_cycle):
+        self.duty_cycle = duty_cycle
+        self.running = True
+
+    def ChangeDutyCycle(self, duty_cycle):
+        if not 0.0 <= duty_cycle <= 100.0:
+            raise ValueError("dutycycle must have a value from 0.0 to 100.0")
+        _maybe_hang([self.channel])
+        self.duty_cycle = duty_cycle
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+
+    def stop(self):
+        self.running = False
+
+
+# --- Simulation helpers (not part of RPi.GPIO) ---
+
+def inject_hang(pin: int, seconds: float):
+    """Makes the next output to a pin (level or PWM duty cycle) block for `seconds`, like a wedged driver."""
+    _hangs[pin] = seconds
+
+def set_input(pin: int, level: int) -> float:
+    """
+    Drives an input pin to the given level, as the external hardware would.
+
+    Matching edge callbacks are queued for the dispatcher thread, or run
+    before returning in synchronous mode.
+
+    Returns:
+        float: The monotonic timestamp of the edge, for latency measurements.
+    """
+    now = time.monotonic()
+    due = []
+    with _lock:
+        if _directions.get(pin) != IN:
+            raise RuntimeError(f"Pin {pin} is not configured as an input")
+        previous = _levels[pin]
+        _levels[pin] = level
+        detector = _detectors.get(pin)
+        if detector is None or previous == level:
+            return now
+        edge, callbacks, bouncetime = detector
+        rising = level == HIGH
+        if edge == BOTH or (edge == RISING) == rising:
+            if now - _last_edge.get(pin, float('-inf')) >= bouncetime:
+                _last_edge[pin] = now
+                due = list(callbacks)
+    if _synchronous:
+        for callback in due:
+            callback(pin)
+    elif due:
+        for callback in due:
+            _dispatch_queue.put((callback, pin))
+        _ensure_dispatcher()
+    return now
+
+def set_synchronous(enabled: bool):
+    """
+    Runs edge callbacks inside set_input() instead of on the dispatcher
+    thread, for deterministic replays.
+    """
+    global _synchronous
+    _synchronous = enabled
+
+def get_input_pins() -> list[int]:
+    """Returns the pins configured as inputs."""
+    with _lock:
+        return [pin for pin, direction in _directions.items() if direction == IN]
+
+def get_output(pin: int) -> int:
+    """Returns the level last written to an output pin."""
+    with _lock:
+        return _levels.get(pin, LOW)
+
+def get_output_time(pin: int) -> float | None:
+    """Returns the monotonic time an output pin last changed level, or None."""
+    with _lock:
+        return _output_times.get(pin)
+
+def _ensure_dispatcher():
+    global _dispatcher
+    if _dispatcher is None or not _dispatcher.is_alive():
+        _dispatcher = threading.Thread(target=_dispatch_loop, name="fake-gpio-callbacks", daemon=True)
+        _dispatcher.start()
+
+def _dispatch_loop():
+    while True:
+        callback, pin = _dispatch_queue.get()
+        try:
+            callback(pin)
+        except Exception:
+            # RPi.GPIO prints and swallows callback exceptions as well
+            traceback.print_exc()
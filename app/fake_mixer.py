@@ -0,0 +1,211 @@
+"""
+Simulated stand-in for pygame.mixer.
+
+Implements the subset of the pygame.mixer API used by app/audio.py. Nothing
+is decoded or played: a track "plays" for its length, measured on
+app.clock, so playback ends correctly under the replayer's virtual clock.
+WAV lengths are read from the file header; other files last
+DEFAULT_LENGTH_S unless registered with set_length().
+"""
+import time
+import wave
+
+from . import clock
+
+DEFAULT_LENGTH_S = 60.0
+
+class error(RuntimeError):
+    """Raised where pygame.mixer would raise pygame.error."""
+
+_init_args = None
+_num_channels = 8
+_num_reserved = 0
+_lengths = {}
+_channels = {}
+_hang = None  # (seconds, exception) for the next play(), see inject_hang()
+
+
+# --- pygame.mixer API ---
+
+def init(frequency=44100, size=-16, channels=2, buffer=512):
+    global _init_args
+    _init_args = (frequency, size, channels)
+
+def quit():
+    global _init_args
+    _init_args = None
+    _channels.clear()
+    music.stop()
+
+def get_init():
+    return _init_args
+
+def set_num_channels(count):
+    global _num_channels
+    _num_channels = count
+
+def get_num_channels():
+    return _num_channels
+
+def set_reserved(count):
+    global _num_reserved
+    _num_reserved = count
+    return count
+
+def _require_init():
+    if _init_args is None:
+        raise error("mixer not initialized")
+
+def _maybe_hang():
+    global _hang
+    if _hang is not None:
+        (seconds, exception), _hang = _hang, None
+        time.sleep(seconds)
+        if exception is not None:
+            raise exception
+
+def _track_length(path) -> float:
+    path = str(path)
+    if path in _lengths:
+        return _lengths[path]
+    try:
+        with wave.open(path, 'rb') as w:
+            return w.getnframes() / float(w.getframerate())
+    except (wave.Error, EOFError):
+        return DEFAULT_LENGTH_S
+    except OSError as e:
+        raise error(str(e)) from None
+
+class _Playback:
+    """Start/end times and volume of something that is playing."""
+
+    def __init__(self):
+        self.end = None
+        self.started_at = None
+        self.volume = 1.0
+
+    def start(self, length, loops=0):
+        self.started_at = clock.monotonic()
+        self.end = self.started_at + length * (loops + 1 if loops >= 0 else 1e9)
+
+    def stop(self):
+        self.end = None
+
+    def fadeout(self, ms):
+        if self.get_busy():
+            self.end = min(self.end, clock.monotonic() + ms / 1000.0)
+
+    def get_busy(self) -> bool:
+        return self.end is not None and clock.monotonic() < self.end
+
+class Sound:
+    def __init__(self, file=None, buffer=None):
+        _require_init()
+        if buffer is not None:
+            frequency, size, channels = _init_args
+            self._length = len(buffer) / float(frequency * channels * abs(size) // 8)
+        else:
+            self._length = _track_length(file)
+
+    def get_length(self) -> float:
+        return self._length
+
+class Channel(_Playback):
+    def __new__(cls, channel_id):
+        # pygame returns the same channel object for the same id
+        existing = _channels.get(channel_id)
+        if existing is None:
+            existing = super().__new__(cls)
+            _Playback.__init__(existing)
+            existing.id = channel_id
+            existing.sound = None
+            existing._queued = None
+            _channels[channel_id] = existing
+        return existing
+
+    def __init__(self, channel_id):
+        pass
+
+    def play(self, sound, loops=0, maxtime=0, fade_ms=0):
+        _require_init()
+        _maybe_hang()
+        self.sound = sound
+        self._queued = None
+        self.start(sound.get_length(), loops)
+
+    def queue(self, sound):
+        if not self.get_busy():
+            self.play(sound)
+            return
+        if self.get_queue() is not None:
+            # Replaces the sound that was waiting
+            self.end -= self._queued.get_length()
+        else:
+            self._queued_at = self.end
+        self._queued = sound
+        self.end += sound.get_length()
+
+    def get_queue(self):
+        # The queued sound becomes the playing one when the current one ends
+        if self._queued is not None and clock.monotonic() < self._queued_at:
+            return self._queued
+        return None
+
+    def stop(self):
+        super().stop()
+        self._queued = None
+
+    def fadeout(self, ms):
+        super().fadeout(ms)
+        self._queued = None
+
+    def set_volume(self, value):
+        self.volume = value
+
+    def get_volume(self) -> float:
+        return self.volume
+
+class _Music(_Playback):
+    def __init__(self):
+        super().__init__()
+        self._length = None
+
+    def load(self, filename):
+        _require_init()
+        self._length = _track_length(filename)
+
+    def play(self, loops=0, start=0.0, fade_ms=0):
+        if self._length is None:
+            raise error("music not loaded")
+        _maybe_hang()
+        self.start(max(0.0, self._length - start), loops)
+
+    def set_volume(self, value):
+        self.volume = value
+
+    def get_volume(self) -> float:
+        return self.volume
+
+music = _Music()
+
+
+# --- Simulation helpers (not part of pygame.mixer) ---
+
+def get_last_start() -> float | None:
+    """Returns when the most recent playback started (on app.clock), or None."""
+    starts = [c.started_at for c in _channels.values() if c.started_at is not None]
+    if music.started_at is not None:
+        starts.append(music.started_at)
+    return max(starts, default=None)
+
+def inject_hang(seconds: float, exception: BaseException | None = None):
+    """
+    Makes the next play() block for `seconds` of real time, like a wedged
+    mixer, then raise `exception` if one is given.
+    """
+    global _hang
+    _hang = (seconds, exception)
+
+def set_length(path, seconds: float):
+    """Sets the simulated length of a track."""
+    _lengths[str(path)] = seconds
@@ -1,13 +1,28 @@
-import RPi.GPIO as GPIO
 import threading
 import time
 import logging
 import math
 
-from . import config
+from . import config, events, metrics
+from .gpio import GPIO
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+def _build_frame_tables():
+    """
+    Precomputes the output of every mode as a cycle of (duty_cycle, hold_s)
+    frames. A hold of None means the frame lasts until the mode changes.
+    """
+    # Breathing effect: one sine period in 90 steps of 20 ms
+    pulsing = tuple(
+        ((math.sin(math.radians(i)) + 1) / 2 * 100, 0.02)
+        for i in range(0, 360, 4)
+    )
+    return {
+        'off': ((0.0, None),),
+        'on': ((100.0, None),),
+        'blinking': ((100.0, 0.5), (0.0, 0.5)),         # 0.5s on, 0.5s off
+        'fast_blinking': ((100.0, 0.15), (0.0, 0.15)),  # 0.15s on, 0.15s off
+        'pulsing': pulsing,
+    }
 
 class FeedbackLED:
     """Controls a feedback LED in a separate thread to prevent blocking."""
@@ -19,11 +34,14 @@ class FeedbackLED:
         self._running = False
         self._pwm = None
 
-        # Frequencies and durations for the patterns
-        self.patterns = {
-            'blinking': (0.5, 0.5),        # 0.5s on, 0.5s off
-            'fast_blinking': (0.15, 0.15),  # 0.15s on, 0.15s off
-        }
+        # The renderer sleeps on this condition between frames; set_mode() and
+        # stop() notify it so changes apply within one frame.
+        self._cond = threading.Condition()
+        self._mode_changed_at = None
+        self._frame_due = None  # When the thread should output the next frame
+        self._frames = _build_frame_tables()
+        # Set while run_async() renders on an asyncio loop instead of the thread
+        self._async_wake = None
 
     def setup(self):
         """Sets up the GPIO pin for the LED."""
@@ -47,7 +65,11 @@ class FeedbackLED:
         """Stops the control thread and cleans up resources."""
         if not self._running:
             return
-        self._running = False
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._async_wake is not None:
+            self._async_wake()
         if self._thread:
             self._thread.join()
         if self._pwm:
@@ -55,50 +77,108 @@ class FeedbackLED:
         GPIO.output(self._pin, GPIO.LOW)  # Turn off at the end
         logging.info("LED control thread stopped.")
 
+    def restart(self):
+        """
+        Replaces a dead or stalled control thread with a new one (supervisor
+        recovery). A thread stuck outputting a frame keeps the old condition,
+        and exits once it gets out.
+        """
+        if self._async_wake is not None:
+            return
+        old = self._cond
+        self._cond = threading.Condition()
+        self._running = True
+        self._frame_due = None
+        self._thread = threading.Thread(target=self._run_led_control, daemon=True)
+        self._thread.start()
+        # Wake the old thread if it is only waiting, so it exits
+        if old.acquire(timeout=0.1):
+            old.notify_all()
+            old.release()
+        logging.warning("LED control thread restarted.")
+
+    def get_stall_s(self) -> float:
+        """
+        How late the LED is, in seconds: the age of a mode change or frame
+        still waiting to be output, or infinity if the control thread has died.
+        0 when the LED is up to date, or not driven by the thread.
+        """
+        if self._thread is None:
+            return 0.0
+        if self._running and self._async_wake is None and self._thread is not None and not self._thread.is_alive():
+            return float('inf')
+        now = time.monotonic()
+        late = [now - t for t in (self._mode_changed_at, self._frame_due) if t is not None]
+        return max(0.0, max(late, default=0.0))
+
     def set_mode(self, mode: str):
         """
         Sets the LED's operating mode.
         Valid modes: 'off', 'on', 'blinking', 'fast_blinking', 'pulsing'.
         """
-        if mode in ['off', 'on', 'blinking', 'fast_blinking', 'pulsing']:
-            if self._mode != mode:
-                self._mode = mode
-                logging.info(f"LED mode changed to: {mode}")
+        if mode in self._frames:
+            with self._cond:
+                if self._mode != mode:
+                    self._mode = mode
+                    self._mode_changed_at = time.monotonic()
+                    self._cond.notify()
+                    if self._async_wake is not None:
+                        self._async_wake()
+                    logging.info(f"LED mode changed to: {mode}")
         else:
             logging.warning(f"Invalid LED mode: {mode}")
 
+    def _show(self, mode, index):
+        """Outputs the current frame, restarting from the first one on a mode change.
+        Returns (mode, index, hold_s). Must hold _cond."""
+        if self._mode != mode:
+            # New mode: restart from its first frame
+            mode = self._mode
+            index = 0
+            self._pwm.ChangeDutyCycle(self._frames[mode][0][0])
+            if self._mode_changed_at is not None:
+                # Time from set_mode() to the first frame of the new mode
+                metrics.led_mode_latency_seconds.observe(time.monotonic() - self._mode_changed_at)
+                self._mode_changed_at = None
+        else:
+            self._pwm.ChangeDutyCycle(self._frames[mode][index][0])
+        return mode, index, self._frames[mode][index][1]
+
     def _run_led_control(self):
         """Main loop that runs in the thread to control the LED."""
-        is_pwm = False
-        while self._running:
-            current_mode = self._mode
+        mode = None
+        index = 0
+        # Kept: restart() gives a new thread a new condition
+        cond = self._cond
+        with cond:
+            while self._running and self._thread is threading.current_thread():
+                mode, index, hold = self._show(mode, index)
+                self._frame_due = None if hold is None else time.monotonic() + hold
+                # Hold the frame; a mode change or stop() wakes us up early
+                if cond.wait(hold) or hold is None:
+                    continue
+                index = (index + 1) % len(self._frames[mode])
 
-            if current_mode == 'pulsing':
-                if not is_pwm:
-                    self._pwm.start(0)
-                    is_pwm = True
-                # Breathing effect using a sine wave
-                for i in range(0, 360, 4):
-                    if self._mode != 'pulsing' or not self._running: break
-                    # Map the sine wave from 0-1 to a 0-100 duty cycle
-                    duty_cycle = (math.sin(math.radians(i)) + 1) / 2 * 100
-                    self._pwm.ChangeDutyCycle(duty_cycle)
-                    time.sleep(0.02)
-            else:
-                if is_pwm:
-                    self._pwm.stop()
-                    is_pwm = False
-                
-                if current_mode == 'on':
-                    GPIO.output(self._pin, GPIO.HIGH)
-                    time.sleep(0.1) # Short pause to avoid 100% CPU usage
-                elif current_mode == 'off':
-                    GPIO.output(self._pin, GPIO.LOW)
-                    time.sleep(0.1)
-                elif current_mode in self.patterns:
-                    on_duration, off_duration = self.patterns[current_mode]
-                    GPIO.output(self._pin, GPIO.HIGH)
-                    time.sleep(on_duration)
-                    if self._mode != current_mode or not self._running: continue
-                    GPIO.output(self._pin, GPIO.LOW)
-                    time.sleep(off_duration)
+    async def run_async(self):
+        """
+        Renders the LED as a coroutine on the running asyncio loop, instead of
+        start()'s thread. Runs until stop() or cancellation.
+        """
+        import asyncio  # Imported by the asyncio runtime only
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        self._async_wake = lambda: loop.call_soon_threadsafe(wake.set)
+        self._running = True
+        mode = None
+        index = 0
+        try:
+            while self._running:
+                with self._cond:
+                    mode, index, hold = self._show(mode, index)
+                woken = await events.wait_event(wake, hold)
+                wake.clear()
+                if woken or hold is None:
+                    continue
+                index = (index + 1) % len(self._frames[mode])
+        finally:
+            self._async_wake = None
@@ -0,0 +1,143 @@
+"""
+Debounce and hysteresis filter for the KY-033 sensor inputs.
+
+Sits between the raw sensor bitmask and the controller. Each pin goes through
+three stages:
+
+1. N-of-M majority vote over the last M samples.
+2. An exponential moving average with separate on/off thresholds (hysteresis).
+3. Minimum on/off times, so a filtered state never flips faster than that.
+
+A pin changes state only when both the vote and the average agree. The filter
+is pure (no GPIO, no clock), so it can be run against recorded traces with
+filter_trace().
+"""
+from array import array
+
+from . import config
+
+# Slack when comparing sample times, so timestamps on the sampling grid (e.g.
+# in a recorded trace) never skip a sample to float rounding
+_EPSILON_S = 1e-6
+
+class SensorFilter:
+    """Per-pin filter state kept in flat arrays, indexed by sensor."""
+
+    def __init__(self, num_sensors: int,
+                 sample_ms: float = config.SENSOR_SAMPLE_MS,
+                 vote_window: int = config.SENSOR_VOTE_WINDOW,
+                 vote_threshold: int = config.SENSOR_VOTE_THRESHOLD,
+                 ema_alpha: float = config.SENSOR_EMA_ALPHA,
+                 ema_on: float = config.SENSOR_EMA_ON,
+                 ema_off: float = config.SENSOR_EMA_OFF,
+                 min_on_ms: float = config.SENSOR_MIN_ON_MS,
+                 min_off_ms: float = config.SENSOR_MIN_OFF_MS):
+        if not 0 < vote_threshold <= vote_window <= 16:
+            raise ValueError("Need 0 < vote_threshold <= vote_window <= 16")
+        if not 0.0 <= ema_off < ema_on <= 1.0:
+            raise ValueError("Need 0 <= ema_off < ema_on <= 1")
+
+        self.num_sensors = num_sensors
+        self.sample_s = sample_ms / 1000.0
+        self.vote_window = vote_window
+        self.vote_threshold = vote_threshold
+        self.ema_alpha = ema_alpha
+        self.ema_on = ema_on
+        self.ema_off = ema_off
+        self.min_on_s = min_on_ms / 1000.0
+        self.min_off_s = min_off_ms / 1000.0
+
+        self._window_mask = (1 << vote_window) - 1
+        self._history = array('H', [0] * num_sensors)      # Last M samples, one bit each
+        self._ema = array('f', [0.0] * num_sensors)
+        self.changed_at = array('d', [float('-inf')] * num_sensors)
+        self._last_sample = float('-inf')
+        self._unsettled = 0    # Bitmask of pins still converging
+        self.mask = 0          # Filtered output
+
+    def update(self, raw_mask: int, now: float) -> int:
+        """
+        Feeds the current raw bitmask and returns the filtered bitmask.
+
+        At most one sample is taken per sampling period; calls in between
+        return the current output unchanged.
+        """
+        if raw_mask == self.mask and not self._unsettled:
+            return self.mask  # Steady state: nothing to filter
+        if now < self._last_sample + self.sample_s - _EPSILON_S:
+            # Too soon for another sample: remember the change for the next one
+            self._unsettled |= raw_mask ^ self.mask
+            return self.mask
+        self._last_sample = now
+
+        mask = self.mask
+        unsettled = 0
+        pending = (raw_mask ^ mask) | self._unsettled
+        while pending:
+            bit = pending & -pending
+            pending ^= bit
+            i = bit.bit_length() - 1
+            sample = 1 if raw_mask & bit else 0
+
+            history = ((self._history[i] << 1) | sample) & self._window_mask
+            self._history[i] = history
+            ema = self._ema[i] + self.ema_alpha * (sample - self._ema[i])
+            votes = history.bit_count()
+
+            if mask & bit:
+                change = (self.vote_window - votes >= self.vote_threshold and ema <= self.ema_off
+                          and now - self.changed_at[i] >= self.min_on_s)
+            else:
+                change = (votes >= self.vote_threshold and ema >= self.ema_on
+                          and now - self.changed_at[i] >= self.min_off_s)
+            if change:
+                mask ^= bit
+                self.changed_at[i] = now
+
+            level = 1 if mask & bit else 0
+            if history == (self._window_mask if level else 0) and sample == level:
+                ema = float(level)  # Fully settled: snap so the next change starts clean
+            else:
+                unsettled |= bit
+            self._ema[i] = ema
+
+        self.mask = mask
+        self._unsettled = unsettled
+        return mask
+
+    def next_timeout(self, now: float) -> float | None:
+        """Returns the time until the next sample is needed, or None if every pin has settled."""
+        if not self._unsettled:
+            return None
+        return max(0.0, self._last_sample + self.sample_s - now)
+
+    def reset(self, raw_mask: int = 0):
+        """Forces the filter to a settled state matching the given raw bitmask."""
+        for i in range(self.num_sensors):
+            level = (raw_mask >> i) & 1
+            self._history[i] = self._window_mask if level else 0
+            self._ema[i] = float(level)
+            self.changed_at[i] = float('-inf')
+        self._last_sample = float('-inf')
+        self._unsettled = 0
+        self.mask = raw_mask
+
+def filter_trace(trace, num_sensors: int, **params) -> list[tuple[float, int]]:
+    """
+    Runs a recorded trace through a fresh filter.
+
+    Args:
+        trace: Iterable of (timestamp_s, raw_mask) samples in time order.
+        num_sensors: Number of sensors in the masks.
+        **params: SensorFilter parameters overriding the config defaults.
+
+    Returns:
+        list: The (timestamp_s, filtered_mask) points where the output changed.
+    """
+    sensor_filter = SensorFilter(num_sensors, **params)
+    changes = []
+    for timestamp, raw_mask in trace:
+        previous = sensor_filter.mask
+        if sensor_filter.update(raw_mask, timestamp) != previous:
+            changes.append((timestamp, sensor_filter.mask))
+    return changes
@@ -0,0 +1,12 @@
+"""
+GPIO backend selection.
+
+Modules import GPIO from here instead of importing RPi.GPIO directly, so the
+service can run against the simulated backend (DOME_BACKEND=sim) off the Pi.
+"""
+from . import config
+
+if config.BACKEND == 'sim':
+    from . import fake_gpio as GPIO
+else:
+    import RPi.GPIO as GPIO
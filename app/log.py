@@ -0,0 +1,174 @@
+"""
+Logging configuration for every entry point.
+
+Records are put on a queue by the thread that logs them, usually the control
+loop, and written by a QueueListener thread, so slow stderr/journald or SD
+card writes never stall a tick. Records with a `rate_key` (passed through
+`extra`) are rate-limited per key:
+
+    logging.info(f"Still detecting sensor {n}", extra={'rate_key': ('still', n)})
+
+Optionally, every record is also appended to a compact binary event log for
+post-mortem analysis; dump it with `python -m app.log PATH`.
+"""
+import os
+import sys
+import time
+import queue
+import atexit
+import struct
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+from . import config
+
+FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Binary event log: MAGIC, then one record per log record:
+# <dBH (created, levelno, message length) followed by the UTF-8 message
+MAGIC = b'DOMELOG1'
+_RECORD = struct.Struct('<dBH')
+
+_listener = None
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most one record per `rate_key` every `interval_s`. The
+    next record that gets through reports how many were suppressed. Records
+    without a rate_key always pass.
+    """
+
+    def __init__(self, interval_s: float):
+        super().__init__()
+        self.interval_s = interval_s
+        self._last = {}  # rate_key -> (emitted_at, suppressed)
+        self._lock = threading.Lock()
+
+    def filter(self, record) -> bool:
+        key = getattr(record, 'rate_key', None)
+        if key is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            emitted_at, suppressed = self._last.get(key, (None, 0))
+            if emitted_at is not None and now - emitted_at < self.interval_s:
+                self._last[key] = (emitted_at, suppressed + 1)
+                return False
+            self._last[key] = (now, 0)
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar suppressed)"
+        return True
+
+class BinaryEventHandler(logging.Handler):
+    """Appends records to a compact binary file, rotated to PATH.1 past max_bytes."""
+
+    def __init__(self, path, max_bytes: int):
+        super().__init__()
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._file = self._open()
+
+    def _open(self):
+        f = open(self.path, 'ab')
+        if f.tell() == 0:
+            f.write(MAGIC)
+        return f
+
+    def emit(self, record):
+        try:
+            message = record.getMessage().encode('utf-8', 'replace')[:0xFFFF]
+            self._file.write(_RECORD.pack(record.created, record.levelno, len(message)) + message)
+            self._file.flush()  # On the listener thread: the control loop never waits for it
+            if self._file.tell() >= self.max_bytes:
+                self._file.close()
+                os.replace(self.path, self.path + '.1')
+                self._file = self._open()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+def read_events(path):
+    """Yields (created, levelno, message) from a binary event log."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a dome event log")
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return  # End of file, or a record cut short by a crash
+            created, levelno, length = _RECORD.unpack(header)
+            message = f.read(length)
+            if len(message) < length:
+                return
+            yield created, levelno, message.decode('utf-8', 'replace')
+
+def _level(value) -> int:
+    return value if isinstance(value, int) else logging.getLevelName(value.upper())
+
+def setup(level=None, event_log=None):
+    """
+    Routes all logging through the queue. Safe to call more than once.
+
+    Args:
+        level: Console level (default: config.LOG_LEVEL).
+        event_log: Path of the binary event log (default: config.LOG_EVENT_FILE),
+            or False to disable it.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    if level is None:
+        level = config.LOG_LEVEL
+    level = _level(level)
+    if event_log is None:
+        event_log = config.LOG_EVENT_FILE
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(FORMAT))
+    console.setLevel(level)
+    handlers = [console]
+    root_level = level
+    if event_log:
+        events_handler = BinaryEventHandler(event_log, config.LOG_EVENT_FILE_MAX_BYTES)
+        events_handler.setLevel(config.LOG_EVENT_LEVEL)
+        handlers.append(events_handler)
+        root_level = min(level, _level(config.LOG_EVENT_LEVEL))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(config.LOG_RATE_LIMIT_S))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(root_level)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+
+def shutdown():
+    """Writes out the queued records and stops the listener thread."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python -m app.log EVENT_LOG")
+        sys.exit(1)
+    for created, levelno, message in read_events(sys.argv[1]):
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(created))
+        print(f"{stamp},{int(created * 1000) % 1000:03d} - {logging.getLevelName(levelno)} - {message}")
+
+if __name__ == '__main__':
+    main()
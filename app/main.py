@@ -2,14 +2,27 @@ import sys
 import time
 import logging
 import argparse
-import RPi.GPIO as GPIO
+import threading
 
-from . import config, sensors, motors, audio, buttons
+# Taken before the heavier imports below, so startup timings include them
+_START = time.monotonic()
+
+from . import config, sensors, motors, audio, buttons, events, recorder, metrics, log, analytics, netbus, stations
 from .controller import DomeController
 from .feedback_led import FeedbackLED
+from .gpio import GPIO
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+def _start_audio():
+    """Imports pygame, starts the mixer and decodes the tracks: the slowest part of startup."""
+    try:
+        audio.init_mixer()
+        audio.load_audio_mappings()
+        audio.preload_audio()
+        if config.AUDIO_HOT_RELOAD:
+            audio.start_hot_reload()
+        logging.info(f"Audio ready {(time.monotonic() - _START) * 1000:.0f} ms after start.")
+    except Exception as e:
+        logging.error(f"Error starting audio: {e}", exc_info=True)
 
 def main():
     """Main entry point of the application."""
@@ -24,11 +37,30 @@ def main():
         action="store_true",
         help="Cycles through all motors to test functionality."
     )
+    parser.add_argument(
+        "--pattern",
+        choices=motors.get_pattern_names() + ["all"],
+        help="With --test-motors, plays this haptic pattern (or every pattern) instead of a plain pulse."
+    )
+    parser.add_argument(
+        "--record",
+        metavar="PATH",
+        help="Records every sensor and button edge to PATH for replaying with `python -m app.replay`."
+    )
+    parser.add_argument(
+        "--supervise",
+        action="store_true",
+        help="Runs the main loop under a watchdog that restarts a stalled or failing subsystem."
+    )
+    parser.add_argument(
+        "--asyncio",
+        action="store_true",
+        help="Runs the controller, LED and motors as coroutines on a single asyncio event loop."
+    )
     args = parser.parse_args()
-
-    # Initialize subsystems
-    audio.init_mixer()
-    audio.load_audio_mappings()
+    if args.supervise and args.asyncio:
+        parser.error("--supervise cannot be combined with --asyncio")
+    log.setup()
 
     if args.test_motors:
         print("--- Testing Motors ---")
@@ -38,11 +70,21 @@ def main():
         GPIO.setmode(GPIO.BCM)
         motors.setup_motors()
         
+        if args.pattern == "all":
+            patterns = motors.get_pattern_names()
+        else:
+            patterns = [args.pattern] if args.pattern else []
+
         try:
-            for i in range(len(config.MOTOR_PINS)):
-                print(f"Pulsing Motor {i+1} (GPIO {config.MOTOR_PINS[i]})...")
-                motors.pulse(i, duration_ms=1000)
-                time.sleep(1.2) # Wait for pulse + gap
+            for i, pin in enumerate(stations.table.motor_pins):
+                if not patterns:
+                    print(f"Pulsing Motor {i+1} (GPIO {pin})...")
+                    motors.pulse(i, duration_ms=1000)
+                    time.sleep(1.2) # Wait for pulse + gap
+                for name in patterns:
+                    print(f"Pattern '{name}' on Motor {i+1} (GPIO {pin})...")
+                    motors.play_pattern(i, name)
+                    time.sleep(motors.get_pattern_duration(name) + 0.5) # Wait for pattern + gap
         except KeyboardInterrupt:
             print("\nTest stopped.")
         finally:
@@ -51,6 +93,8 @@ def main():
         sys.exit(0)
 
     if args.list_audios:
+        # Only a directory scan: the mixer is never started
+        audio.load_audio_mappings()
         print("--- Detected Audio Mappings ---")
         available_map = audio.get_available_audio_map()
         if not available_map:
@@ -60,28 +104,56 @@ def main():
                 print(f"Sensor {sensor_num} -> {filename}")
         sys.exit(0)
 
+    # Audio starts in the background while the GPIO is set up, so the sensors
+    # capture edges (and the LED lights up) without waiting for the mixer.
+    audio_startup = threading.Thread(target=_start_audio, name="audio-startup", daemon=True)
+    audio_startup.start()
+
     try:
         # Configure hardware
         # We set the BCM mode here once to ensure consistency.
         GPIO.setmode(GPIO.BCM)
         sensors.setup_sensors()
+        logging.info(f"Sensors ready {(time.monotonic() - _START) * 1000:.0f} ms after start.")
         motors.setup_motors() # No need to set mode again
 
         # Set up and start the feedback LED
         led = FeedbackLED()
         led.setup()
-        led.start()
+        if not args.asyncio:
+            led.start()  # The asyncio runtime renders it on the loop instead
 
         # Set up Start Button
         start_btn = buttons.StartButton(config.START_BUTTON_PIN, config.BUTTON_LONG_PRESS_S)
         start_btn.setup()
 
+        # The controller needs the audio mappings
+        audio_startup.join()
         controller = DomeController(led=led, button=start_btn)
+        if config.METRICS_ENABLED:
+            metrics.start_server()
+        if config.ANALYTICS_ENABLED:
+            analytics.start()
+        if config.NETBUS_ENABLED:
+            netbus.start()
+
+        if args.record:
+            session_recorder = recorder.Recorder(args.record, list(stations.table.sensor_pins) + [config.START_BUTTON_PIN])
+            session_recorder.start()
         logging.info("Starting main loop. Press Ctrl+C to exit.")
 
-        while True:
-            controller.update()
-            time.sleep(config.LOOP_DELAY_S)
+        if args.asyncio:
+            import asyncio
+            from . import aio_runtime
+            asyncio.run(aio_runtime.run(controller, led))
+        elif args.supervise:
+            from .supervisor import Supervisor
+            Supervisor(controller, led).run()
+        else:
+            while True:
+                controller.update()
+                # Block until a sensor edge arrives or the controller's next timeout.
+                events.wait(controller.next_timeout())
 
     except KeyboardInterrupt:
         logging.info("\nKeyboard interrupt detected. Exiting cleanly...")
@@ -89,12 +161,19 @@ def main():
         logging.error(f"An unexpected error occurred: {e}", exc_info=True)
     finally:
         # Ensure resources are cleaned up
+        metrics.stop_server()
+        netbus.stop()
+        analytics.stop()
+        audio.stop_hot_reload()
         audio.stop_audio()
+        if 'session_recorder' in locals():
+            session_recorder.stop()
         motors.cleanup()
         if 'led' in locals():
             led.stop()
         GPIO.cleanup()
         logging.info("Resources released. Goodbye.")
+        log.shutdown()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,198 @@
+"""
+Lightweight instrumentation of the hot path.
+
+Counters and fixed-size histograms that cost a few microseconds to update,
+served in the Prometheus text format on a localhost HTTP port (or a Unix
+socket) by a background thread:
+
+    curl http://127.0.0.1:9101/metrics
+
+Histograms keep cumulative bucket counts (for Prometheus) plus a ring buffer
+of the latest samples, reported as quantiles of recent behavior.
+"""
+import os
+import bisect
+import logging
+import threading
+from array import array
+
+from . import config
+
+_registry = []
+_server = None
+
+class Counter:
+    """A monotonically increasing count, optionally split by label values."""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount: int = 1):
+        """Increments the count for the given label values (one per label name)."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, *labels) -> int:
+        return self._values.get(labels, 0)
+
+    def _render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+class Histogram:
+    """
+    Bucketed distribution of a value, plus a ring buffer of the last `window`
+    samples. Memory is fixed: observe() never allocates.
+    """
+
+    def __init__(self, name: str, help: str, buckets: tuple, window: int = 1024):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # Last one is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._ring = array('d', bytes(8 * window))
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._ring[self._count % len(self._ring)] = value
+            self._count += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Returns the q-quantile (0..1) of the samples in the ring buffer, or None."""
+        with self._lock:
+            samples = sorted(self._ring[:min(self._count, len(self._ring))])
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def _render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            yield f'{self.name}_bucket{{le="{le}"}} {cumulative}'
+        yield f"{self.name}_sum {total}"
+        yield f"{self.name}_count {count}"
+        yield f"# HELP {self.name}_recent Quantiles of the last {len(self._ring)} samples."
+        yield f"# TYPE {self.name}_recent gauge"
+        for q in (0.5, 0.9, 0.99, 1.0):
+            value = self.quantile(q)
+            if value is not None:
+                yield f'{self.name}_recent{{quantile="{q}"}} {value}'
+
+def _labels(names, values) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{v}"' for n, v in zip(names, values)) + '}'
+
+def render() -> str:
+    """Returns every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric._render())
+    return '\n'.join(lines) + '\n'
+
+
+# --- Metrics ---
+
+_LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+_LOAD_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_STALL_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+
+tick_seconds = Histogram('dome_tick_seconds', 'Duration of DomeController.update() ticks.', _LATENCY_BUCKETS)
+state_transitions = Counter('dome_state_transitions_total', 'Controller state changes.', ('from', 'to'))
+activations = Counter('dome_activations_total', 'Sensors activated while no sensor was current.', ('sensor',))
+switches = Counter('dome_switches_total', 'Confirmed switches to a sensor after the dwell time.', ('sensor',))
+dwell_cancellations = Counter('dome_dwell_cancellations_total', 'Pending switches canceled before the dwell time.', ('sensor',))
+mixer_load_seconds = Histogram('dome_mixer_load_seconds', 'Time to decode a track into memory.', _LOAD_BUCKETS, window=64)
+motor_pulses = Counter('dome_motor_pulses_total', 'Pulses and patterns played per motor.', ('motor',))
+led_mode_latency_seconds = Histogram('dome_led_mode_latency_seconds', 'Time from an LED mode change to its first frame.', _LATENCY_BUCKETS, window=64)
+stall_seconds = Histogram('dome_stall_seconds', 'Main loop stalls caught by the supervisor.', _STALL_BUCKETS, window=64)
+subsystem_restarts = Counter('dome_subsystem_restarts_total', 'Subsystems restarted by the supervisor.', ('subsystem',))
+loop_lag_seconds = Histogram('dome_loop_lag_seconds', 'Event loop lag of the asyncio runtime.', _LATENCY_BUCKETS)
+
+
+# --- Endpoint ---
+
+def _server_for(port: int, socket_path: str | None):
+    # http.server is imported here so that importing metrics stays cheap
+    import socketserver
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Keep scrapes out of the service log
+
+    class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def get_request(self):
+            request, _ = super().get_request()
+            return request, ('local', 0)  # BaseHTTPRequestHandler expects a (host, port)
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # Left over from a previous run
+        return UnixHTTPServer(socket_path, Handler)
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    return server
+
+def start_server(port: int = config.METRICS_PORT, socket_path: str | None = config.METRICS_SOCKET):
+    """Serves the metrics on 127.0.0.1:port, or on a Unix socket if socket_path is set."""
+    global _server
+    if _server is not None:
+        return
+    try:
+        _server = _server_for(port, socket_path)
+    except OSError as e:
+        logging.error(f"Could not start the metrics endpoint: {e}")
+        _server = None
+        return
+    threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    logging.info(f"Serving metrics on {socket_path or f'http://127.0.0.1:{port}/metrics'}")
+
+def stop_server():
+    """Stops the metrics endpoint."""
+    global _server
+    if _server is None:
+        return
+    _server.shutdown()
+    _server.server_close()
+    if isinstance(_server.server_address, str):
+        try:
+            os.unlink(_server.server_address)  # Unix socket
+        except OSError:
+            pass
+    _server = None
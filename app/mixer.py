@@ -0,0 +1,28 @@
+"""
+Mixer backend selection.
+
+app/audio.py uses `mixer` and `MixerError` from here instead of pygame
+directly, so it runs against the simulated mixer (DOME_BACKEND=sim) off the Pi.
+The backend is imported by load(), on first use, so commands that never play
+audio (e.g. --list-audios) start without importing pygame.
+"""
+from . import config
+
+mixer = None
+
+class MixerError(Exception):
+    """Placeholder until load() replaces it with the backend's error type."""
+
+def load():
+    """Imports the mixer backend once. Returns (mixer, MixerError)."""
+    global mixer, MixerError
+    if mixer is None:
+        if config.BACKEND == 'sim':
+            from . import fake_mixer as backend
+            MixerError = backend.error
+        else:
+            import pygame
+            import pygame.mixer as backend
+            MixerError = pygame.error
+        mixer = backend
+    return mixer, MixerError
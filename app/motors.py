@@ -1,14 +1,92 @@
-import RPi.GPIO as GPIO
+import heapq
 import threading
+import time
 import logging
 
-from . import config
+from . import config, events, metrics, stations
+from .gpio import GPIO
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+_motor_pins = stations.table.motor_pins
 
-_motor_pins = config.MOTOR_PINS
-_active_timers = []
+# A single scheduler thread drives every motor. It owns a heap of
+# (deadline, pin, level) events and sleeps on the condition until the earliest
+# one is due. There is at most one event per pin: each pin plays a precompiled
+# list of edges and only its next edge is in the heap, so memory and thread
+# count stay constant no matter how many pulses or patterns are requested.
+_cond = threading.Condition()
+_events = []
+_playback = {}   # pin -> _Playback
+_scheduler = None
+_running = False
+# Under the asyncio runtime the scheduler is a coroutine instead of a thread;
+# this wakes it up (thread-safe) when the earliest deadline changes.
+_async_wake = None
+
+
+# --- Pattern table ---
+
+def _compile_pattern(segments, pwm_hz: int) -> tuple:
+    """
+    Converts (duration_ms, start_intensity, end_intensity) segments into a
+    tuple of (offset_s, level) edges that implement the intensities with
+    software PWM. Consecutive edges always alternate levels.
+    """
+    edges = []
+    level = GPIO.LOW
+    t = 0.0
+
+    def edge(offset, new_level):
+        nonlocal level
+        if new_level != level:
+            edges.append((round(offset, 6), new_level))
+            level = new_level
+
+    for duration_ms, start, end in segments:
+        # Stretch the PWM period slightly so each segment keeps its exact length
+        periods = max(1, round(duration_ms / 1000.0 * pwm_hz))
+        period = duration_ms / 1000.0 / periods
+        for k in range(periods):
+            # Duty cycle at the middle of this PWM period
+            duty = start + (end - start) * (k + 0.5) / periods
+            if duty >= 0.99:
+                edge(t, GPIO.HIGH)
+            elif duty <= 0.01:
+                edge(t, GPIO.LOW)
+            else:
+                edge(t, GPIO.HIGH)
+                edge(t + duty * period, GPIO.LOW)
+            t += period
+    edge(t, GPIO.LOW)  # Always end with the motor off
+    if edges[0][0] > 0:
+        edges.insert(0, (0.0, GPIO.LOW))
+    return tuple(edges)
+
+# Compiled once at startup, so playing a pattern never generates edges
+_patterns = {
+    name: _compile_pattern(segments, config.MOTOR_PWM_HZ)
+    for name, segments in config.HAPTIC_PATTERNS.items()
+}
+
+def get_pattern_names() -> list[str]:
+    """Returns the names of the available haptic patterns."""
+    return list(_patterns)
+
+def get_pattern_duration(name: str) -> float:
+    """Returns how long a pattern drives its motor, in seconds."""
+    return _patterns[name][-1][0]
+
+class _Playback:
+    """Position of a pin within the edges it is playing."""
+    __slots__ = ('edges', 'index', 'start', 'solid')
+
+    def __init__(self, edges, start, solid=False):
+        self.edges = edges
+        self.index = 0
+        self.start = start
+        self.solid = solid  # A plain pulse, which can be extended
+
+
+# --- Scheduler ---
 
 def setup_motors():
     """Initializes the GPIO pins for all motors as outputs."""
@@ -16,53 +94,217 @@ def setup_motors():
     for pin in _motor_pins:
         GPIO.setup(pin, GPIO.OUT)
         GPIO.output(pin, GPIO.LOW)  # Ensure all motors are off at startup
+    _start_scheduler()
     logging.info(f"Motors configured on pins: {_motor_pins}")
 
-def _turn_off_motor(pin):
-    """Internal function to turn off a motor."""
+def _start_scheduler():
+    """Starts the scheduler thread if it is not already running."""
+    global _scheduler, _running
+    with _cond:
+        if _async_wake is not None or (_scheduler is not None and _scheduler.is_alive()):
+            return
+        _running = True
+        _scheduler = threading.Thread(target=_run_scheduler, name="motor-scheduler", daemon=True)
+        _scheduler.start()
+
+def _stop_scheduler():
+    """Stops the scheduler thread, keeping pending events."""
+    global _scheduler, _running
+    with _cond:
+        _running = False
+        _cond.notify()
+    if _scheduler is not None:
+        _scheduler.join()
+        _scheduler = None
+
+def _run_due(now) -> float | None:
+    """Applies the edges that are due. Returns the next deadline, or None. Must hold _cond."""
+    while _events:
+        deadline, pin, level = _events[0]
+        if deadline > now:
+            return deadline
+        heapq.heappop(_events)
+        _set_motor(pin, level)
+        _advance(pin, now)
+    return None
+
+def _run_scheduler():
+    """Scheduler thread: applies each edge when its deadline is reached."""
+    with _cond:
+        # Exits once replaced by restart_scheduler()
+        while _running and _scheduler is threading.current_thread():
+            now = time.monotonic()
+            deadline = _run_due(now)
+            _cond.wait(None if deadline is None else deadline - now)
+
+def restart_scheduler():
+    """
+    Replaces a dead or stalled scheduler thread with a new one (supervisor
+    recovery). Pending edges are kept. A thread stuck inside GPIO.output()
+    holds the condition, so the new one takes over once that call returns.
+    """
+    global _scheduler, _running
+    if _async_wake is not None:
+        return
+    _running = True
+    _scheduler = threading.Thread(target=_run_scheduler, name="motor-scheduler", daemon=True)
+    _scheduler.start()
+    # Wake the old thread if it is only waiting, so it exits
+    if _cond.acquire(timeout=0.1):
+        _cond.notify_all()
+        _cond.release()
+    logging.warning("Motor scheduler restarted.")
+
+def get_overdue_s() -> float:
+    """
+    How late the scheduler is, in seconds: the age of the earliest edge past
+    its deadline, or infinity if the scheduler thread has died. 0 when on time.
+    """
+    if _running and _async_wake is None and _scheduler is not None and not _scheduler.is_alive():
+        return float('inf')
+    events = _events
+    if not events:
+        return 0.0
+    # Read without the lock: the scheduler may be stuck holding it
     try:
-        GPIO.output(pin, GPIO.LOW)
+        deadline = events[0][0]
+    except IndexError:
+        return 0.0
+    return max(0.0, time.monotonic() - deadline)
+
+async def run_scheduler_async():
+    """
+    Runs the scheduler as a coroutine on the running asyncio loop, replacing
+    its thread. Runs until cancelled.
+    """
+    global _async_wake
+    import asyncio  # Imported by the asyncio runtime only
+    _stop_scheduler()
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+    _async_wake = lambda: loop.call_soon_threadsafe(wake.set)
+    try:
+        while True:
+            with _cond:
+                deadline = _run_due(time.monotonic())
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            await events.wait_event(wake, timeout)
+            wake.clear()
+    finally:
+        _async_wake = None
+
+def _set_motor(pin, level):
+    """Internal function to drive a motor pin."""
+    try:
+        GPIO.output(pin, level)
     except RuntimeError:
         # Ignore errors if GPIO has already been cleaned up
         pass
 
+def _advance(pin, now):
+    """Applies the edges of a pin that are due and schedules the next one. Must hold _cond."""
+    playback = _playback.get(pin)
+    if playback is None:
+        return
+    edges = playback.edges
+    playback.index += 1
+    while playback.index < len(edges):
+        offset, level = edges[playback.index]
+        deadline = playback.start + offset
+        if deadline > now:
+            _schedule(pin, level, deadline)
+            return
+        # Already due (e.g. the scheduler woke up late): apply it right away
+        _set_motor(pin, level)
+        playback.index += 1
+    del _playback[pin]
+
+def _schedule(pin, level, deadline):
+    """Sets (or replaces) the pending event of a pin. Must hold _cond."""
+    for i, (_, event_pin, _) in enumerate(_events):
+        if event_pin == pin:
+            _events[i] = (deadline, pin, level)
+            heapq.heapify(_events)
+            break
+    else:
+        heapq.heappush(_events, (deadline, pin, level))
+    _cond.notify()
+    if _async_wake is not None:
+        _async_wake()
+
+def _play(pin, edges, solid=False) -> bool:
+    """Starts playing edges on a pin, replacing whatever it was playing."""
+    _start_scheduler()
+    now = time.monotonic()
+    with _cond:
+        # The first edge is applied here so the motor reacts without waiting for the scheduler
+        try:
+            GPIO.output(pin, edges[0][1])
+        except RuntimeError:
+            logging.error("GPIO not configured. Cannot drive motor.")
+            return False
+        _playback[pin] = _Playback(edges, now, solid)
+        _advance(pin, now)
+    return True
+
+def _motor_pin(motor_index: int) -> int | None:
+    if not (0 <= motor_index < len(_motor_pins)):
+        logging.warning(f"Motor index out of range: {motor_index}")
+        return None
+    return _motor_pins[motor_index]
+
 def pulse(motor_index: int, duration_ms: int = config.PULSE_MS):
     """
-    Activates a motor for a set duration without blocking the main thread.
+    Activates a motor at full intensity for a set duration without blocking the main thread.
+
+    Pulsing a motor that is already pulsing extends the running pulse.
 
     Args:
         motor_index (int): The index of the motor to activate (0-9).
         duration_ms (int): The duration of the vibration in milliseconds.
     """
-    if not (0 <= motor_index < len(_motor_pins)):
-        logging.warning(f"Motor index out of range: {motor_index}")
+    motor_pin = _motor_pin(motor_index)
+    if motor_pin is None:
         return
-
-    motor_pin = _motor_pins[motor_index]
     logging.info(f"Pulsing motor {motor_index + 1} (pin {motor_pin}) for {duration_ms} ms.")
+    metrics.motor_pulses.inc(motor_index + 1)
 
-    # Turn the motor on
-    try:
-        GPIO.output(motor_pin, GPIO.HIGH)
-    except RuntimeError:
-        logging.error("GPIO not configured. Cannot pulse motor.")
-        return
+    duration_s = duration_ms / 1000.0
+    with _cond:
+        playback = _playback.get(motor_pin)
+        if playback is not None and playback.solid:
+            end = time.monotonic() + duration_s
+            if playback.start + playback.edges[-1][0] < end:
+                playback.edges = ((0.0, GPIO.HIGH), (end - playback.start, GPIO.LOW))
+                _schedule(motor_pin, GPIO.LOW, end)
+            return
+    _play(motor_pin, ((0.0, GPIO.HIGH), (duration_s, GPIO.LOW)), solid=True)
 
-    # Use a timer to turn the motor off after the specified duration.
-    # This avoids blocking the main program loop.
-    timer = threading.Timer(duration_ms / 1000.0, _turn_off_motor, args=[motor_pin])
-    _active_timers.append(timer)
-    timer.start()
+def play_pattern(motor_index: int, name: str = config.HAPTIC_PATTERN):
+    """
+    Plays a named haptic pattern (see config.HAPTIC_PATTERNS) on a motor,
+    replacing anything it was playing.
+    """
+    motor_pin = _motor_pin(motor_index)
+    if motor_pin is None:
+        return
+    edges = _patterns.get(name)
+    if edges is None:
+        logging.warning(f"Unknown haptic pattern: {name}")
+        return
+    logging.info(f"Playing pattern '{name}' on motor {motor_index + 1} (pin {motor_pin}).")
+    metrics.motor_pulses.inc(motor_index + 1)
+    _play(motor_pin, edges)
 
 def cleanup():
     """Cleans up the motor GPIO pins."""
     logging.info("Cleaning up motor GPIO pins.")
-    
-    # Cancel any pending timers
-    for timer in _active_timers:
-        if timer.is_alive():
-            timer.cancel()
-    _active_timers.clear()
+
+    # Stop the scheduler and drop any pending events
+    with _cond:
+        _events.clear()
+        _playback.clear()
+    _stop_scheduler()
 
     for pin in _motor_pins:
         try:
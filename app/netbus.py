@@ -0,0 +1,330 @@
+"""
+Optional coordination between domes over UDP.
+
+Each node publishes its controller state in small fixed-size datagrams,
+either to a multicast group (every dome on the LAN) or to a list of unicast
+peers, and listens to the others:
+
+    STATE   state, current station and served stations, on every transition
+    INTRO   "start the intro at T": pressing start on one dome starts the
+            intro on every waiting dome at the same moment
+    PING    sent every NETBUS_SYNC_INTERVAL_S...
+    PONG    ...and answered, to estimate each peer's clock offset
+
+Clock offsets are estimated as in NTP: a PING sent at t0 (our clock) is
+received at t1 and answered at t2 (peer clock), and the PONG arrives at t3.
+The sample with the smallest round trip out of the last few is the best
+estimate of `peer clock - our clock`, which maps a peer's INTRO time onto
+ours, so synchronized starts line up within a few ms on a LAN.
+
+Messages are handled on a background thread and queued for the controller,
+which drains them between ticks (see drain()). Several nodes can run in one
+process, e.g. over loopback (bench/netbus_sync.py).
+"""
+import zlib
+import socket
+import struct
+import select
+import logging
+import threading
+from collections import deque
+
+from . import clock, config, events
+
+MAGIC = b'DM'
+VERSION = 1
+
+# Header: magic, version, type, node id, sequence, send time (sender's clock)
+_HEADER = struct.Struct('<2sBBIId')
+_STATE = struct.Struct('<BbH')    # state, current station (-1 for none), served stations mask
+_INTRO = struct.Struct('<d')      # start time, sender's clock
+_PONG = struct.Struct('<dd')      # t0 echoed back, t1 (receipt, responder's clock)
+
+MSG_STATE = 1
+MSG_INTRO = 2
+MSG_PING = 3
+MSG_PONG = 4
+
+STATES = ('waiting', 'intro', 'running')
+
+# Clock samples kept per peer; the one with the shortest round trip wins
+_SAMPLES = 8
+
+class Peer:
+    """What we know about another dome."""
+
+    def __init__(self, node_id: int, address):
+        self.node_id = node_id
+        self.address = address
+        self.last_seen = 0.0
+        self.state = None
+        self.station = None
+        self.served_mask = 0
+        self._samples = deque(maxlen=_SAMPLES)  # (delay, offset)
+
+    def add_sample(self, t0: float, t1: float, t2: float, t3: float):
+        delay = (t3 - t0) - (t2 - t1)
+        offset = ((t1 - t0) + (t2 - t3)) / 2
+        self._samples.append((delay, offset))
+
+    @property
+    def offset(self) -> float | None:
+        """Estimated `peer clock - our clock` in seconds, or None before the first sample."""
+        if not self._samples:
+            return None
+        return min(self._samples)[1]
+
+    @property
+    def delay(self) -> float | None:
+        """Round trip of the sample the offset comes from, in seconds."""
+        if not self._samples:
+            return None
+        return min(self._samples)[0]
+
+class Node:
+    """
+    A member of the bus.
+
+    Args:
+        node_id: Unique id of this dome (default: derived from the host name, so
+            it stays the same across restarts and peers do not pile up).
+        group: Multicast group, used when `peers` is empty (default: config.NETBUS_GROUP).
+        port: UDP port of the group, or the port this node listens on with `peers`.
+        peers: Unicast (host, port) addresses of the other domes.
+        interface: Address of the local interface (default: config.NETBUS_INTERFACE).
+        time_source: Clock of this node (default: app.clock.monotonic).
+    """
+
+    def __init__(self, node_id: int | None = None, group: str | None = None, port: int | None = None,
+                 peers=(), interface: str | None = None, time_source=None):
+        self.node_id = node_id if node_id is not None else zlib.crc32(socket.gethostname().encode())
+        self.group = group or config.NETBUS_GROUP
+        self.port = port or config.NETBUS_PORT
+        self.peers_config = [tuple(p) for p in peers]
+        self.interface = interface or config.NETBUS_INTERFACE
+        self.time = time_source or clock.monotonic
+        self.peers = {}  # node id -> Peer
+        self._inbox = deque()
+        self._seq = 0
+        self._sockets = []
+        self._send_socket = None
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+
+    # --- Sockets ---
+
+    def _open(self):
+        if self.peers_config:
+            # Unicast: one socket for everything, on our own port
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((self.interface, self.port))
+            self._sockets = [sock]
+            self._send_socket = sock
+            return
+        # Multicast: a shared socket joined to the group receives the broadcasts.
+        # Everything is sent from a private socket, so replies reach this node only.
+        group_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        group_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        group_socket.bind(('', self.port))
+        membership = struct.pack('4s4s', socket.inet_aton(self.group), socket.inet_aton(self.interface))
+        group_socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        send_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        send_socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, config.NETBUS_TTL)
+        send_socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        send_socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(self.interface))
+        send_socket.bind((self.interface, 0))
+        self._sockets = [group_socket, send_socket]
+        self._send_socket = send_socket
+
+    def _packet(self, kind: int, payload: bytes = b'') -> bytes:
+        with self._lock:
+            self._seq = (self._seq + 1) & 0xFFFFFFFF
+            seq = self._seq
+        return _HEADER.pack(MAGIC, VERSION, kind, self.node_id, seq, self.time()) + payload
+
+    def _broadcast(self, kind: int, payload: bytes = b''):
+        if self._send_socket is None:
+            return
+        packet = self._packet(kind, payload)
+        targets = self.peers_config or [(self.group, self.port)]
+        for address in targets:
+            try:
+                self._send_socket.sendto(packet, address)
+            except OSError as e:
+                logging.debug(f"Could not send to {address}: {e}", extra={'rate_key': ('netbus_send', address)})
+
+    # --- Publishing ---
+
+    def publish_state(self, state: str, station: int | None, served_mask: int):
+        """Tells the other domes about a controller transition."""
+        self._broadcast(MSG_STATE, _STATE.pack(STATES.index(state), -1 if station is None else station,
+                                               served_mask & 0xFFFF))
+
+    def announce_intro(self, lead_s: float | None = None) -> float:
+        """
+        Asks every waiting dome to start its intro `lead_s` from now (default:
+        NETBUS_INTRO_LEAD_MS), leaving time for the message to arrive. Returns
+        the start time on our clock.
+        """
+        if lead_s is None:
+            lead_s = config.NETBUS_INTRO_LEAD_MS / 1000.0
+        start_at = self.time() + lead_s
+        self._broadcast(MSG_INTRO, _INTRO.pack(start_at))
+        return start_at
+
+    # --- Receiving ---
+
+    def _handle(self, data: bytes, address, received_at: float):
+        if len(data) < _HEADER.size:
+            return
+        magic, version, kind, node_id, _, sent_at = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION or node_id == self.node_id:
+            return  # Not ours, or our own multicast looping back
+        payload = data[_HEADER.size:]
+        peer = self.peers.get(node_id)
+        if peer is None:
+            peer = self.peers[node_id] = Peer(node_id, address)
+            logging.info(f"Dome {node_id:08x} joined from {address[0]}:{address[1]}.")
+        peer.address = address
+        peer.last_seen = received_at
+
+        if kind == MSG_PING:
+            # Answer right away: the time spent here is measured as t2 - t1 anyway
+            reply = self._packet(MSG_PONG, _PONG.pack(sent_at, received_at))
+            try:
+                self._send_socket.sendto(reply, address)
+            except OSError:
+                pass
+        elif kind == MSG_PONG and len(payload) >= _PONG.size:
+            t0, t1 = _PONG.unpack_from(payload)
+            peer.add_sample(t0, t1, sent_at, received_at)
+        elif kind == MSG_STATE and len(payload) >= _STATE.size:
+            state, station, served_mask = _STATE.unpack_from(payload)
+            if state >= len(STATES):
+                return
+            station = None if station < 0 else station
+            started = station is not None and station != peer.station
+            peer.state = STATES[state]
+            peer.station = station
+            peer.served_mask = served_mask
+            if started:
+                self._deliver((MSG_STATE, peer))
+        elif kind == MSG_INTRO and len(payload) >= _INTRO.size:
+            start_at, = _INTRO.unpack_from(payload)
+            # Without a clock sample yet, assume the message took no time
+            offset = peer.offset if peer.offset is not None else sent_at - received_at
+            self._deliver((MSG_INTRO, start_at - offset))
+
+    def _deliver(self, message):
+        # Read by the controller between ticks: deque appends and pops are thread-safe
+        self._inbox.append(message)
+        events.notify()  # Wake the main loop
+
+    def drain(self) -> list:
+        """
+        Returns the messages received since the last call: (MSG_STATE, Peer)
+        when a peer starts a station, and (MSG_INTRO, start time on our clock).
+        """
+        messages = []
+        while self._inbox:
+            messages.append(self._inbox.popleft())
+        return messages
+
+    def _run(self):
+        next_ping = 0.0
+        while self._running:
+            now = self.time()
+            if now >= next_ping:
+                self._broadcast(MSG_PING)
+                next_ping = now + config.NETBUS_SYNC_INTERVAL_S
+            try:
+                ready, _, _ = select.select(self._sockets, [], [], max(0.0, next_ping - now))
+            except (OSError, ValueError):
+                return  # Closed by stop()
+            for sock in ready:
+                try:
+                    data, address = sock.recvfrom(512)
+                except OSError:
+                    continue
+                self._handle(data, address, self.time())
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Opens the sockets and starts the receiver thread."""
+        if self._running:
+            return
+        self._open()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="netbus", daemon=True)
+        self._thread.start()
+        where = ', '.join(f"{h}:{p}" for h, p in self.peers_config) or f"{self.group}:{self.port}"
+        logging.info(f"Dome {self.node_id:08x} on the network bus ({where}).")
+
+    def stop(self):
+        """Stops the receiver thread and closes the sockets."""
+        if not self._running:
+            return
+        self._running = False
+        for sock in self._sockets:
+            sock.close()
+        self._thread.join(timeout=2.0)
+        self._sockets = []
+        self._send_socket = None
+
+    def get_peers(self, max_age_s: float | None = None) -> list:
+        """Returns the peers heard from in the last `max_age_s` (default: three sync intervals)."""
+        if max_age_s is None:
+            max_age_s = 3 * config.NETBUS_SYNC_INTERVAL_S
+        now = self.time()
+        return [peer for peer in list(self.peers.values()) if now - peer.last_seen <= max_age_s]
+
+
+# --- The node of this process ---
+
+_node = None
+
+def _parse_peers(peers) -> list:
+    parsed = []
+    for peer in peers:
+        host, _, port = peer.rpartition(':')
+        parsed.append((host, int(port)))
+    return parsed
+
+def start():
+    """Joins the bus with the settings in config."""
+    global _node
+    if _node is not None:
+        return
+    _node = Node(node_id=config.NETBUS_NODE_ID, peers=_parse_peers(config.NETBUS_PEERS))
+    try:
+        _node.start()
+    except OSError as e:
+        logging.error(f"Could not join the network bus: {e}")
+        _node = None
+
+def stop():
+    global _node
+    if _node is not None:
+        _node.stop()
+        _node = None
+
+def is_running() -> bool:
+    return _node is not None
+
+def publish_state(state: str, station: int | None, served_mask: int):
+    if _node is not None:
+        _node.publish_state(state, station, served_mask)
+
+def announce_intro() -> float | None:
+    """Schedules a synchronized intro. Returns its start time, or None without a bus."""
+    if _node is None:
+        return None
+    return _node.announce_intro()
+
+def drain():
+    """Messages received since the last call (see Node.drain()). Cheap without a bus."""
+    if _node is None or not _node._inbox:
+        return ()
+    return _node.drain()
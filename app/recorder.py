@@ -0,0 +1,85 @@
+"""
+Records GPIO input edges (sensors and start button) to a compact binary log,
+so a real session can be replayed later with app/replay.py.
+
+File format: the 8-byte MAGIC header, then 6-byte records packed as
+'<IBB': microseconds since the previous record, pin, level. The first
+records hold the initial level of every pin. Gaps too long for 32 bits are
+split with GAP_PIN records.
+"""
+import struct
+import logging
+import threading
+
+from . import clock
+from .gpio import GPIO
+
+MAGIC = b'DOMEREC1'
+GAP_PIN = 255
+_RECORD = struct.Struct('<IBB')
+_MAX_DELTA_US = 2**32 - 1
+
+class Recorder:
+    """Appends every edge on the given input pins to a log file."""
+
+    def __init__(self, path, pins):
+        self.path = path
+        self.pins = list(pins)
+        self._file = None
+        self._last_us = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Opens the log, records the initial levels and hooks the edge callbacks."""
+        self._file = open(self.path, 'wb')
+        self._file.write(MAGIC)
+        self._last_us = int(clock.monotonic() * 1e6)
+        for pin in self.pins:
+            self._write(pin, GPIO.input(pin))
+        for pin in self.pins:
+            try:
+                # Keep the callbacks other modules already registered
+                GPIO.add_event_callback(pin, self._on_edge)
+            except RuntimeError:
+                GPIO.add_event_detect(pin, GPIO.BOTH, callback=self._on_edge)
+        logging.info(f"Recording input edges on pins {self.pins} to {self.path}")
+
+    def stop(self):
+        """Stops recording and closes the log."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _on_edge(self, pin):
+        self._write(pin, GPIO.input(pin))
+
+    def _write(self, pin, level):
+        now_us = int(clock.monotonic() * 1e6)
+        with self._lock:
+            if self._file is None:
+                return
+            delta = max(0, now_us - self._last_us)
+            while delta > _MAX_DELTA_US:
+                self._file.write(_RECORD.pack(_MAX_DELTA_US, GAP_PIN, 0))
+                delta -= _MAX_DELTA_US
+            self._file.write(_RECORD.pack(delta, pin, level))
+            self._last_us = now_us
+
+def read_log(path):
+    """
+    Yields the (timestamp_s, pin, level) records of a log, with timestamps
+    relative to the start of the recording.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a dome recording")
+        t_us = 0
+        while True:
+            chunk = f.read(_RECORD.size)
+            if len(chunk) < _RECORD.size:
+                break
+            delta, pin, level = _RECORD.unpack(chunk)
+            t_us += delta
+            if pin != GAP_PIN:
+                yield t_us / 1e6, pin, level
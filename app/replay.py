@@ -0,0 +1,171 @@
+"""
+Replays a recorded session (see app/recorder.py) through DomeController on
+the simulated GPIO and mixer backends. Time comes from a virtual clock that
+jumps from one controller tick to the next, so hours of traffic replay in
+seconds while the dwell/switch decisions stay the same.
+
+Usage:
+    python -m app.replay SESSION.bin [--track-seconds S] [--tail S] [--verbose]
+"""
+import os
+import time
+import logging
+import argparse
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import NamedTuple
+
+# The simulated backends must be chosen before the app modules are imported
+os.environ.setdefault("DOME_BACKEND", "sim")
+
+from . import clock, config, audio, sensors, motors, recorder, fake_mixer, log, stations
+from .buttons import StartButton
+from .controller import DomeController
+from .feedback_led import FeedbackLED
+from .gpio import GPIO
+
+class Transition(NamedTuple):
+    """Controller state after a tick where something changed."""
+    time: float
+    state: str
+    current_sensor: int | None
+    pending_sensor: int | None
+
+class ReplayResult(NamedTuple):
+    transitions: list
+    edges: int
+    ticks: int
+    duration: float
+
+def _snapshot(controller):
+    return (controller.state, controller.current_sensor_index, controller.pending_sensor_index)
+
+@contextmanager
+def simulated_session(track_seconds: float = fake_mixer.DEFAULT_LENGTH_S, virtual_clock=None):
+    """
+    Sets up the subsystems on the simulated backends and yields a controller.
+
+    Args:
+        track_seconds: Simulated length of every audio track.
+        virtual_clock: A clock.VirtualClock to drive the control logic with.
+            Edge callbacks then run synchronously, for deterministic replays.
+            Without one, the real clock and callback thread are used.
+    """
+    if config.BACKEND != 'sim':
+        raise RuntimeError("Simulated sessions need DOME_BACKEND=sim.")
+
+    if virtual_clock is not None:
+        clock.use(virtual_clock.monotonic)
+        GPIO.set_synchronous(True)
+    audio_dir = tempfile.TemporaryDirectory()
+    saved_audio_dir = config.AUDIO_DIR
+    try:
+        # Placeholder tracks: the simulated mixer only needs their length
+        config.AUDIO_DIR = Path(audio_dir.name)
+        for name in stations.table.audio_files + (config.INTRO_AUDIO_FILE,):
+            track = config.AUDIO_DIR / name
+            track.touch()
+            fake_mixer.set_length(track, track_seconds)
+        audio.init_mixer()
+        audio.load_audio_mappings()
+        audio.preload_audio()
+
+        GPIO.setmode(GPIO.BCM)
+        sensors.setup_sensors()
+        motors.setup_motors()
+        led = FeedbackLED()  # Not started: only its mode matters here
+        led.setup()
+        button = StartButton(config.START_BUTTON_PIN, config.BUTTON_LONG_PRESS_S)
+        button.setup()
+        yield DomeController(led=led, button=button)
+    finally:
+        audio.stop_audio()
+        motors.cleanup()
+        GPIO.cleanup()
+        GPIO.set_synchronous(False)
+        clock.reset()
+        config.AUDIO_DIR = saved_audio_dir
+        audio_dir.cleanup()
+
+def replay(path, track_seconds: float = fake_mixer.DEFAULT_LENGTH_S, tail_s: float = 5.0,
+           on_tick=None) -> ReplayResult:
+    """
+    Feeds a recorded log through a fresh controller.
+
+    Args:
+        path: The recording to replay.
+        track_seconds: Simulated length of every audio track.
+        tail_s: Seconds to keep ticking after the last edge.
+        on_tick: Optional callable(virtual_time) run after every tick.
+    """
+    virtual_clock = clock.VirtualClock()
+    with simulated_session(track_seconds, virtual_clock) as controller:
+        transitions = []
+        previous = None
+        ticks = 0
+        edges = 0
+
+        def tick():
+            nonlocal previous, ticks
+            controller.update()
+            ticks += 1
+            snapshot = _snapshot(controller)
+            if snapshot != previous:
+                transitions.append(Transition(virtual_clock.now, *snapshot))
+                previous = snapshot
+            if on_tick is not None:
+                on_tick(virtual_clock.now)
+
+        def run_until(deadline):
+            # Tick exactly when the controller asked to be woken up
+            while True:
+                timeout = controller.next_timeout()
+                if timeout is None:
+                    break
+                # At least 1 us, so float rounding can never stall the clock
+                wake = virtual_clock.now + max(timeout, 1e-6)
+                if wake >= deadline:
+                    break
+                virtual_clock.advance_to(wake)
+                tick()
+            virtual_clock.advance_to(deadline)
+
+        tick()
+        last_time = 0.0
+        for timestamp, pin, level in recorder.read_log(path):
+            run_until(timestamp)
+            GPIO.set_input(pin, level)
+            edges += 1
+            tick()
+            last_time = timestamp
+        run_until(last_time + tail_s)
+        tick()
+        return ReplayResult(transitions, edges, ticks, virtual_clock.now)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded session on simulated hardware.")
+    parser.add_argument("log", help="Recording made with `python -m app.main --record`.")
+    parser.add_argument("--track-seconds", type=float, default=fake_mixer.DEFAULT_LENGTH_S,
+                        help="Simulated length of every audio track.")
+    parser.add_argument("--tail", type=float, default=5.0,
+                        help="Seconds to keep running after the last edge.")
+    parser.add_argument("--verbose", action="store_true", help="Show the controller's log output.")
+    args = parser.parse_args()
+
+    log.setup(logging.INFO if args.verbose else logging.WARNING, event_log=False)
+
+    start = time.perf_counter()
+    result = replay(args.log, args.track_seconds, args.tail)
+    elapsed = time.perf_counter() - start
+
+    for t in result.transitions:
+        current = t.current_sensor + 1 if t.current_sensor is not None else '-'
+        pending = t.pending_sensor + 1 if t.pending_sensor is not None else '-'
+        print(f"{t.time:10.3f}s  {t.state:<8} current={current:<3} pending={pending}")
+    speedup = result.duration / elapsed if elapsed > 0 else float('inf')
+    print(f"Replayed {result.duration:.1f}s ({result.edges} edges, {result.ticks} ticks) "
+          f"in {elapsed:.2f}s ({speedup:.0f}x real time).")
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,108 @@
-import RPi.GPIO as GPIO
 import logging
+from array import array
 
-from . import config
+from . import clock, events, filters, stations
+from .gpio import GPIO
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+_sensor_pins = stations.table.sensor_pins
+_pin_to_index = {pin: i for i, pin in enumerate(_sensor_pins)}
 
-_sensor_pins = config.SENSOR_PINS
+# Bit i is set while sensor i detects something, and _edge_times[i] holds the
+# monotonic time of its last change. Both are written only from the GPIO
+# callback thread and an int rebind is atomic, so readers never need a lock.
+_raw_mask = 0
+_edge_times = [0.0] * len(_sensor_pins)
+
+# Debounce/hysteresis stage between the raw edges and the controller.
+# Only used from the main loop.
+_filter = filters.SensorFilter(len(_sensor_pins))
 
 def setup_sensors():
     """Initializes the GPIO pins for all sensors as inputs with pull-up resistors."""
+    global _raw_mask
     # The BCM mode should already be set, but we ensure it here.
     GPIO.setmode(GPIO.BCM)
     for pin in _sensor_pins:
         # We use PUD_UP because the KY-033 sensor outputs LOW when it detects an object.
         # The pull-up resistor ensures the input is HIGH when no object is detected.
         GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+
+    # Take the initial state once, then let the edge callbacks keep it current.
+    now = clock.monotonic()
+    mask = 0
+    for i, pin in enumerate(_sensor_pins):
+        if GPIO.input(pin) == GPIO.LOW:
+            mask |= 1 << i
+        _edge_times[i] = now
+    _raw_mask = mask
+    _filter.reset(mask)
+
+    for pin in _sensor_pins:
+        GPIO.add_event_detect(pin, GPIO.BOTH, callback=_on_edge)
     logging.info(f"Sensors configured on pins: {_sensor_pins}")
 
+def _on_edge(pin):
+    """GPIO callback: updates the raw bitmask and wakes up the main loop."""
+    global _raw_mask
+    index = _pin_to_index.get(pin)
+    if index is None:
+        return
+    bit = 1 << index
+    # Re-read the level: with BOTH edges the callback does not say which one fired.
+    if GPIO.input(pin) == GPIO.LOW:
+        mask = _raw_mask | bit
+    else:
+        mask = _raw_mask & ~bit
+    if mask != _raw_mask:
+        _edge_times[index] = clock.monotonic()
+        _raw_mask = mask
+        events.notify()
+
+def get_raw_mask() -> int:
+    """Returns the unfiltered bitmask of active sensors (bit i set = sensor i active)."""
+    return _raw_mask
+
+def get_active_mask() -> int:
+    """
+    Returns the filtered bitmask of active sensors (bit i set = sensor i active).
+
+    Must be called from the main loop: it advances the debounce filter.
+    """
+    return _filter.update(_raw_mask, clock.monotonic())
+
+def read_active_sensors() -> tuple[int, array]:
+    """
+    Returns every active sensor along with when each became active.
+
+    Must be called from the main loop: it advances the debounce filter.
+
+    Returns:
+        tuple: (mask, activated_at) where bit i of mask is set while sensor i
+        is active and activated_at[i] is the monotonic time of its last
+        filtered state change. activated_at is live filter state: read only.
+    """
+    return get_active_mask(), _filter.changed_at
+
+def next_timeout() -> float | None:
+    """Returns when the filter needs another sample, or None if all sensors have settled."""
+    return _filter.next_timeout(clock.monotonic())
+
+def get_edge_time(sensor_index: int) -> float:
+    """Returns the monotonic time of the last state change of a sensor."""
+    return _edge_times[sensor_index]
+
 def read_active_sensor() -> int | None:
     """
-    Scans all sensors and returns the index of the first active one.
+    Returns the index of the first active sensor.
 
-    A sensor is considered active if its pin state is LOW.
+    A sensor is considered active if its pin state is LOW, after debouncing.
+    The state is kept up to date by the edge callbacks, so this does not touch
+    the GPIO.
 
     Returns:
         int | None: The index (0-9) of the active sensor, or None if none are active.
     """
-    for i, pin in enumerate(_sensor_pins):
-        if GPIO.input(pin) == GPIO.LOW:
-            return i  # Return the index of the first active sensor found
-    return None
+    mask = get_active_mask()
+    if not mask:
+        return None
+    return (mask & -mask).bit_length() - 1  # Index of the lowest set bit
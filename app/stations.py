@@ -0,0 +1,151 @@
+"""
+The station table: one row per constellation, tying its sensor, motor and
+audio file together with its own dwell time, fade and haptic pattern.
+
+Stations are declared in stations.toml (config.STATIONS_FILE), in sensor
+order:
+
+    [[station]]
+    sensor = 4            # BCM pin of the KY-033 sensor
+    motor = 16            # BCM pin of the ULN2803A input
+    audio = "audio1.mp3"  # File in AUDIO_DIR
+    dwell_s = 3.0         # Optional, default config.DWELL_SECONDS
+    fade_ms = 500         # Optional, default config.FADE_MS
+    pattern = "pulse"     # Optional, default config.HAPTIC_PATTERN
+    priority = 0          # Optional: in multi-voice mode, higher keeps its voice
+
+The file is checked once when it is loaded. Unknown keys, bad values, pins
+used twice (including the LED and start button pins) and duplicate audio
+files are rejected with a StationError naming the station. The rows are then
+compiled into a StationTable of flat tuples, one per column, which the main
+loop indexes by station number (the 0-based sensor index).
+"""
+from pathlib import PurePath
+from typing import NamedTuple
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+from . import config
+
+# BCM numbers of the GPIO pins on the 40-pin header
+_BCM_PINS = range(2, 28)
+
+class StationError(ValueError):
+    """Raised when the station table is invalid."""
+
+class Station(NamedTuple):
+    sensor: int
+    motor: int
+    audio: str
+    dwell_s: float
+    fade_ms: int
+    pattern: str
+    priority: int
+
+class StationTable(NamedTuple):
+    """The stations, compiled into one immutable tuple per column."""
+    stations: tuple
+    sensor_pins: tuple
+    motor_pins: tuple
+    audio_files: tuple
+    dwell_s: tuple
+    fade_ms: tuple
+    patterns: tuple
+    priorities: tuple
+
+    @property
+    def count(self) -> int:
+        return len(self.stations)
+
+def _value(row: dict, where: str, name: str, kinds, default=None):
+    value = row.get(name, default)
+    if value is None:
+        raise StationError(f"{where}: '{name}' is required")
+    # TOML booleans are ints to Python: never accept them as numbers
+    if isinstance(value, bool) or not isinstance(value, kinds):
+        raise StationError(f"{where}: '{name}' has an invalid value {value!r}")
+    return value
+
+def _station(row: dict, where: str) -> Station:
+    if not isinstance(row, dict):
+        raise StationError(f"{where}: expected a table, got {row!r}")
+    unknown = set(row) - set(Station._fields)
+    if unknown:
+        raise StationError(f"{where}: unknown keys {', '.join(sorted(unknown))}")
+
+    station = Station(
+        sensor=_value(row, where, 'sensor', int),
+        motor=_value(row, where, 'motor', int),
+        audio=_value(row, where, 'audio', str),
+        dwell_s=float(_value(row, where, 'dwell_s', (int, float), config.DWELL_SECONDS)),
+        fade_ms=_value(row, where, 'fade_ms', int, config.FADE_MS),
+        pattern=_value(row, where, 'pattern', str, config.HAPTIC_PATTERN),
+        priority=_value(row, where, 'priority', int, 0),
+    )
+    for name in ('sensor', 'motor'):
+        pin = getattr(station, name)
+        if pin not in _BCM_PINS:
+            raise StationError(f"{where}: {name} pin {pin} is not a GPIO pin (BCM 2-27)")
+    if not station.audio or PurePath(station.audio).name != station.audio:
+        raise StationError(f"{where}: 'audio' must be a file name in AUDIO_DIR, got {station.audio!r}")
+    if station.dwell_s < 0:
+        raise StationError(f"{where}: 'dwell_s' cannot be negative")
+    if station.fade_ms < 0:
+        raise StationError(f"{where}: 'fade_ms' cannot be negative")
+    if station.pattern not in config.HAPTIC_PATTERNS:
+        raise StationError(f"{where}: unknown haptic pattern '{station.pattern}'. "
+                           f"Valid: {', '.join(config.HAPTIC_PATTERNS)}")
+    return station
+
+def compile_table(rows, source: str = 'stations') -> StationTable:
+    """Validates station rows (dicts as in the TOML file) and compiles them into a table."""
+    if not isinstance(rows, list) or not rows:
+        raise StationError(f"{source}: no [[station]] entries")
+
+    pins = {config.LED_PIN: 'the feedback LED', config.START_BUTTON_PIN: 'the start button'}
+    audio_files = {config.INTRO_AUDIO_FILE.lower(): 'the intro'}
+    stations = []
+    for n, row in enumerate(rows, start=1):
+        where = f"{source}: station {n}"
+        station = _station(row, where)
+        for name, pin in (('sensor', station.sensor), ('motor', station.motor)):
+            if pin in pins:
+                raise StationError(f"{where}: {name} pin {pin} is already used by {pins[pin]}")
+            pins[pin] = f"station {n} ({name})"
+        # Case-insensitive: the audio folder may be synced to a FAT partition
+        if station.audio.lower() in audio_files:
+            raise StationError(f"{where}: '{station.audio}' is already used by {audio_files[station.audio.lower()]}")
+        audio_files[station.audio.lower()] = f"station {n}"
+        stations.append(station)
+
+    return StationTable(
+        stations=tuple(stations),
+        sensor_pins=tuple(s.sensor for s in stations),
+        motor_pins=tuple(s.motor for s in stations),
+        audio_files=tuple(s.audio for s in stations),
+        dwell_s=tuple(s.dwell_s for s in stations),
+        fade_ms=tuple(s.fade_ms for s in stations),
+        patterns=tuple(s.pattern for s in stations),
+        priorities=tuple(s.priority for s in stations),
+    )
+
+def load(path=None) -> StationTable:
+    """Reads, validates and compiles the station file (default: config.STATIONS_FILE)."""
+    path = path or config.STATIONS_FILE
+    try:
+        with open(path, 'rb') as f:
+            data = tomllib.load(f)
+    except OSError as e:
+        raise StationError(f"Cannot read the station file: {e}") from None
+    except tomllib.TOMLDecodeError as e:
+        raise StationError(f"{path}: {e}") from None
+    unknown = set(data) - {'station'}
+    if unknown:
+        raise StationError(f"{path}: unknown keys {', '.join(sorted(unknown))}")
+    return compile_table(data.get('station'), str(path))
+
+# Loaded once at startup; a broken file stops the service before any pin is touched
+table = load()
@@ -0,0 +1,278 @@
+"""
+Watchdog and self-healing for the control process (python -m app.main --supervise).
+
+The main loop beats a heartbeat at the end of every iteration, before it
+blocks until its next event; a tick takes milliseconds when all is well.
+A watchdog thread checks it:
+
+- An iteration running for longer than SUPERVISOR_STALL_S is a stall. The
+  watchdog looks at where the main thread is stuck (the mixer, the LED or
+  the motors) and asks for that subsystem to be restarted once the loop
+  runs again. Each stall's duration is logged and observed in the
+  dome_stall_seconds metric.
+- The LED thread and the motor scheduler are checked too: a frame, mode
+  change or motor edge late by more than SUPERVISOR_STALL_S, or a dead
+  thread, gets that subsystem restarted.
+- Under systemd with WatchdogSec=, WATCHDOG=1 is sent (sd_notify) while the
+  loop is healthy. Past SUPERVISOR_FATAL_STALL_S it stops, so systemd kills
+  and restarts the service. Without a systemd watchdog, the process exits
+  by itself (Restart= in the unit brings it back).
+
+An exception escaping a tick is logged, blamed on a subsystem from its
+traceback, and that subsystem is restarted (the controller is reset if no
+subsystem is to blame) instead of exiting. More than
+SUPERVISOR_MAX_RESTARTS_PER_MIN in a minute is a crash loop: the exception
+is raised again and the process exits.
+
+Restarts run on the main loop, between ticks: the mixer is shut down and
+started again, the LED thread and the motor scheduler are replaced.
+"""
+import os
+import sys
+import time
+import socket
+import logging
+import threading
+from collections import deque
+
+from . import audio, config, events, log, metrics, motors, stations
+from .gpio import GPIO
+
+SUBSYSTEMS = ('mixer', 'led', 'motors')
+
+# Modules whose frames put the blame on a subsystem
+_MODULE_SUBSYSTEMS = (
+    ('app.audio', 'mixer'), ('app.mixer', 'mixer'), ('app.fake_mixer', 'mixer'), ('pygame', 'mixer'),
+    ('app.feedback_led', 'led'),
+    ('app.motors', 'motors'),
+)
+
+# --- systemd notification protocol ---
+
+def sd_notify(state: str) -> bool:
+    """Sends a state (e.g. 'READY=1') to systemd. Returns False when not run by systemd."""
+    address = os.environ.get('NOTIFY_SOCKET')
+    if not address:
+        return False
+    if address.startswith('@'):
+        address = '\0' + address[1:]  # Abstract namespace
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.sendall(state.encode())
+        return True
+    except OSError as e:
+        logging.warning(f"sd_notify failed: {e}", extra={'rate_key': 'sd_notify'})
+        return False
+
+def watchdog_interval() -> float | None:
+    """Returns systemd's watchdog timeout for this process in seconds, or None."""
+    usec = os.environ.get('WATCHDOG_USEC')
+    pid = os.environ.get('WATCHDOG_PID')
+    if not usec or (pid and int(pid) != os.getpid()):
+        return None
+    return int(usec) / 1e6
+
+def _subsystem_of(frame) -> str | None:
+    module = frame.f_globals.get('__name__', '')
+    for prefix, subsystem in _MODULE_SUBSYSTEMS:
+        if module == prefix or module.startswith(prefix + '.'):
+            return subsystem
+    return None
+
+def _blame(frames) -> str | None:
+    """Returns the subsystem of the innermost frame (first in `frames`) that belongs to one."""
+    for frame in frames:
+        subsystem = _subsystem_of(frame)
+        if subsystem is not None:
+            return subsystem
+    return None
+
+def _stack(frame):
+    """Frames of a stack, innermost first."""
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+
+def _traceback_frames(tb) -> list:
+    """Frames of a traceback, innermost (where it was raised) first."""
+    frames = []
+    while tb is not None:
+        frames.append(tb.tb_frame)
+        tb = tb.tb_next
+    return frames[::-1]
+
+class Supervisor:
+    """Runs the controller's main loop under a heartbeat watchdog."""
+
+    def __init__(self, controller, led, stall_s: float | None = None, fatal_stall_s: float | None = None):
+        self.controller = controller
+        self.led = led
+        self.stall_s = config.SUPERVISOR_STALL_S if stall_s is None else stall_s
+        self.fatal_stall_s = config.SUPERVISOR_FATAL_STALL_S if fatal_stall_s is None else fatal_stall_s
+        self.systemd_watchdog = watchdog_interval()
+        # Stall durations in seconds, most recent last, with the subsystem blamed
+        self.stalls = deque(maxlen=100)
+        self.restarts = {name: 0 for name in SUBSYSTEMS}
+        self._restarted_at = {name: float('-inf') for name in SUBSYSTEMS}
+        self._busy_since = None   # When the running iteration woke up; None while blocked
+        self._loop_thread = None  # Ident of the thread running the loop
+        self._stall_blame = None  # Set by the watchdog while the loop is stalled
+        self._requests = set()    # Subsystems to restart on the main loop
+        self._lock = threading.Lock()
+        self._recoveries = deque()  # When exceptions were recovered from
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Main loop ---
+
+    def beat(self):
+        """Marks the end of an iteration, before the loop blocks until its next event."""
+        now = time.monotonic()
+        gap = now - self._busy_since
+        self._busy_since = None
+        if gap > self.stall_s:
+            blame = self._stall_blame or 'unknown'
+            self._stall_blame = None
+            self.stalls.append((gap, blame))
+            metrics.stall_seconds.observe(gap)
+            logging.warning(f"Main loop stalled for {gap:.2f}s (in {blame}).")
+
+    def request_restart(self, subsystem: str):
+        """Asks for a subsystem to be restarted between two ticks. Thread-safe."""
+        with self._lock:
+            self._requests.add(subsystem)
+        events.notify()
+
+    def _restart_requested(self):
+        with self._lock:
+            requests, self._requests = self._requests, set()
+        for subsystem in SUBSYSTEMS:
+            if subsystem in requests:
+                self.restart(subsystem)
+
+    def restart(self, subsystem: str):
+        """Restarts one subsystem. Runs on the main loop."""
+        logging.warning(f"Restarting {subsystem}.")
+        self.restarts[subsystem] += 1
+        self._restarted_at[subsystem] = time.monotonic()
+        metrics.subsystem_restarts.inc(subsystem)
+        try:
+            if subsystem == 'mixer':
+                audio.restart_mixer()
+            elif subsystem == 'led':
+                self.led.restart()
+            elif subsystem == 'motors':
+                motors.restart_scheduler()
+        except Exception as e:
+            logging.error(f"Could not restart {subsystem}: {e}", exc_info=True)
+
+    def _recover(self, error: Exception):
+        """Handles an exception that escaped a tick, or raises it again in a crash loop."""
+        now = time.monotonic()
+        self._recoveries.append(now)
+        while self._recoveries and now - self._recoveries[0] > 60.0:
+            self._recoveries.popleft()
+        if len(self._recoveries) > config.SUPERVISOR_MAX_RESTARTS_PER_MIN:
+            logging.critical("Too many errors in the last minute; giving up.")
+            raise error
+        subsystem = _blame(_traceback_frames(error.__traceback__))
+        logging.error(f"Error in the main loop ({subsystem or 'controller'}): {error}", exc_info=error)
+        if subsystem is not None:
+            self.restart(subsystem)
+        else:
+            self.controller.reset()
+
+    def run(self):
+        """The supervised main loop. Runs until stop(), an interrupt or a crash loop."""
+        self.start()
+        try:
+            while not self._stop.is_set():
+                self._busy_since = time.monotonic()
+                if self._requests:
+                    self._restart_requested()
+                try:
+                    self.controller.update()
+                except Exception as e:
+                    self._recover(e)
+                timeout = self.controller.next_timeout()
+                self.beat()
+                # Blocking while idle is not a stall: only the iteration is timed
+                events.wait(timeout)
+        finally:
+            sd_notify('STOPPING=1')
+            self._stop.set()
+            if self._thread is not None:
+                self._thread.join(timeout=2.0)
+                self._thread = None
+
+    # --- Watchdog thread ---
+
+    def _check(self, now: float) -> bool:
+        """One watchdog check. Returns False once the stall is fatal."""
+        busy_since = self._busy_since
+        age = 0.0 if busy_since is None else now - busy_since
+        if age > self.stall_s and self._stall_blame is None:
+            frame = sys._current_frames().get(self._loop_thread)
+            self._stall_blame = _blame(_stack(frame)) or 'controller'
+            logging.warning(f"Main loop stalled for over {self.stall_s:.2f}s in {self._stall_blame}.")
+            if self._stall_blame in SUBSYSTEMS:
+                self.request_restart(self._stall_blame)
+        if age > self.fatal_stall_s:
+            return False
+        self._probe('led', self.led.get_stall_s(), now)
+        self._probe('motors', motors.get_overdue_s(), now)
+        return True
+
+    def _probe(self, subsystem: str, late_s: float, now: float):
+        """Asks for a restart of a subsystem running late, unless one was just done."""
+        if late_s <= self.stall_s or subsystem in self._requests:
+            return
+        # A restart that did not help yet: give it time before the next one
+        if now - self._restarted_at[subsystem] < 2 * self.stall_s:
+            return
+        logging.warning(f"The {subsystem} subsystem is {late_s:.1f}s late.", extra={'rate_key': ('late', subsystem)})
+        self.request_restart(subsystem)
+
+    def _watch(self):
+        interval = self.stall_s / 2
+        if self.systemd_watchdog:
+            interval = min(interval, self.systemd_watchdog / 2)
+        while not self._stop.wait(interval):
+            try:
+                healthy = self._check(time.monotonic())
+            except Exception as e:
+                # A broken probe must not take the watchdog down with it
+                logging.error(f"Watchdog check failed: {e}", exc_info=True, extra={'rate_key': 'watchdog_check'})
+                healthy = True
+            if healthy:
+                if self.systemd_watchdog:
+                    sd_notify('WATCHDOG=1')
+                continue
+            logging.critical(f"Main loop stuck for over {self.fatal_stall_s:.0f}s in {self._stall_blame}.")
+            if self.systemd_watchdog:
+                return  # No more pings: systemd restarts the service
+            # No systemd watchdog: exit, leaving the motors off, and let Restart= bring us back
+            for pin in stations.table.motor_pins:
+                try:
+                    GPIO.output(pin, GPIO.LOW)
+                except Exception:
+                    pass
+            log.shutdown()
+            os._exit(70)
+
+    def start(self):
+        """Starts the watchdog thread and tells systemd the service is ready."""
+        self._busy_since = None
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="watchdog", daemon=True)
+        self._thread.start()
+        sd_notify('READY=1')
+        mode = f"systemd watchdog {self.systemd_watchdog:.0f}s" if self.systemd_watchdog else "local watchdog"
+        logging.info(f"Supervisor running ({mode}, stall threshold {self.stall_s:.2f}s).")
+
+    def stop(self):
+        """Ends run() after the current tick. Thread-safe."""
+        self._stop.set()
+        events.notify()
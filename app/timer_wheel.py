@@ -0,0 +1,81 @@
+"""
+Hashed timer wheel for the controller's dwell timers.
+
+Timers are hashed by deadline into a fixed ring of slots, each `tick_s`
+wide, so scheduling and canceling are O(1) and expiring only visits the
+slots the clock has moved through since the last call. A deadline more than
+one turn of the ring away simply waits in its slot for a later turn.
+
+Deadlines are monotonic times (clock.monotonic()), never wall-clock times,
+so an NTP correction after boot cannot fire or stall a timer.
+"""
+import math
+
+class TimerWheel:
+    """One timer per key; scheduling a key again replaces its timer."""
+
+    def __init__(self, tick_s: float, slots: int):
+        self.tick_s = tick_s
+        self._slots = [{} for _ in range(slots)]  # key -> deadline
+        self._timers = {}  # key -> (deadline, slot)
+        self._tick = None  # Last tick visited by expire()
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __contains__(self, key) -> bool:
+        return key in self._timers
+
+    def _tick_of(self, t: float) -> int:
+        return math.floor(t / self.tick_s)
+
+    def schedule(self, key, deadline: float):
+        """Starts (or restarts) the timer of key."""
+        self.cancel(key)
+        tick = self._tick_of(deadline)
+        if self._tick is not None and tick < self._tick:
+            tick = self._tick  # Already due: the next expire() must see it
+        slot = tick % len(self._slots)
+        self._slots[slot][key] = deadline
+        self._timers[key] = (deadline, slot)
+
+    def cancel(self, key) -> bool:
+        """Stops the timer of key. Returns False if it was not running."""
+        timer = self._timers.pop(key, None)
+        if timer is None:
+            return False
+        del self._slots[timer[1]][key]
+        return True
+
+    def clear(self):
+        for slot in self._slots:
+            slot.clear()
+        self._timers.clear()
+
+    def next_deadline(self) -> float | None:
+        """Returns the earliest deadline, or None if no timer is running."""
+        # A scan of the (few) running timers: cheaper than walking empty slots
+        return min((deadline for deadline, _ in self._timers.values()), default=None)
+
+    def expire(self, now: float) -> list:
+        """Removes the timers due at `now` and returns their keys, earliest first."""
+        current = self._tick_of(now)
+        if not self._timers:
+            self._tick = current
+            return []
+        if self._tick is None or current - self._tick >= len(self._slots):
+            slots = range(len(self._slots))  # A full turn or more: visit every slot once
+        else:
+            # The last visited tick again: its later deadlines may be due by now
+            slots = (t % len(self._slots) for t in range(self._tick, current + 1))
+        due = []
+        for index in slots:
+            slot = self._slots[index]
+            for key, deadline in slot.items():
+                if deadline <= now:
+                    due.append((deadline, key))
+        self._tick = current
+        due.sort(key=lambda timer: timer[0])
+        for _, key in due:
+            self.cancel(key)
+        return [key for _, key in due]
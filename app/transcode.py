@@ -0,0 +1,338 @@
+"""
+Offline preprocessing of the audio library.
+
+Each source file is decoded once, converted to the mixer's sample rate and
+format, normalized to a common loudness (EBU R128 / ITU-R BS.1770 integrated
+loudness) and written as a WAV file to a content-addressed cache:
+
+    AUDIO_CACHE_DIR/<sha256 of source bytes + mixer settings>.wav
+
+app/audio.py plays the cached file when there is one, so nothing is resampled
+on the Pi at load time and all constellations play at the same loudness.
+The cache key changes with the content or the settings, so an unchanged file
+is never processed twice. An index maps source names to their cache entry to
+avoid re-hashing unchanged sources. The sync and the service's hot reload can
+process the same new files at once, so updates to the cache take a file lock.
+
+numpy is optional: without it files are still converted, but not normalized.
+
+Usage: python -m app.transcode [AUDIO_DIR]
+"""
+import os
+import sys
+import json
+import wave
+import math
+import fcntl
+import hashlib
+import logging
+import argparse
+import threading
+import importlib.util
+from pathlib import Path
+from contextlib import contextmanager
+
+from . import config, log
+
+# numpy is optional and slow to import, so it is loaded by _numpy() on first use
+np = None
+_HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+
+def _numpy():
+    global np
+    if np is None and _HAS_NUMPY:
+        import numpy
+        np = numpy
+    return np
+
+# Bump when the processing changes, so old cache entries are not reused
+_VERSION = 1
+_INDEX_NAME = 'index.json'
+_LOCK_NAME = 'index.lock'
+_AUDIO_SUFFIXES = {'.mp3', '.wav', '.ogg', '.flac'}
+
+_index = {}
+_index_mtime = None
+_lock = threading.Lock()
+
+# --- Cache index ---
+
+def _index_path() -> Path:
+    return config.AUDIO_CACHE_DIR / _INDEX_NAME
+
+def _stamp(path) -> tuple | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _load_index():
+    """Re-reads the index if another process (e.g. the sync) has rewritten it."""
+    global _index, _index_mtime
+    try:
+        mtime = os.stat(_index_path()).st_mtime_ns
+    except OSError:
+        _index, _index_mtime = {}, None
+        return
+    if mtime == _index_mtime:
+        return
+    try:
+        with open(_index_path()) as f:
+            _index = json.load(f)
+    except (OSError, ValueError):
+        _index = {}
+    _index_mtime = mtime
+
+def _tmp_path(name: str) -> Path:
+    """A temporary name in the cache that no other process or thread writes to."""
+    return config.AUDIO_CACHE_DIR / f"{name}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+def _save_index():
+    global _index_mtime
+    tmp = _tmp_path(_INDEX_NAME)
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(_index, f, indent=1, sort_keys=True)
+        os.replace(tmp, _index_path())
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    _index_mtime = os.stat(_index_path()).st_mtime_ns
+
+@contextmanager
+def _locked_index():
+    """
+    Holds the index against other threads and processes (the sync and the
+    service) for a read-modify-write. Yields the up-to-date index.
+    """
+    with _lock:
+        config.AUDIO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(config.AUDIO_CACHE_DIR / _LOCK_NAME, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)  # Released when the file is closed
+            _load_index()
+            yield _index
+
+def _settings() -> str:
+    return (f"v{_VERSION}/{config.MIXER_FREQUENCY}/{config.MIXER_SIZE}/{config.MIXER_CHANNELS}/"
+            f"{config.LOUDNESS_TARGET_LUFS}/{config.LOUDNESS_MAX_PEAK_DBFS}/{_HAS_NUMPY}")
+
+def cache_key(source) -> str:
+    """Content address of a source file under the current mixer settings."""
+    digest = hashlib.sha256(_settings().encode())
+    with open(source, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def lookup(source) -> str | None:
+    """
+    Returns the cached WAV for a source file, or None if it has not been
+    processed (or changed since). Cheap: no hashing, just a stat.
+    """
+    with _lock:
+        _load_index()
+        entry = _index.get(Path(source).name)
+    if entry is None or tuple(entry['stamp']) != _stamp(source) or entry['settings'] != _settings():
+        return None
+    cached = config.AUDIO_CACHE_DIR / f"{entry['key']}.wav"
+    return str(cached) if cached.is_file() else None
+
+# --- Loudness (ITU-R BS.1770) ---
+
+def _biquad_power_response(b, a, n: int):
+    """|H(f)|^2 of a biquad at the rfft bins of an n-sample block."""
+    z = np.exp(-2j * np.pi * np.fft.rfftfreq(n))
+    num = b[0] + b[1] * z + b[2] * z * z
+    den = a[0] + a[1] * z + a[2] * z * z
+    return np.abs(num / den) ** 2
+
+def _k_weighting(n: int, rate: int):
+    """Power response of the K-weighting filter (high shelf + high pass)."""
+    # High shelf: +4 dB above ~1.5 kHz (head effects)
+    gain, q, fc = 4.0, 1 / math.sqrt(2), 1500.0
+    A = 10 ** (gain / 40)
+    w0 = 2 * math.pi * fc / rate
+    alpha = math.sin(w0) / (2 * q)
+    cos = math.cos(w0)
+    shelf_b = (A * ((A + 1) + (A - 1) * cos + 2 * math.sqrt(A) * alpha),
+               -2 * A * ((A - 1) + (A + 1) * cos),
+               A * ((A + 1) + (A - 1) * cos - 2 * math.sqrt(A) * alpha))
+    shelf_a = ((A + 1) - (A - 1) * cos + 2 * math.sqrt(A) * alpha,
+               2 * ((A - 1) - (A + 1) * cos),
+               (A + 1) - (A - 1) * cos - 2 * math.sqrt(A) * alpha)
+    # High pass: RLB weighting below ~38 Hz
+    q, fc = 0.5, 38.0
+    w0 = 2 * math.pi * fc / rate
+    alpha = math.sin(w0) / (2 * q)
+    cos = math.cos(w0)
+    hp_b = ((1 + cos) / 2, -(1 + cos), (1 + cos) / 2)
+    hp_a = (1 + alpha, -2 * cos, 1 - alpha)
+    return _biquad_power_response(shelf_b, shelf_a, n) * _biquad_power_response(hp_b, hp_a, n)
+
+def integrated_loudness(samples, rate: int) -> float | None:
+    """
+    Integrated loudness in LUFS of float samples shaped (frames, channels).
+
+    The K-weighted power of each 100 ms step is computed in the frequency
+    domain (Parseval), then combined into 400 ms blocks with 75 % overlap and
+    gated at -70 LUFS and 10 LU below the ungated level. Returns None for
+    silence or clips shorter than one block.
+    """
+    _numpy()
+    hop = int(rate * 0.1)
+    steps = len(samples) // hop
+    if steps < 4:
+        return None
+    weight = _k_weighting(hop, rate)
+    # rfft keeps one side of the spectrum: count the other side too
+    weight[1:(hop + 1) // 2] *= 2
+    power = np.zeros(steps)
+    for start in range(0, steps, 256):  # Bounded memory for long tracks
+        stop = min(steps, start + 256)
+        for channel in range(samples.shape[1]):
+            frames = samples[start * hop:stop * hop, channel].reshape(stop - start, hop)
+            spectrum = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+            power[start:stop] += (spectrum * weight).sum(axis=1) / (hop * hop)
+
+    blocks = np.convolve(power, np.full(4, 0.25), mode='valid')
+    with np.errstate(divide='ignore'):
+        loudness = -0.691 + 10 * np.log10(blocks)
+    gated = blocks[loudness > -70.0]
+    if len(gated) == 0:
+        return None
+    relative = -0.691 + 10 * math.log10(gated.mean()) - 10.0
+    gated = gated[-0.691 + 10 * np.log10(gated) > relative]
+    return -0.691 + 10 * math.log10(gated.mean())
+
+# --- Transcoding ---
+
+def _decoder(init: bool):
+    """
+    Returns pygame.mixer set to the configured format, or None. With `init`,
+    starts it on the dummy audio driver (offline use, e.g. after a sync).
+    """
+    try:
+        import pygame.mixer as pg_mixer
+    except ImportError:
+        return None
+    if not pg_mixer.get_init() and init:
+        os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+        pg_mixer.init(
+            frequency=config.MIXER_FREQUENCY,
+            size=config.MIXER_SIZE,
+            channels=config.MIXER_CHANNELS,
+            buffer=config.MIXER_BUFFER
+        )
+    expected = (config.MIXER_FREQUENCY, config.MIXER_SIZE, config.MIXER_CHANNELS)
+    if pg_mixer.get_init() != expected or config.MIXER_SIZE != -16:
+        return None  # The cache only holds 16-bit PCM in the mixer's format
+    return pg_mixer
+
+def _normalize(pcm: bytes, name: str) -> bytes:
+    if _numpy() is None:
+        return pcm
+    samples = np.frombuffer(pcm, dtype='<i2').reshape(-1, config.MIXER_CHANNELS).astype(np.float32) / 32768.0
+    loudness = integrated_loudness(samples, config.MIXER_FREQUENCY)
+    if loudness is None:
+        return pcm
+    gain_db = config.LOUDNESS_TARGET_LUFS - loudness
+    peak = float(np.abs(samples).max())
+    if peak > 0:
+        # Never push the sample peak above the ceiling
+        gain_db = min(gain_db, config.LOUDNESS_MAX_PEAK_DBFS - 20 * math.log10(peak))
+    logging.info(f"{name}: {loudness:.1f} LUFS, gain {gain_db:+.1f} dB")
+    scaled = np.clip(samples * (10 ** (gain_db / 20)) * 32768.0, -32768, 32767)
+    return scaled.astype('<i2').tobytes()
+
+def _transcode(source: Path, key: str, decoder) -> Path:
+    """Writes the processed WAV to a temporary file of its own in the cache and returns its path."""
+    pcm = decoder.Sound(str(source)).get_raw()
+    pcm = _normalize(pcm, source.name)
+    tmp = _tmp_path(f"{key}.wav")
+    try:
+        with wave.open(str(tmp), 'wb') as out:
+            out.setnchannels(config.MIXER_CHANNELS)
+            out.setsampwidth(2)
+            out.setframerate(config.MIXER_FREQUENCY)
+            out.writeframes(pcm)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return tmp
+
+def ensure(source, init: bool = False) -> str | None:
+    """
+    Returns the cached WAV for a source file, processing it first if needed.
+    Returns None when it cannot be processed here (no pygame, a mixer in
+    another format, or a decode error); callers then play the source.
+    """
+    cached = lookup(source)
+    if cached is not None:
+        return cached
+    decoder = _decoder(init)
+    if decoder is None:
+        return None
+
+    source = Path(source)
+    tmp = None
+    try:
+        stamp = _stamp(source)
+        key = cache_key(source)
+        target = config.AUDIO_CACHE_DIR / f"{key}.wav"
+        if not target.is_file():
+            config.AUDIO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = _transcode(source, key, decoder)
+    except Exception as e:
+        logging.error(f"Could not transcode {source.name}: {e}")
+        return None
+
+    with _locked_index() as index:
+        if tmp is not None:
+            # Readers never see a half-written file. If another process got
+            # here first, its copy is identical and is simply replaced.
+            os.replace(tmp, target)
+        index[source.name] = {'key': key, 'stamp': list(stamp), 'settings': _settings()}
+        _save_index()
+    return str(target)
+
+def transcode_library(audio_dir=None) -> int:
+    """
+    Processes every audio file in a directory and drops cache entries that no
+    source uses any more. Returns the number of files in the cache.
+    """
+    audio_dir = Path(audio_dir or config.AUDIO_DIR)
+    if not _HAS_NUMPY:
+        logging.warning("numpy is not installed: tracks will be converted but not loudness-normalized.")
+    sources = sorted(p for p in audio_dir.iterdir()
+                     if p.suffix.lower() in _AUDIO_SUFFIXES and not p.name.startswith('.'))
+    processed = [ensure(source, init=True) for source in sources]
+    cached = {Path(p).name for p in processed if p is not None}
+
+    with _locked_index() as index:
+        names = {p.name for p in sources}
+        stale = [name for name in index if name not in names]
+        for name in stale:
+            del index[name]
+        if stale:
+            _save_index()
+        # Also keep what another process added to the index meanwhile
+        keep = cached | {f"{entry['key']}.wav" for entry in index.values() if entry['settings'] == _settings()}
+        for entry in config.AUDIO_CACHE_DIR.glob('*.wav'):
+            if entry.name not in keep:
+                entry.unlink()
+    logging.info(f"Transcode cache up to date: {len(cached)} of {len(sources)} files.")
+    return len(cached)
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalize and convert the audio files into the playback cache.")
+    parser.add_argument("audio_dir", nargs="?", default=str(config.AUDIO_DIR), help="Directory with the source files.")
+    args = parser.parse_args()
+    log.setup(event_log=False)
+    if _decoder(init=True) is None:
+        print("pygame with a 16-bit mixer is required to transcode.")
+        sys.exit(1)
+    transcode_library(args.audio_dir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Watches a directory for changes: inotify on Linux, mtime polling elsewhere.
+
+The callback runs on the watcher thread once the directory has been quiet
+for `settle_s` seconds, so a burst of changes (e.g. a sync) triggers it once.
+Hidden files (names starting with '.') are ignored.
+"""
+import os
+import sys
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+import threading
+import time
+
+# inotify constants from <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_MODIFY
+_EVENT = struct.Struct('iIII')
+
+def _snapshot(path) -> dict:
+    """Returns {name: (mtime_ns, size)} for the visible files in a directory."""
+    result = {}
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                result[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        pass
+    return result
+
+class DirectoryWatcher:
+    def __init__(self, path, on_change, settle_s: float = 1.0, poll_interval_s: float = 5.0):
+        self.path = str(path)
+        self.on_change = on_change
+        self.settle_s = settle_s
+        self.poll_interval_s = poll_interval_s
+        self._thread = None
+        self._stop = threading.Event()
+        self._fd = None
+        self._snapshot = None
+
+    def start(self):
+        """Starts watching in a background thread."""
+        self._stop.clear()
+        self._fd = self._open_inotify()
+        # Baseline taken here, like the inotify watch, so nothing after start() is missed
+        self._snapshot = _snapshot(self.path) if self._fd is None else None
+        target = self._run_inotify if self._fd is not None else self._run_polling
+        self._thread = threading.Thread(target=target, name="audio-watcher", daemon=True)
+        self._thread.start()
+        mode = "inotify" if self._fd is not None else f"polling every {self.poll_interval_s}s"
+        logging.info(f"Watching {self.path} for changes ({mode}).")
+
+    def stop(self):
+        """Stops the watcher thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _open_inotify(self):
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+            if fd < 0:
+                return None
+            if libc.inotify_add_watch(fd, os.fsencode(self.path), _WATCH_MASK) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except (OSError, AttributeError):
+            return None
+
+    def _changed_names(self, data: bytes):
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            _, _, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+            offset += _EVENT.size + length
+            yield os.fsdecode(name)
+
+    def _run_inotify(self):
+        dirty_since = None
+        while not self._stop.is_set():
+            # Wake up at least every 0.5 s to notice stop(), sooner when settling
+            timeout = 0.5 if dirty_since is None else max(0.0, dirty_since + self.settle_s - time.monotonic())
+            readable, _, _ = select.select([self._fd], [], [], min(timeout, 0.5))
+            if readable:
+                try:
+                    data = os.read(self._fd, 4096)
+                except BlockingIOError:
+                    continue
+                if any(name and not name.startswith('.') for name in self._changed_names(data)):
+                    dirty_since = time.monotonic()  # Restart the quiet period
+            elif dirty_since is not None and time.monotonic() - dirty_since >= self.settle_s:
+                dirty_since = None
+                self._notify()
+
+    def _run_polling(self):
+        previous = self._snapshot
+        dirty = False
+        while not self._stop.wait(self.settle_s if dirty else self.poll_interval_s):
+            current = _snapshot(self.path)
+            if current != previous:
+                previous = current
+                dirty = True  # Check again after the quiet period
+            elif dirty:
+                dirty = False
+                self._notify()
+
+    def _notify(self):
+        try:
+            self.on_change()
+        except Exception as e:
+            logging.error(f"Error handling changes in {self.path}: {e}", exc_info=True)
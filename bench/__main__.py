@@ -0,0 +1,110 @@
+"""
+Runs the benchmark suite against the simulated hardware and writes the
+results as JSON, so releases can be compared.
+
+Usage:
+    python -m bench [--output results.json] [--compare baseline.json] [--quick]
+
+bench/audio_latency.py needs a real pygame mixer and is run separately.
+Exits non-zero on a regression, or if startup is over its budget.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import subprocess
+
+os.environ.setdefault("DOME_BACKEND", "sim")
+
+from app import log
+from . import sensor_latency, tick_cost, trigger_latency, soak, startup, netbus_sync, stall_recovery
+
+def _revision() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _flatten(tree, prefix=""):
+    """Yields (dotted.key, value) for every number in a nested dict."""
+    for key, value in tree.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, name + ".")
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+def compare(baseline: dict, current: dict, threshold: float) -> int:
+    """Prints the relative change of every metric. Returns how many grew beyond threshold."""
+    old = dict(_flatten(baseline["results"]))
+    regressions = 0
+    print(f"{'metric':<55} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, value in _flatten(current["results"]):
+        if name not in old or not old[name]:
+            continue
+        change = (value - old[name]) / abs(old[name])
+        flag = ""
+        if change > threshold and not name.endswith(".count"):
+            flag = "  <-- regression?"
+            regressions += 1
+        print(f"{name:<55} {old[name]:>12.4g} {value:>12.4g} {change:>+8.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite on simulated hardware.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare with a previous results file.")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative increase reported as a regression (default: 0.2 = 20%%).")
+    parser.add_argument("--quick", action="store_true", help="Fewer samples and a 1-hour soak.")
+    args = parser.parse_args()
+
+    log.setup(logging.WARNING, event_log=False)
+    quick = args.quick
+    results = {}
+    for name, run in [
+        ("sensor_latency", lambda: sensor_latency.run(100 if quick else 500)),
+        ("tick_cost", lambda: tick_cost.run(2000 if quick else 20000)),
+        ("trigger_latency", lambda: trigger_latency.run(20 if quick else 100)),
+        ("soak", lambda: soak.run(1.0 if quick else 12.0)),
+        ("startup", lambda: startup.run(3 if quick else 10)),
+        ("netbus_sync", lambda: netbus_sync.run(10 if quick else 50)),
+        ("stall_recovery", lambda: stall_recovery.run(0.5 if quick else 1.0)),
+    ]:
+        print(f"Running {name}...", file=sys.stderr)
+        results[name] = run()
+
+    report = {
+        "revision": _revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if not results["startup"]["within_budget"]:
+        print("Startup is over budget (see bench/startup.py).", file=sys.stderr)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, report, args.threshold):
+            sys.exit(1)
+    if not results["startup"]["within_budget"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Compares load-to-playback latency of streamed vs. preloaded tracks.
+
+Streaming is what play_audio() did before the audio bank: parse the file with
+pygame.mixer.music.load() on every switch. Preloaded playback starts a decoded
+pygame.mixer.Sound on a reserved channel.
+
+Usage:
+    python -m bench.audio_latency [FILE ...] [--rounds N]
+
+Without files, the mapped tracks in config.AUDIO_DIR are used, or a generated
+tone if there are none. Set SDL_AUDIODRIVER=dummy to run without a sound card.
+"""
+import sys
+import math
+import time
+import wave
+import struct
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+import pygame.mixer
+
+from app import config, audio
+
+def _generate_tone(path: Path, seconds: float = 60.0):
+    """Writes a stereo 16-bit sine tone in the mixer's format."""
+    rate = config.MIXER_FREQUENCY
+    period = [int(12000 * math.sin(2 * math.pi * 440 * i / rate)) for i in range(rate // 440 * 10)]
+    frame = b"".join(struct.pack("<hh", v, v) for v in period)
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        total = int(seconds * rate)
+        w.writeframes(frame * (total // len(period)))
+
+def _wait_busy(is_busy, timeout: float = 2.0):
+    deadline = time.perf_counter() + timeout
+    while not is_busy() and time.perf_counter() < deadline:
+        pass
+
+def time_streamed(path: str) -> float:
+    start = time.perf_counter()
+    pygame.mixer.music.load(path)
+    pygame.mixer.music.play()
+    _wait_busy(pygame.mixer.music.get_busy)
+    elapsed = time.perf_counter() - start
+    pygame.mixer.music.stop()
+    return elapsed
+
+def time_preloaded(sound, channel) -> float:
+    start = time.perf_counter()
+    channel.play(sound)
+    _wait_busy(channel.get_busy)
+    elapsed = time.perf_counter() - start
+    channel.stop()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare streamed vs. preloaded playback latency.")
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    audio.init_mixer()
+    if not pygame.mixer.get_init():
+        sys.exit("Mixer not available (try SDL_AUDIODRIVER=dummy).")
+
+    files = args.files
+    if not files:
+        audio.load_audio_mappings()
+        files = [str(config.AUDIO_DIR / name) for name in audio.get_available_audio_map().values()]
+    tmp = None
+    if not files:
+        tmp = tempfile.TemporaryDirectory()
+        tone = Path(tmp.name) / "tone.wav"
+        _generate_tone(tone)
+        files = [str(tone)]
+
+    channel = pygame.mixer.Channel(0)
+    print(f"{'file':<20} {'streamed (ms)':>14} {'preloaded (ms)':>15} {'decode (ms)':>12}")
+    for path in files:
+        streamed = statistics.median(time_streamed(path) for _ in range(args.rounds))
+        start = time.perf_counter()
+        sound = pygame.mixer.Sound(path)
+        decode = time.perf_counter() - start
+        preloaded = statistics.median(time_preloaded(sound, channel) for _ in range(args.rounds))
+        print(f"{Path(path).name:<20} {streamed * 1000:>14.2f} {preloaded * 1000:>15.3f} {decode * 1000:>12.1f}")
+
+    if tmp:
+        tmp.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""Helpers shared by the benchmarks."""
+import os
+import resource
+import statistics
+
+def summarize(samples, scale: float = 1.0) -> dict:
+    """Returns count/mean/median/p99/max of samples, multiplied by scale."""
+    values = sorted(x * scale for x in samples)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values), 4),
+        "median": round(statistics.median(values), 4),
+        "p99": round(values[max(0, int(len(values) * 0.99) - 1)], 4),
+        "max": round(values[-1], 4),
+    }
+
+def rss_kb() -> int:
+    """Returns the current resident set size of this process in KiB."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        # Not Linux: fall back to the peak RSS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
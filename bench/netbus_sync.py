@@ -0,0 +1,120 @@
+"""
+Measures the network bus with several simulated domes in one process, over
+loopback, each with its own skewed clock:
+
+- clock offset error: estimated minus true offset between every two nodes
+- intro alignment: when every follower schedules a synchronized intro
+  compared to the dome where start was pressed, in true time
+- intro margin: how long before the start time the INTRO arrived (must stay
+  positive, or the lead NETBUS_INTRO_LEAD_MS is too short)
+
+Multicast on 127.0.0.1 is used, with unicast peers as a fallback.
+
+Usage:
+    python -m bench.netbus_sync [--nodes N] [--samples N] [--unicast]
+"""
+import os
+import json
+import time
+import argparse
+import itertools
+
+os.environ.setdefault("DOME_BACKEND", "sim")
+
+from app import config, netbus
+from .common import summarize
+
+_LOOPBACK = "127.0.0.1"
+_PORT = 47809
+# Clock skews of the simulated domes in seconds, as if booted at different times
+_SKEWS = (0.0, 4.25, -17.5, 123.0, -0.8)
+
+def _clock(skew: float):
+    return lambda: time.monotonic() + skew
+
+def _make_nodes(count: int, unicast: bool) -> list:
+    skews = [_SKEWS[i % len(_SKEWS)] + i // len(_SKEWS) for i in range(count)]
+    if unicast:
+        ports = [_PORT + 1 + i for i in range(count)]
+        nodes = [netbus.Node(node_id=i + 1, port=ports[i], interface=_LOOPBACK, time_source=_clock(skews[i]),
+                             peers=[(_LOOPBACK, p) for p in ports if p != ports[i]])
+                 for i in range(count)]
+    else:
+        nodes = [netbus.Node(node_id=i + 1, port=_PORT, interface=_LOOPBACK, time_source=_clock(skews[i]))
+                 for i in range(count)]
+    for node in nodes:
+        node.skew = skews[node.node_id - 1]
+    return nodes
+
+def _wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.0002)
+    return True
+
+def run(samples: int = 20, nodes: int = 3, unicast: bool = False) -> dict:
+    """Returns offset errors, intro alignment and margins in milliseconds."""
+    saved_interval = config.NETBUS_SYNC_INTERVAL_S
+    config.NETBUS_SYNC_INTERVAL_S = 0.02
+    members = _make_nodes(nodes, unicast)
+    try:
+        try:
+            for node in members:
+                node.start()
+        except OSError:
+            if unicast:
+                raise
+            # No multicast on this host's loopback
+            for node in members:
+                node.stop()
+            config.NETBUS_SYNC_INTERVAL_S = saved_interval
+            return run(samples, nodes, unicast=True)
+
+        # A few sync rounds, so every node has clock samples of every other
+        if not _wait_for(lambda: all(len(n.peers) == nodes - 1 and all(p.offset is not None for p in n.peers.values())
+                                     for n in members)):
+            raise RuntimeError("The nodes did not find each other")
+        time.sleep(10 * config.NETBUS_SYNC_INTERVAL_S)
+
+        offset_errors = []
+        for a, b in itertools.permutations(members, 2):
+            offset_errors.append(abs(a.peers[b.node_id].offset - (b.skew - a.skew)))
+
+        alignment, margins = [], []
+        lead_s = config.NETBUS_INTRO_LEAD_MS / 1000.0
+        for n in range(samples):
+            leader = members[n % nodes]
+            followers = [m for m in members if m is not leader]
+            start_at = leader.announce_intro(lead_s) - leader.skew
+            for follower in followers:
+                received = []
+                if not _wait_for(lambda: received.extend(follower.drain()) or received):
+                    raise RuntimeError("An INTRO was lost")
+                arrived = time.monotonic()
+                kind, local_start = received[0]
+                alignment.append(abs(local_start - follower.skew - start_at))
+                margins.append(start_at - arrived)
+    finally:
+        for node in members:
+            node.stop()
+        config.NETBUS_SYNC_INTERVAL_S = saved_interval
+
+    return {
+        "transport": "unicast" if unicast else "multicast",
+        "offset_error_ms": summarize(offset_errors, scale=1e3),
+        "intro_alignment_ms": summarize(alignment, scale=1e3),
+        "intro_margin_ms": summarize(margins, scale=1e3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Clock sync and intro alignment of the network bus.")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--unicast", action="store_true", help="Use unicast peers instead of multicast.")
+    args = parser.parse_args()
+    print(json.dumps(run(args.samples, args.nodes, args.unicast), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measures sensor-edge-to-wake-up latency against the simulated GPIO backend.
+
+Usage:
+    python -m bench.sensor_latency [--samples N]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import statistics
+
+os.environ.setdefault("DOME_BACKEND", "sim")
+
+from app import config, events, sensors, stations
+from app.gpio import GPIO
+from .common import summarize
+
+def measure(samples: int) -> list[float]:
+    """Toggles sensor pins and returns the edge-to-wake-up latencies in seconds."""
+    GPIO.setmode(GPIO.BCM)
+    sensors.setup_sensors()
+    latencies = []
+    edge_time = [0.0]
+
+    def drive():
+        for n in range(samples):
+            time.sleep(0.002)
+            pin = stations.table.sensor_pins[n % len(stations.table.sensor_pins)]
+            level = GPIO.LOW if GPIO.input(pin) == GPIO.HIGH else GPIO.HIGH
+            edge_time[0] = GPIO.set_input(pin, level)
+
+    events.wait(0)  # Drop any stale wake-up
+    driver = threading.Thread(target=drive, daemon=True)
+    driver.start()
+    while len(latencies) < samples:
+        if events.wait(1.0):
+            latencies.append(time.monotonic() - edge_time[0])
+        elif not driver.is_alive():
+            break
+    driver.join()
+    GPIO.cleanup()
+    return latencies
+
+def run(samples: int = 500) -> dict:
+    """Returns edge-to-wake-up latencies in milliseconds."""
+    return {"edge_to_wakeup_ms": summarize(measure(samples), scale=1e3)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--samples", type=int, default=500)
+    args = parser.parse_args()
+
+    if config.BACKEND != 'sim':
+        sys.exit("This benchmark requires DOME_BACKEND=sim.")
+
+    latencies = sorted(measure(args.samples))
+    ms = [x * 1000.0 for x in latencies]
+    print(f"samples: {len(ms)}")
+    print(f"median:  {statistics.median(ms):.3f} ms")
+    print(f"p99:     {ms[int(len(ms) * 0.99) - 1]:.3f} ms")
+    print(f"max:     {ms[-1]:.3f} ms")
+    print(f"(the previous polling loop had a worst case of {config.LOOP_DELAY_S * 1000:.0f} ms)")
+
+if __name__ == "__main__":
+    main()
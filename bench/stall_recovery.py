@@ -0,0 +1,102 @@
+"""
+Measures how the supervisor (app/supervisor.py) copes with wedged and
+failing subsystems, with the real supervised main loop running in a thread:
+
+- mixer_hang:   the mixer blocks inside play() while a visitor arrives
+- mixer_error:  play() raises out of the tick
+- led_hang:     the LED thread blocks outputting a frame
+- motor_hang:   the motor scheduler blocks outputting an edge
+
+For each one it reports the stalls the watchdog saw (duration and the
+subsystem blamed), the subsystems restarted, and whether a visitor is
+served normally afterwards (motor and audio start within a second).
+
+Usage:
+    python -m bench.stall_recovery [--hang SECONDS] [--stall SECONDS]
+"""
+import os
+import json
+import time
+import argparse
+import threading
+
+os.environ.setdefault("DOME_BACKEND", "sim")
+
+from app import config, fake_mixer, stations
+from app.gpio import GPIO
+from app.replay import simulated_session
+from app.supervisor import Supervisor
+
+def _wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+def _visit(controller, index: int, timeout: float = 1.0) -> bool:
+    """A visitor at a station. Returns True if its motor and audio started in time."""
+    motor_pin = stations.table.motor_pins[index]
+    edge = GPIO.set_input(stations.table.sensor_pins[index], GPIO.LOW)
+    served = (_wait_for(lambda: (GPIO.get_output_time(motor_pin) or 0) >= edge, timeout)
+              and _wait_for(lambda: (fake_mixer.get_last_start() or 0) >= edge, timeout))
+    GPIO.set_input(stations.table.sensor_pins[index], GPIO.HIGH)
+    _wait_for(lambda: controller.current_sensor_index is None)
+    return served
+
+def run(hang_s: float = 1.0, stall_s: float = 0.25) -> dict:
+    """Returns, per fault, the stalls seen, the restarts done and whether service recovered."""
+    motor_pin = stations.table.motor_pins[0]
+    faults = {
+        'mixer_hang': lambda controller: fake_mixer.inject_hang(hang_s),
+        'mixer_error': lambda controller: fake_mixer.inject_hang(0.0, RuntimeError("injected mixer fault")),
+        'led_hang': lambda controller: GPIO.inject_hang(config.LED_PIN, hang_s),
+        'motor_hang': lambda controller: GPIO.inject_hang(motor_pin, hang_s),
+    }
+    results = {}
+    saved_skip = config.DEBUG_SKIP_START_BUTTON
+    config.DEBUG_SKIP_START_BUTTON = True
+    try:
+        # Short tracks, so the controller is idle again soon after each visitor
+        with simulated_session(track_seconds=0.05) as controller:
+            led = controller.led
+            led.start()
+            supervisor = Supervisor(controller, led, stall_s=stall_s, fatal_stall_s=10 * hang_s)
+            loop = threading.Thread(target=supervisor.run, name="supervised-loop", daemon=True)
+            loop.start()
+            try:
+                for name, inject in faults.items():
+                    stalls = len(supervisor.stalls)
+                    restarts = dict(supervisor.restarts)
+                    started = time.monotonic()
+                    inject(controller)
+                    _visit(controller, 0, timeout=hang_s + 1.0)
+                    # Long enough for the watchdog to notice and the restart to run
+                    time.sleep(hang_s + 4 * stall_s)
+                    results[name] = {
+                        "stalls_s": [round(gap, 3) for gap, _ in list(supervisor.stalls)[stalls:]],
+                        "blamed": sorted({blame for _, blame in list(supervisor.stalls)[stalls:]}),
+                        "restarts": {k: v - restarts[k] for k, v in supervisor.restarts.items() if v != restarts[k]},
+                        "recovered": _visit(controller, 1) and _visit(controller, 0),
+                        "elapsed_s": round(time.monotonic() - started, 3),
+                    }
+            finally:
+                supervisor.stop()
+                loop.join(timeout=2.0)
+                led.stop()
+    finally:
+        config.DEBUG_SKIP_START_BUTTON = saved_skip
+
+    results["all_recovered"] = all(r["recovered"] for r in results.values())
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Stall detection and recovery of the supervised main loop.")
+    parser.add_argument("--hang", type=float, default=1.0, help="How long each injected hang lasts (s).")
+    parser.add_argument("--stall", type=float, default=0.25, help="Supervisor stall threshold (s).")
+    args = parser.parse_args()
+    print(json.dumps(run(args.hang, args.stall), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Measures cold startup against the simulated hardware: the import time of
+app.main (python -X importtime) and the time from launching the service to
+the sensors capturing edges. Both are checked against a budget, and heavy
+modules that must stay lazy (pygame, numpy, ...) must not be imported.
+
+Usage:
+    python -m bench.startup [--samples N]
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+os.environ.setdefault("DOME_BACKEND", "sim")
+
+from .common import summarize
+
+# Budgets for the median, on the development machine. A Pi 3 is roughly
+# 5-10x slower; what matters is catching a heavy import slipping back in.
+IMPORT_BUDGET_MS = 150.0
+SENSORS_READY_BUDGET_MS = 300.0
+
+# Only imported when they are actually used
+LAZY_MODULES = ("pygame", "numpy", "asyncio", "sqlite3", "http.server", "googleapiclient", "google.oauth2")
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_READY_LINE = "Sensors ready"
+
+def _env() -> dict:
+    env = dict(os.environ, DOME_BACKEND="sim", SDL_AUDIODRIVER="dummy")
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    return env
+
+def measure_imports() -> tuple[float, list[str]]:
+    """Returns the cumulative import time of app.main in seconds, and the lazy modules it imported."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True, text=True, check=True, cwd=_ROOT, env=_env(),
+    )
+    total_us = None
+    imported = set()
+    for line in out.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        imported.add(name)
+        if name == "app.main":
+            total_us = int(cumulative)
+    if total_us is None:
+        raise RuntimeError("app.main does not appear in the -X importtime output")
+    eager = [m for m in LAZY_MODULES if m in imported]
+    return total_us / 1e6, eager
+
+def measure_sensors_ready(timeout_s: float = 30.0) -> float:
+    """Launches the service and returns the seconds until it logs that the sensors are ready."""
+    start = time.monotonic()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.main"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, cwd=_ROOT, env=_env(),
+    )
+    try:
+        for line in proc.stderr:
+            if _READY_LINE in line:
+                return time.monotonic() - start
+            if time.monotonic() - start > timeout_s:
+                break
+        raise RuntimeError(f"The service did not log '{_READY_LINE}'")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(5.0)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+def run(samples: int = 5) -> dict:
+    """Returns startup times in milliseconds, and whether they fit the budgets."""
+    imports, ready = [], []
+    eager = set()
+    for _ in range(samples):
+        seconds, modules = measure_imports()
+        imports.append(seconds)
+        eager.update(modules)
+        ready.append(measure_sensors_ready())
+    result = {
+        "import_ms": summarize(imports, scale=1e3),
+        "sensors_ready_ms": summarize(ready, scale=1e3),
+        "eager_imports": sorted(eager),
+    }
+    result["within_budget"] = (
+        result["import_ms"]["median"] <= IMPORT_BUDGET_MS
+        and result["sensors_ready_ms"]["median"] <= SENSORS_READY_BUDGET_MS
+        and not eager
+    )
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args()
+
+    result = run(args.samples)
+    print(f"import app.main: {result['import_ms']['median']:.1f} ms median (budget {IMPORT_BUDGET_MS:.0f} ms)")
+    print(f"sensors ready:   {result['sensors_ready_ms']['median']:.1f} ms median (budget {SENSORS_READY_BUDGET_MS:.0f} ms)")
+    if result["eager_imports"]:
+        print(f"imported eagerly: {', '.join(result['eager_imports'])}")
+    if not result["within_budget"]:
+        sys.exit("Startup is over budget.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Measures the cost of one DomeController.update() tick in each state, on the
+simulated backends.
+
+Usage:
+    python -m bench.tick_cost [--ticks N]
+"""
+import os
+import json
+import time
+import argparse
+
+os.environ.setdefault("DOME_BACKEND", "sim")
+
+from app import clock, config, stations
+from app.gpio import GPIO
+from app.replay import simulated_session
+from .common import summarize
+
+def _time_ticks(controller, ticks: int) -> dict:
+    samples = []
+    for _ in range(ticks):
+        start = time.perf_counter()
+        controller.update()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, scale=1e6)  # microseconds
+
+def run(ticks: int = 20000) -> dict:
+    """Returns per-tick timings in microseconds, keyed by scenario."""
+    virtual_clock = clock.VirtualClock()
+    results = {}
+    with simulated_session(track_seconds=3600, virtual_clock=virtual_clock) as controller:
+        def press_button():
+            GPIO.set_input(config.START_BUTTON_PIN, GPIO.LOW)
+            controller.update()
+            virtual_clock.advance_to(virtual_clock.now + 0.2)
+            GPIO.set_input(config.START_BUTTON_PIN, GPIO.HIGH)
+            # Past the button debounce, so the release counts
+            virtual_clock.advance_to(virtual_clock.now + 0.1)
+            controller.update()
+
+        def settle():
+            # Let the sensor filter converge
+            for _ in range(50):
+                virtual_clock.advance_to(virtual_clock.now + 0.05)
+                controller.update()
+
+        results["waiting"] = _time_ticks(controller, ticks)
+        press_button()
+        results["intro"] = _time_ticks(controller, ticks)
+        press_button()
+        results["running_idle"] = _time_ticks(controller, ticks)
+
+        GPIO.set_input(stations.table.sensor_pins[0], GPIO.LOW)
+        settle()
+        results["running_playing"] = _time_ticks(controller, ticks)
+
+        # A second visitor: the arbitration policy and dwell logic now run
+        GPIO.set_input(stations.table.sensor_pins[4], GPIO.LOW)
+        settle()
+        results["running_two_visitors"] = _time_ticks(controller, ticks)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-tick cost of DomeController.update().")
+    parser.add_argument("--ticks", type=int, default=20000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.ticks), indent=2))
+
+if __name__ == "__main__":
+    main()
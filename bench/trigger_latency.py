@@ -0,0 +1,83 @@
+"""
+Measures end-to-end trigger latency on the simulated backends, with the real
+main loop running in a thread:
+
+- sensor edge -> motor output goes HIGH
+- sensor edge -> mixer starts the track (first audio sample)
+
+Both include the sensor debounce filter.
+
+Usage:
+    python -m bench.trigger_latency [--samples N]
+"""
+import os
+import json
+import time
+import argparse
+import threading
+
+os.environ.setdefault("DOME_BACKEND", "sim")
+
+from app import config, events, fake_mixer, stations
+from app.gpio import GPIO
+from app.replay import simulated_session
+from .common import summarize
+
+def _wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.0002)
+    return True
+
+def run(samples: int = 100) -> dict:
+    """Returns edge-to-motor and edge-to-audio latencies in milliseconds."""
+    to_motor = []
+    to_audio = []
+    saved_skip = config.DEBUG_SKIP_START_BUTTON
+    config.DEBUG_SKIP_START_BUTTON = True
+    try:
+        # Short tracks, so the controller is idle again soon after each visitor
+        with simulated_session(track_seconds=0.05) as controller:
+            running = True
+
+            def main_loop():
+                while running:
+                    controller.update()
+                    events.wait(controller.next_timeout())
+
+            loop = threading.Thread(target=main_loop, daemon=True)
+            loop.start()
+            for n in range(samples):
+                index = n % len(stations.table.sensor_pins)
+                motor_pin = stations.table.motor_pins[index]
+                edge = GPIO.set_input(stations.table.sensor_pins[index], GPIO.LOW)
+
+                if _wait_for(lambda: (GPIO.get_output_time(motor_pin) or 0) >= edge):
+                    to_motor.append(GPIO.get_output_time(motor_pin) - edge)
+                if _wait_for(lambda: (fake_mixer.get_last_start() or 0) >= edge):
+                    to_audio.append(fake_mixer.get_last_start() - edge)
+
+                GPIO.set_input(stations.table.sensor_pins[index], GPIO.HIGH)
+                _wait_for(lambda: controller.current_sensor_index is None)
+
+            running = False
+            events.notify()
+            loop.join()
+    finally:
+        config.DEBUG_SKIP_START_BUTTON = saved_skip
+
+    return {
+        "edge_to_motor_ms": summarize(to_motor, scale=1e3),
+        "edge_to_audio_ms": summarize(to_audio, scale=1e3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Sensor-edge-to-output latency.")
+    parser.add_argument("--samples", type=int, default=100)
+    args = parser.parse_args()
+    print(json.dumps(run(args.samples), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,14 @@
-import io
 import os
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-import RPi.GPIO as GPIO
-import sys
-from google.oauth2 import service_account
+import json
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Import the LED module from the app package
+# Import the LED and transcode modules from the app package
+from app import log, transcode
 from app.feedback_led import FeedbackLED
+from app.gpio import GPIO
 
 # Configuration
 SERVICE_ACCOUNT_FILE = '/home/admin/projects/dome/credentials.json'
@@ -15,9 +16,22 @@ FOLDER_ID = '17HaNNrEE3UAcTqOx1ByTgk_FEUhybVxI'  # e.g., '1AbCDefGhijk...'
 LOCAL_DIR = '/home/admin/projects/dome/audios'
 SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 
-os.makedirs(LOCAL_DIR, exist_ok=True)
+# Parallel downloads (each worker gets its own Drive client)
+MAX_WORKERS = 4
+# Bytes requested per HTTP range request; a partial download resumes from the last full chunk
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# State kept inside LOCAL_DIR: what was downloaded, and unfinished downloads.
+# The staging directory is on the same filesystem, so moving a finished file
+# into place is atomic and the player never sees half-written audio.
+MANIFEST_NAME = '.sync_manifest.json'
+STAGING_NAME = '.partial'
 
 def drive_service():
+    # Imported here so the fake Drive service works without the Google libraries
+    from googleapiclient.discovery import build
+    from google.oauth2 import service_account
+
     creds = service_account.Credentials.from_service_account_file(
         SERVICE_ACCOUNT_FILE, scopes=SCOPES
     )
@@ -32,7 +46,7 @@ def list_files_in_folder(svc, folder_id):
         resp = svc.files().list(
             q=q,
             spaces='drive',
-            fields='nextPageToken, files(id, name, mimeType, modifiedTime)',
+            fields='nextPageToken, files(id, name, mimeType, modifiedTime, md5Checksum, size)',
             pageToken=page_token
         ).execute()
         files.extend(resp.get('files', []))
@@ -41,38 +55,170 @@ def list_files_in_folder(svc, folder_id):
             break
     return files
 
-def download_file(svc, file_id, dest_path):
-    request = svc.files().get_media(fileId=file_id)
-    with open(dest_path, 'wb') as fh:
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
+# --- Manifest ---
+
+def _write_json_atomic(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump(data, fh, indent=2, sort_keys=True)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+def load_manifest(local_dir):
+    try:
+        with open(os.path.join(local_dir, MANIFEST_NAME)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(local_dir, manifest):
+    _write_json_atomic(os.path.join(local_dir, MANIFEST_NAME), manifest)
+
+def file_md5(path):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+def _version(remote):
+    """The fields that identify one version of a remote file."""
+    return {key: remote.get(key) for key in ('id', 'md5Checksum', 'modifiedTime', 'size')}
+
+def needs_download(remote, local_dir, manifest):
+    """Decides whether a remote file is missing or changed locally."""
+    dest = os.path.join(local_dir, remote['name'])
+    if not os.path.exists(dest):
+        return True
+    entry = manifest.get(remote['name'])
+    if entry is not None:
+        if remote.get('md5Checksum') and entry.get('md5Checksum'):
+            return remote['md5Checksum'] != entry['md5Checksum']
+        return remote.get('modifiedTime') != entry.get('modifiedTime')
+    # Downloaded before the manifest existed: compare the content itself
+    if remote.get('md5Checksum'):
+        return file_md5(dest) != remote['md5Checksum']
+    return True
+
+# --- Download ---
+
+def download_file(svc, remote, local_dir):
+    """
+    Downloads one file into the staging directory with HTTP range requests,
+    resuming a previous partial download of the same version, then moves it
+    into place atomically.
+    """
+    staging = os.path.join(local_dir, STAGING_NAME)
+    os.makedirs(staging, exist_ok=True)
+    part = os.path.join(staging, remote['id'] + '.part')
+    part_info = part + '.json'
+    dest = os.path.join(local_dir, remote['name'])
 
-def sync():
-    svc = drive_service()
-    files = list_files_in_folder(svc, FOLDER_ID)
+    # Resume only if the partial file belongs to the same remote version
+    offset = 0
+    try:
+        with open(part_info) as fh:
+            if json.load(fh) == _version(remote):
+                offset = os.path.getsize(part)
+    except (OSError, ValueError):
+        pass
+    if offset == 0:
+        _write_json_atomic(part_info, _version(remote))
+
+    size = int(remote['size']) if remote.get('size') else None
+    with open(part, 'r+b' if offset else 'wb') as fh:
+        fh.truncate(offset)
+        fh.seek(offset)
+        while size is None or offset < size:
+            request = svc.files().get_media(fileId=remote['id'])
+            request.headers['Range'] = f'bytes={offset}-{offset + CHUNK_SIZE - 1}'
+            data = request.execute()
+            if not data:
+                break
+            fh.write(data)
+            offset += len(data)
+            if size is None and len(data) < CHUNK_SIZE:
+                break
+        fh.flush()
+        os.fsync(fh.fileno())
+
+    if remote.get('md5Checksum') and file_md5(part) != remote['md5Checksum']:
+        os.remove(part)
+        os.remove(part_info)
+        raise IOError(f"Checksum mismatch for {remote['name']}")
 
-    # Local index by name for comparison
-    local_files = {f: os.path.getmtime(os.path.join(LOCAL_DIR, f)) for f in os.listdir(LOCAL_DIR)}
+    os.replace(part, dest)
+    os.remove(part_info)
 
+def sync(service_factory=drive_service, folder_id=FOLDER_ID, local_dir=LOCAL_DIR, max_workers=MAX_WORKERS):
+    """
+    Downloads the files that are new or changed on Drive, in parallel.
+
+    Returns:
+        list: Names of the files that were downloaded.
+    """
+    os.makedirs(local_dir, exist_ok=True)
+    files = list_files_in_folder(service_factory(), folder_id)
+    manifest = load_manifest(local_dir)
+
+    # Record files that are already up to date, so they are not hashed again
+    pending = []
     for f in files:
-        name = f['name']
-        file_id = f['id']
-        dest = os.path.join(LOCAL_DIR, name)
+        if needs_download(f, local_dir, manifest):
+            pending.append(f)
+        elif f['name'] not in manifest:
+            manifest[f['name']] = _version(f)
+    save_manifest(local_dir, manifest)
+
+    # Drive clients are not thread-safe: one per worker thread
+    local = threading.local()
+    manifest_lock = threading.Lock()
 
-        # If it doesn't exist locally, or if you prefer to always re-download, download it:
-        if not os.path.exists(dest):
-            print(f'Descargando: {name}')
-            download_file(svc, file_id, dest)
-        else:
-            # Optional: compare remote vs. local modification time to update
-            # You can add logic here using f['modifiedTime']
-            pass
+    def fetch(remote):
+        if not hasattr(local, 'svc'):
+            local.svc = service_factory()
+        print(f"Descargando: {remote['name']}")
+        download_file(local.svc, remote, local_dir)
+        with manifest_lock:
+            manifest[remote['name']] = _version(remote)
+            save_manifest(local_dir, manifest)
+        return remote['name']
 
-    print('Sync finalizado.')
+    downloaded = []
+    errors = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fetch, f): f for f in pending}
+        for future in as_completed(futures):
+            try:
+                downloaded.append(future.result())
+            except Exception as e:
+                errors += 1
+                print(f"Error descargando {futures[future]['name']}: {e}")
+
+    print(f'Sync finalizado. {len(downloaded)} descargados, {len(files) - len(pending)} sin cambios, {errors} errores.')
+    return downloaded
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sync the audio files from Google Drive.")
+    parser.add_argument(
+        "--fake-drive",
+        metavar="DIR",
+        help="Sync from a local directory through the fake Drive service (for testing)."
+    )
+    parser.add_argument(
+        "--no-transcode",
+        action="store_true",
+        help="Skip converting and loudness-normalizing the synced files into the playback cache."
+    )
+    args = parser.parse_args()
+    log.setup(event_log=False)
+
+    service_factory = drive_service
+    if args.fake_drive:
+        from app.fake_drive import FakeDriveService
+        service_factory = lambda: FakeDriveService(args.fake_drive)
+
     led = None
     try:
         # Initialize GPIO and the LED
@@ -83,7 +229,10 @@ if __name__ == '__main__':
         led.start()
         led.set_mode('fast_blinking')
 
-        sync()
+        sync(service_factory)
+        if not args.no_transcode:
+            # Unchanged files are already in the cache and are skipped
+            transcode.transcode_library(LOCAL_DIR)
 
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -0,0 +1,56 @@
+"""
+Shared fixtures. Everything runs on the simulated backends (DOME_BACKEND=sim),
+so the suite needs neither a Raspberry Pi nor pygame:
+
+    python -m pytest
+"""
+import os
+
+# The simulated backends must be chosen before the app modules are imported
+os.environ.setdefault("DOME_BACKEND", "sim")
+
+import pytest
+
+from app import config
+from app.clock import VirtualClock
+from app.gpio import GPIO
+from app.replay import simulated_session
+
+class Sim:
+    """A controller on the simulated backends, driven by a virtual clock."""
+
+    def __init__(self, controller, clock):
+        self.controller = controller
+        self.clock = clock
+
+    @property
+    def now(self) -> float:
+        return self.clock.now
+
+    def run_until(self, deadline: float):
+        """Ticks the controller at every deadline it asks for, up to `deadline`."""
+        while True:
+            timeout = self.controller.next_timeout()
+            if timeout is None:
+                break
+            # At least 1 us, so float rounding can never stall the clock
+            wake = self.clock.now + max(timeout, 1e-6)
+            if wake >= deadline:
+                break
+            self.clock.advance_to(wake)
+            self.controller.update()
+        self.clock.advance_to(deadline)
+        self.controller.update()
+
+    def set_input(self, pin: int, level: int):
+        GPIO.set_input(pin, level)
+        self.controller.update()
+
+@pytest.fixture
+def sim(monkeypatch):
+    """A running (intro skipped) controller with 10 s tracks, at t=0."""
+    monkeypatch.setattr(config, "DEBUG_SKIP_START_BUTTON", True)
+    clock = VirtualClock()
+    with simulated_session(track_seconds=10.0, virtual_clock=clock) as controller:
+        controller.update()
+        yield Sim(controller, clock)
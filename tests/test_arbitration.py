@@ -0,0 +1,85 @@
+"""
+The arbitration policies (app/arbitration.py) on plain bitmasks, without a
+controller.
+"""
+import pytest
+
+from app import arbitration
+from app.arbitration import EarliestArrival, LongestDwell, RoundRobin
+
+def _run(policy, steps, num_sensors: int = 4):
+    """Feeds (time, mask) steps to a policy. Returns its pick at each step."""
+    return [policy.select(mask, [0.0] * num_sensors, None, now, False) for now, mask in steps]
+
+# --- Earliest arrival ---
+
+@pytest.mark.parametrize("mask, activated_at, expected", [
+    (0b0000, [0, 0, 0, 0], None),
+    (0b0100, [0, 0, 5, 0], 2),
+    (0b1010, [0, 7, 0, 3], 3),
+    (0b1011, [4, 7, 0, 4], 0),  # A tie goes to the lowest index
+])
+def test_earliest_arrival(mask, activated_at, expected):
+    assert EarliestArrival(4).select(mask, activated_at, None, 10.0, False) == expected
+
+# --- Round robin ---
+
+@pytest.mark.parametrize("last_served, mask, current, playing, expected", [
+    (None, 0b0000, None, False, None),
+    (None, 0b1010, None, False, 1),    # Nothing served yet: from sensor 0
+    (1,    0b1010, None, False, 3),
+    (3,    0b1010, None, False, 1),    # Wraps around past the last sensor
+    (2,    0b0011, None, False, 0),
+    (1,    0b0010, None, False, 1),    # Alone: its turn again after a full turn
+    (1,    0b0011, 1,    True,  1),    # Current and playing: keeps the turn
+    (1,    0b0011, 1,    False, 0),    # Its audio ended: the next one's turn
+    (1,    0b0001, 1,    True,  0),    # Current left: the next one's turn
+])
+def test_round_robin(last_served, mask, current, playing, expected):
+    policy = RoundRobin(4)
+    if last_served is not None:
+        policy.served(last_served)
+    assert policy.select(mask, [0.0] * 4, current, 10.0, playing) == expected
+
+def test_round_robin_takes_turns():
+    policy = RoundRobin(4)
+    turns = []
+    for _ in range(5):
+        turns.append(policy.select(0b1101, [0.0] * 4, None, 0.0, False))
+        policy.served(turns[-1])
+    assert turns == [0, 2, 3, 0, 2]
+
+# --- Longest dwell ---
+
+def _ticks(start: float, stop: float, mask: int, step: float = 1.0):
+    return [(start + i * step, mask) for i in range(int((stop - start) / step))]
+
+@pytest.mark.parametrize("steps, expected", [
+    # A visitor at 0 for 20 s steps out for 2 s, while someone passes sensor 1:
+    # back at 0, they keep their priority over the newcomer
+    (_ticks(0, 20, 0b01) + _ticks(20, 22, 0b10) + [(22, 0b11)], 0),
+    # Someone stays at 1 longer than the visitor at 0 did: 1 wins
+    (_ticks(0, 5, 0b01) + _ticks(5, 20, 0b10) + [(20, 0b11)], 1),
+    # After a long absence the old score has decayed away
+    (_ticks(0, 20, 0b01) + [(200, 0b00)] + _ticks(201, 205, 0b10) + [(205, 0b11)], 1),
+])
+def test_longest_dwell(steps, expected):
+    assert _run(LongestDwell(4, window_s=30.0), steps)[-1] == expected
+
+def test_longest_dwell_forgets_decayed_scores():
+    policy = LongestDwell(4, window_s=1.0)
+    _run(policy, _ticks(0, 5, 0b0101) + [(5, 0b0001)])
+    assert policy._scored_mask == 0b0101
+    # Only sensors with a score left are walked
+    _run(policy, [(30, 0b0000)])
+    assert policy._scored_mask == 0
+    assert list(policy._scores) == [0.0] * 4
+
+# --- Factory ---
+
+def test_create_policy():
+    assert isinstance(arbitration.create_policy('round_robin', 4), RoundRobin)
+    with pytest.raises(ValueError, match="Unknown arbitration policy"):
+        arbitration.create_policy('loudest', 4)
+    with pytest.raises(TypeError):
+        arbitration.ArbitrationPolicy(4)
@@ -0,0 +1,152 @@
+"""
+The start button's gesture state machine (app/buttons.py), driven by the
+simulated GPIO on a virtual clock: edges are timestamped when they are set,
+and the button is only looked at when the test ticks it.
+"""
+import pytest
+
+from app import clock, config
+from app.buttons import StartButton
+from app.clock import VirtualClock
+from app.gpio import GPIO
+
+PIN = config.START_BUTTON_PIN
+LONG_S = 3.0
+DEBOUNCE_S = 0.03
+DOUBLE_S = 0.4
+
+class Button:
+    """A StartButton on the simulated pin, and the gestures it has reported."""
+
+    def __init__(self, virtual_clock, **params):
+        self.clock = virtual_clock
+        self.button = StartButton(PIN, LONG_S, debounce_s=DEBOUNCE_S, double_press_s=DOUBLE_S, **params)
+        self.button.setup()
+        self.gestures = []
+
+    def edge(self, t: float, pressed: bool):
+        """The button goes down (or up) at t, without a tick."""
+        self.clock.advance_to(t)
+        GPIO.set_input(PIN, GPIO.LOW if pressed else GPIO.HIGH)
+
+    def tick(self):
+        while (gesture := self.button.check_status()) is not None:
+            self.gestures.append((gesture, round(self.clock.now, 3)))
+
+    def run_until(self, deadline: float):
+        """Ticks at every deadline the button asks for, up to `deadline`."""
+        while (timeout := self.button.next_timeout()) is not None and self.clock.now + timeout < deadline:
+            self.clock.advance_to(self.clock.now + max(timeout, 1e-6))
+            self.tick()
+        self.clock.advance_to(deadline)
+        self.tick()
+
+    def kinds(self) -> list[str]:
+        return [kind for kind, _ in self.gestures]
+
+@pytest.fixture
+def make_button():
+    virtual_clock = VirtualClock(start=100.0)
+    clock.use(virtual_clock.monotonic)
+    GPIO.set_synchronous(True)
+    GPIO.cleanup(PIN)  # Released: setup() pulls it up
+    try:
+        yield lambda **params: Button(virtual_clock, **params)
+    finally:
+        GPIO.cleanup(PIN)
+        GPIO.set_synchronous(False)
+        clock.reset()
+
+def test_tap_shorter_than_a_tick(make_button):
+    b = make_button()
+    # Pressed and released between two ticks: the edges still count
+    b.edge(101.0, True)
+    b.edge(101.05, False)
+    b.run_until(102.0)
+    # Seen once the release has been stable for the debounce time
+    assert b.gestures == [('short_press', 101.05 + DEBOUNCE_S)]
+
+def test_bounce_shorter_than_debounce_is_dropped(make_button):
+    b = make_button()
+    b.edge(101.0, True)
+    b.edge(101.0 + DEBOUNCE_S / 2, False)
+    b.run_until(102.0)
+    assert b.gestures == []
+
+    # A bounce in the middle of a real press does not split it in two
+    b.edge(103.0, True)
+    b.run_until(103.5)
+    b.edge(103.5, False)
+    b.edge(103.5 + DEBOUNCE_S / 2, True)
+    b.run_until(104.0)
+    b.edge(104.0, False)
+    b.run_until(105.0)
+    assert b.kinds() == ['short_press']
+
+def test_double_press(make_button):
+    b = make_button()
+    b.edge(101.0, True)
+    b.edge(101.1, False)
+    b.run_until(101.3)
+    b.edge(101.3, True)
+    b.run_until(101.35)
+    b.edge(101.4, False)
+    b.run_until(102.0)
+    assert b.gestures == [('short_press', 101.1 + DEBOUNCE_S), ('double_press', 101.3 + DEBOUNCE_S)]
+
+def test_second_press_too_late_is_another_short_press(make_button):
+    b = make_button()
+    for start in (101.0, 101.1 + DOUBLE_S + 0.1):
+        b.edge(start, True)
+        b.edge(start + 0.1, False)
+        b.run_until(start + 0.5)
+    assert b.kinds() == ['short_press', 'short_press']
+
+def test_long_press(make_button):
+    b = make_button()
+    b.edge(101.0, True)
+    b.run_until(101.0 + LONG_S + 1.0)
+    # Reported while still held, at the threshold
+    assert b.gestures == [('long_press', 101.0 + LONG_S)]
+    b.edge(105.5, False)
+    b.run_until(106.0)
+    assert b.kinds() == ['long_press']
+
+def test_long_press_released_between_ticks(make_button):
+    b = make_button()
+    b.edge(101.0, True)
+    b.edge(101.0 + LONG_S + 0.5, False)
+    b.run_until(106.0)
+    assert b.kinds() == ['long_press']
+
+def test_long_press_right_after_a_tap(make_button):
+    b = make_button()
+    b.edge(101.0, True)
+    b.edge(101.1, False)
+    b.run_until(101.3)
+    b.edge(101.3, True)
+    b.run_until(101.3 + LONG_S + 0.5)
+    b.edge(105.0, False)
+    b.run_until(106.0)
+    assert b.kinds() == ['short_press', 'double_press', 'long_press']
+
+def test_hold_repeat(make_button):
+    b = make_button(repeat_s=0.5)
+    b.edge(101.0, True)
+    b.run_until(101.0 + LONG_S + 1.2)
+    assert b.gestures == [('long_press', 104.0), ('hold_repeat', 104.5), ('hold_repeat', 105.0)]
+
+def test_next_timeout_is_none_when_idle(make_button):
+    b = make_button()
+    assert b.button.next_timeout() is None
+    b.edge(101.0, True)
+    # Pending: the debounce, then the long-press threshold
+    assert b.button.next_timeout() == 0.0
+    b.tick()
+    assert b.button.next_timeout() == pytest.approx(DEBOUNCE_S)
+    b.run_until(101.5)
+    assert b.button.next_timeout() == pytest.approx(LONG_S - 0.5)
+    b.edge(101.5, False)
+    b.run_until(102.0)
+    assert b.kinds() == ['short_press']
+    assert b.button.next_timeout() is None
@@ -0,0 +1,41 @@
+from app import stations
+from app.gpio import GPIO
+
+def _arrive(sim, index):
+    sim.set_input(stations.table.sensor_pins[index], GPIO.LOW)
+
+def _leave(sim, index):
+    sim.set_input(stations.table.sensor_pins[index], GPIO.HIGH)
+
+def test_first_visitor_is_served_without_dwell(sim):
+    _arrive(sim, 0)
+    sim.run_until(0.5)
+    assert sim.controller.current_sensor_index == 0
+
+def test_visitor_waiting_behind_dwells_after_the_current_one_leaves(sim):
+    dwell_s = stations.table.dwell_s[1]
+    _arrive(sim, 0)
+    sim.run_until(1.0)
+    _arrive(sim, 1)
+    # Waiting far longer than the dwell time while station 0 is still in use
+    sim.run_until(1.0 + 3 * dwell_s)
+    assert sim.controller.current_sensor_index == 0
+    left = sim.now
+    _leave(sim, 0)
+    sim.run_until(left + dwell_s / 2)
+    assert sim.controller.current_sensor_index == 0
+    assert sim.controller.pending_sensor_index == 1
+    sim.run_until(left + dwell_s + 0.5)
+    assert sim.controller.current_sensor_index == 1
+
+def test_switch_canceled_when_the_visitor_leaves_before_the_dwell(sim):
+    dwell_s = stations.table.dwell_s[1]
+    _arrive(sim, 0)
+    sim.run_until(1.0)
+    _leave(sim, 0)
+    _arrive(sim, 1)
+    sim.run_until(1.0 + dwell_s / 2)
+    _leave(sim, 1)
+    sim.run_until(1.0 + 2 * dwell_s)
+    assert sim.controller.current_sensor_index == 0
+    assert sim.controller.pending_sensor_index is None
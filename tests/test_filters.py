@@ -0,0 +1,71 @@
+"""
+The sensor filter (app/filters.py) against the recorded traces in
+tests/traces/, one stage at a time and with the shipped defaults.
+"""
+from pathlib import Path
+
+import pytest
+
+from app.filters import filter_trace
+
+TRACES = Path(__file__).parent / "traces"
+
+# Each stage on its own: the others set so they pass the input straight through
+VOTE_ONLY = dict(ema_alpha=1.0, min_on_ms=0, min_off_ms=0)
+EMA_ONLY = dict(vote_window=1, vote_threshold=1, min_on_ms=0, min_off_ms=0)
+MIN_TIMES_ONLY = dict(vote_window=1, vote_threshold=1, ema_alpha=1.0)
+RAW = dict(vote_window=1, vote_threshold=1, ema_alpha=1.0, min_on_ms=0, min_off_ms=0)
+
+def _load(name: str) -> list[tuple[float, int]]:
+    """Reads a trace: '<time_s> <raw_mask>' per line, '#' lines are comments."""
+    trace = []
+    for line in (TRACES / f"{name}.txt").read_text().splitlines():
+        if not line.strip() or line.startswith("#"):
+            continue
+        timestamp, mask = line.split()
+        trace.append((float(timestamp), int(mask, 0)))
+    return trace
+
+def _changes(name: str, num_sensors: int, **params) -> list[tuple[float, int]]:
+    return [(round(t, 3), mask) for t, mask in filter_trace(_load(name), num_sensors, **params)]
+
+# --- N-of-M vote ---
+
+def test_vote_rejects_short_glitches():
+    assert len(_changes("glitches", 1, **RAW)) > 4
+    # The 1- and 2-sample glitches never reach 3 of 5; the bouncy arrival
+    # and departure give a single on and a single off
+    assert _changes("glitches", 1, **VOTE_ONLY) == [(0.37, 1), (0.84, 0)]
+
+def test_vote_alone_follows_heavy_flicker():
+    assert len(_changes("flicker", 1, **VOTE_ONLY)) > 10
+
+# --- EMA hysteresis ---
+
+def test_hysteresis_holds_through_flicker():
+    # Present about half the time: inside the default band, so it stays on
+    assert _changes("flicker", 1, **EMA_ONLY) == [(0.12, 1), (1.02, 0)]
+
+def test_narrow_band_chatters_on_flicker():
+    assert len(_changes("flicker", 1, **EMA_ONLY, ema_on=0.51, ema_off=0.5)) > 10
+
+# --- Minimum on/off times ---
+
+def test_min_times_hold_each_state():
+    # Every glitch turns it on, but for at least min_on_ms
+    assert _changes("glitches", 1, **MIN_TIMES_ONLY) == [(0.1, 1), (0.2, 0), (0.33, 1), (0.81, 0)]
+
+def test_min_times_on_short_visits():
+    # The 40 ms pass-by is held on for min_on_ms, and the visitor's 50 ms
+    # step out is held off for min_off_ms
+    assert _changes("short_visits", 2, **RAW) == [(0.1, 2), (0.14, 0), (0.2, 1), (0.6, 0), (0.65, 1), (1.0, 0)]
+    assert _changes("short_visits", 2, **MIN_TIMES_ONLY) == [(0.1, 2), (0.2, 1), (0.6, 0), (0.71, 1), (1.0, 0)]
+
+# --- Defaults ---
+
+@pytest.mark.parametrize("name, num_sensors, expected", [
+    ("glitches", 1, [(0.38, 1), (0.84, 0)]),
+    ("short_visits", 2, [(0.12, 2), (0.22, 1), (0.62, 0), (0.73, 1), (1.02, 0)]),
+])
+def test_defaults(name, num_sensors, expected):
+    assert _changes(name, num_sensors) == expected
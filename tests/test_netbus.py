@@ -0,0 +1,91 @@
+"""
+The network bus (app/netbus.py) with two nodes in this process, talking over
+loopback with unicast peers, each on its own skewed clock.
+"""
+import sys
+import time
+import socket
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from app import config, netbus
+
+LOOPBACK = "127.0.0.1"
+SKEW = 42.5  # Second node's clock minus the first's, in seconds
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind((LOOPBACK, 0))
+        return sock.getsockname()[1]
+
+def _clock(skew: float):
+    return lambda: time.monotonic() + skew
+
+def _wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+@pytest.fixture
+def nodes(monkeypatch):
+    """Two started nodes that have clock samples of each other."""
+    monkeypatch.setattr(config, 'NETBUS_SYNC_INTERVAL_S', 0.02)
+    ports = [_free_port(), _free_port()]
+    a = netbus.Node(node_id=1, port=ports[0], interface=LOOPBACK, time_source=_clock(0.0),
+                    peers=[(LOOPBACK, ports[1])])
+    b = netbus.Node(node_id=2, port=ports[1], interface=LOOPBACK, time_source=_clock(SKEW),
+                    peers=[(LOOPBACK, ports[0])])
+    a.start()
+    b.start()
+    try:
+        assert _wait_for(lambda: all(2 in a.peers and 1 in b.peers and p.offset is not None
+                                     for p in (*a.peers.values(), *b.peers.values())))
+        # A few more sync rounds, to keep the best of several samples
+        time.sleep(5 * config.NETBUS_SYNC_INTERVAL_S)
+        a.drain()
+        b.drain()
+        yield a, b
+    finally:
+        a.stop()
+        b.stop()
+
+def test_estimates_clock_offset(nodes):
+    a, b = nodes
+    assert a.peers[2].offset == pytest.approx(SKEW, abs=0.005)
+    assert b.peers[1].offset == pytest.approx(-SKEW, abs=0.005)
+    assert 0.0 <= a.peers[2].delay < 0.05
+
+def test_delivers_state_when_a_peer_starts_a_station(nodes):
+    a, b = nodes
+    a.publish_state('running', 3, 0b1000)
+    assert _wait_for(lambda: b._inbox)
+    [(kind, peer)] = b.drain()
+    assert kind == netbus.MSG_STATE
+    assert (peer.node_id, peer.state, peer.station, peer.served_mask) == (1, 'running', 3, 0b1000)
+
+    # The same station again, or none, is not a new start
+    a.publish_state('running', 3, 0b1000)
+    a.publish_state('waiting', None, 0b1000)
+    assert _wait_for(lambda: b.peers[1].station is None)
+    assert b.drain() == []
+
+def test_delivers_intro_on_the_receivers_clock(nodes):
+    a, b = nodes
+    start_at = a.announce_intro(lead_s=0.1)
+    assert _wait_for(lambda: b._inbox)
+    [(kind, b_start_at)] = b.drain()
+    assert kind == netbus.MSG_INTRO
+    # The same moment, on b's clock
+    assert b_start_at == pytest.approx(start_at + SKEW, abs=0.005)
+    assert b_start_at > b.time()
+
+def test_default_node_id_survives_restarts():
+    # A restarted dome (a new process) must come back as the same peer, not as a new one
+    restarted = subprocess.run([sys.executable, "-c", "from app import netbus; print(netbus.Node().node_id)"],
+                               cwd=Path(__file__).parents[1], capture_output=True, text=True, check=True)
+    assert int(restarted.stdout) == netbus.Node().node_id
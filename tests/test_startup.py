@@ -0,0 +1,16 @@
+"""Startup budgets of bench/startup.py, on the simulated backends."""
+import statistics
+
+from bench import startup
+
+def test_import_time_within_budget():
+    samples = []
+    for _ in range(3):
+        seconds, eager = startup.measure_imports()
+        assert eager == [], f"imported eagerly: {', '.join(eager)}"
+        samples.append(seconds * 1e3)
+    assert statistics.median(samples) <= startup.IMPORT_BUDGET_MS
+
+def test_sensors_ready_within_budget():
+    samples = [startup.measure_sensors_ready() * 1e3 for _ in range(3)]
+    assert statistics.median(samples) <= startup.SENSORS_READY_BUDGET_MS
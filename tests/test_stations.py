@@ -0,0 +1,83 @@
+"""
+Loading the station table (app/stations.py) from small stations.toml files:
+every conflict or bad value is rejected at load time.
+"""
+import pytest
+
+from app import config, stations
+from app.stations import StationError
+
+# Two valid stations; each case below appends its own rows or changes
+VALID = """
+[[station]]
+sensor = 4
+motor = 16
+audio = "audio1.mp3"
+
+[[station]]
+sensor = 5
+motor = 22
+audio = "audio2.mp3"
+dwell_s = 1.5
+fade_ms = 200
+pattern = "soft"
+priority = 2
+"""
+
+def _load(tmp_path, text: str):
+    path = tmp_path / "stations.toml"
+    path.write_text(text)
+    return stations.load(path)
+
+def _toml(value) -> str:
+    if isinstance(value, bool):
+        return str(value).lower()
+    return f'"{value}"' if isinstance(value, str) else str(value)
+
+def _row(**fields) -> str:
+    """A third [[station]] row."""
+    return "\n[[station]]\n" + "".join(f"{key} = {_toml(value)}\n" for key, value in fields.items())
+
+def test_valid_table(tmp_path):
+    table = _load(tmp_path, VALID)
+    assert table.count == 2
+    assert table.sensor_pins == (4, 5)
+    assert table.motor_pins == (16, 22)
+    assert table.audio_files == ("audio1.mp3", "audio2.mp3")
+    # Omitted settings come from config
+    assert table.dwell_s == (config.DWELL_SECONDS, 1.5)
+    assert table.fade_ms == (config.FADE_MS, 200)
+    assert table.patterns == (config.HAPTIC_PATTERN, "soft")
+    assert table.priorities == (0, 2)
+
+@pytest.mark.parametrize("extra, message", [
+    (_row(sensor=4, motor=17, audio="a.mp3"), "station 3: sensor pin 4 is already used by station 1 (sensor)"),
+    (_row(sensor=16, motor=17, audio="a.mp3"), "sensor pin 16 is already used by station 1 (motor)"),
+    (_row(sensor=13, motor=13, audio="a.mp3"), "motor pin 13 is already used by station 3 (sensor)"),
+    (_row(sensor=config.LED_PIN, motor=17, audio="a.mp3"), "is already used by the feedback LED"),
+    (_row(sensor=13, motor=config.START_BUTTON_PIN, audio="a.mp3"), "is already used by the start button"),
+    (_row(sensor=13, motor=17, audio="audio1.mp3"), "'audio1.mp3' is already used by station 1"),
+    (_row(sensor=13, motor=17, audio="AUDIO2.MP3"), "is already used by station 2"),
+    (_row(sensor=13, motor=17, audio=config.INTRO_AUDIO_FILE), "is already used by the intro"),
+    (_row(sensor=13, motor=17, audio="a.mp3", volume=3), "unknown keys volume"),
+    (_row(sensor=13, motor=17, audio="a.mp3", pattern="wobble"), "unknown haptic pattern 'wobble'"),
+    (_row(sensor=28, motor=17, audio="a.mp3"), "sensor pin 28 is not a GPIO pin"),
+    (_row(sensor=13, motor=1, audio="a.mp3"), "motor pin 1 is not a GPIO pin"),
+    (_row(sensor=13, audio="a.mp3"), "'motor' is required"),
+    (_row(sensor=13, motor=17, audio="a.mp3", dwell_s=True), "'dwell_s' has an invalid value True"),
+    (_row(sensor=13, motor=17, audio="a.mp3", fade_ms=-1), "'fade_ms' cannot be negative"),
+    (_row(sensor=13, motor=17, audio="sub/a.mp3"), "'audio' must be a file name"),
+    ("\n[settings]\nvolume = 3\n", "unknown keys settings"),
+])
+def test_rejects(tmp_path, extra, message):
+    with pytest.raises(StationError) as error:
+        _load(tmp_path, VALID + extra)
+    assert message in str(error.value)
+
+def test_rejects_empty_and_broken_files(tmp_path):
+    with pytest.raises(StationError, match="no \\[\\[station\\]\\] entries"):
+        _load(tmp_path, "")
+    with pytest.raises(StationError):
+        _load(tmp_path, "[[station]\n")
+    with pytest.raises(StationError, match="Cannot read the station file"):
+        stations.load(tmp_path / "missing.toml")
@@ -0,0 +1,128 @@
+import time
+import threading
+
+import pytest
+
+from app import audio, config, fake_mixer, metrics, motors
+from app.supervisor import Supervisor
+
+class _StubLED:
+    def __init__(self, stall_s=0.0):
+        self.stall_s = stall_s
+
+    def get_stall_s(self):
+        return self.stall_s
+
+class _StubController:
+    def __init__(self):
+        self.resets = 0
+
+    def reset(self):
+        self.resets += 1
+
+def _stuck_loop(target):
+    """Runs `target` on a thread standing in for the main loop. Returns the thread."""
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    time.sleep(0.05)  # Let it get stuck
+    return thread
+
+def _watching(supervisor, thread):
+    supervisor._loop_thread = thread.ident
+    supervisor._busy_since = time.monotonic() - 2 * supervisor.stall_s
+
+def test_check_blames_the_mixer(sim):
+    supervisor = Supervisor(sim.controller, _StubLED(), stall_s=0.1)
+    fake_mixer.inject_hang(0.5)
+    thread = _stuck_loop(lambda: audio.play_audio(0))
+    _watching(supervisor, thread)
+    assert supervisor._check(time.monotonic())
+    thread.join()
+    assert supervisor._stall_blame == 'mixer'
+    assert supervisor._requests == {'mixer'}
+    supervisor.beat()
+    assert supervisor.stalls[-1][1] == 'mixer'
+
+def test_check_blames_the_controller_outside_a_subsystem():
+    supervisor = Supervisor(_StubController(), _StubLED(), stall_s=0.1)
+    thread = _stuck_loop(lambda: time.sleep(0.3))
+    _watching(supervisor, thread)
+    assert supervisor._check(time.monotonic())
+    thread.join()
+    assert supervisor._stall_blame == 'controller'
+    assert supervisor._requests == set()
+
+def test_check_gives_up_past_the_fatal_stall():
+    supervisor = Supervisor(_StubController(), _StubLED(), stall_s=0.1, fatal_stall_s=0.15)
+    thread = _stuck_loop(lambda: time.sleep(0.3))
+    _watching(supervisor, thread)
+    assert not supervisor._check(time.monotonic())
+    thread.join()
+
+def test_check_restarts_a_late_led():
+    supervisor = Supervisor(_StubController(), _StubLED(stall_s=1.0), stall_s=0.1)
+    assert supervisor._check(time.monotonic())
+    assert supervisor._requests == {'led'}
+
+@pytest.mark.parametrize("subsystem", ['mixer', 'led', 'motors'])
+def test_restart(sim, subsystem):
+    led = sim.controller.led
+    supervisor = Supervisor(sim.controller, led, stall_s=0.1)
+    generation, scheduler = audio._generation, motors._scheduler
+    supervisor.request_restart(subsystem)
+    supervisor._restart_requested()
+    try:
+        assert supervisor.restarts == {name: int(name == subsystem) for name in supervisor.restarts}
+        assert f'dome_subsystem_restarts_total{{subsystem="{subsystem}"}}' in metrics.render()
+        if subsystem == 'mixer':
+            assert audio._generation == generation + 1
+            assert audio._is_initialized
+        elif subsystem == 'led':
+            assert led._thread.is_alive()
+        else:
+            assert motors._scheduler is not scheduler and motors._scheduler.is_alive()
+    finally:
+        led.stop()
+        for thread in threading.enumerate():
+            if thread.name == "audio-preload":
+                thread.join()
+
+def _raise_from_mixer():
+    fake_mixer.inject_hang(0.0, RuntimeError("mixer fault"))
+    fake_mixer._maybe_hang()
+
+def _error(raiser):
+    try:
+        raiser()
+    except RuntimeError as e:
+        return e
+
+def test_recover_restarts_the_subsystem_it_came_from(monkeypatch):
+    supervisor = Supervisor(_StubController(), _StubLED())
+    restarted = []
+    monkeypatch.setattr(supervisor, 'restart', restarted.append)
+    supervisor._recover(_error(_raise_from_mixer))
+    assert restarted == ['mixer']
+    assert supervisor.controller.resets == 0
+
+def test_recover_resets_the_controller_otherwise():
+    def fail():
+        raise RuntimeError("controller fault")
+
+    supervisor = Supervisor(_StubController(), _StubLED())
+    supervisor._recover(_error(fail))
+    assert supervisor.controller.resets == 1
+
+def test_recover_gives_up_in_a_crash_loop(monkeypatch):
+    def fail():
+        raise RuntimeError("controller fault")
+
+    monkeypatch.setattr(config, 'SUPERVISOR_MAX_RESTARTS_PER_MIN', 2)
+    supervisor = Supervisor(_StubController(), _StubLED())
+    for _ in range(2):
+        supervisor._recover(_error(fail))
+    error = _error(fail)
+    with pytest.raises(RuntimeError) as raised:
+        supervisor._recover(error)
+    assert raised.value is error
+    assert supervisor.controller.resets == 2
@@ -0,0 +1,94 @@
+"""
+The Drive sync (sync_drive_audios.py) against the fake Drive service:
+resuming through .partial/, rejecting a bad checksum and skipping files
+the manifest says are unchanged.
+"""
+import os
+
+import pytest
+
+import sync_drive_audios as sync_drive
+from app.fake_drive import FakeDriveService
+
+SIZE = 5000
+CHUNK = 1000
+
+@pytest.fixture
+def drive(tmp_path, monkeypatch):
+    """A Drive folder with two audio files, and an empty local directory."""
+    monkeypatch.setattr(sync_drive, 'CHUNK_SIZE', CHUNK)
+    remote_dir = tmp_path / "drive"
+    remote_dir.mkdir()
+    for i, name in enumerate(("a.mp3", "b.wav")):
+        (remote_dir / name).write_bytes(bytes((i + n) % 251 for n in range(SIZE)))
+    return remote_dir, tmp_path / "audios"
+
+def _sync(service, local_dir):
+    return sorted(sync_drive.sync(lambda: service, folder_id='folder', local_dir=str(local_dir), max_workers=1))
+
+def _staged(local_dir):
+    return os.listdir(local_dir / sync_drive.STAGING_NAME)
+
+def test_downloads_everything(drive):
+    remote_dir, local_dir = drive
+    assert _sync(FakeDriveService(remote_dir), local_dir) == ["a.mp3", "b.wav"]
+    for name in ("a.mp3", "b.wav"):
+        assert (local_dir / name).read_bytes() == (remote_dir / name).read_bytes()
+    assert _staged(local_dir) == []
+
+def test_resumes_from_partial(drive):
+    remote_dir, local_dir = drive
+    # Breaks in the middle of the first file: two chunks make it to .partial/
+    broken = FakeDriveService(remote_dir, fail_after_bytes=2 * CHUNK + CHUNK // 2)
+    assert _sync(broken, local_dir) == []
+    assert not (local_dir / "a.mp3").exists()
+    part = local_dir / sync_drive.STAGING_NAME / f"{broken.entries()[0]['id']}.part"
+    assert part.stat().st_size == 2 * CHUNK
+
+    service = FakeDriveService(remote_dir)
+    assert _sync(service, local_dir) == ["a.mp3", "b.wav"]
+    # Only the rest of the first file is fetched again, the second one in full
+    assert service.bytes_served == 2 * SIZE - 2 * CHUNK
+    assert (local_dir / "a.mp3").read_bytes() == (remote_dir / "a.mp3").read_bytes()
+    assert _staged(local_dir) == []
+
+def test_partial_of_another_version_is_discarded(drive):
+    remote_dir, local_dir = drive
+    broken = FakeDriveService(remote_dir, fail_after_bytes=2 * CHUNK + CHUNK // 2)
+    _sync(broken, local_dir)
+    (remote_dir / "a.mp3").write_bytes(b"x" * SIZE)
+
+    service = FakeDriveService(remote_dir)
+    assert _sync(service, local_dir) == ["a.mp3", "b.wav"]
+    assert service.bytes_served == 2 * SIZE
+    assert (local_dir / "a.mp3").read_bytes() == b"x" * SIZE
+
+def test_rejects_checksum_mismatch(drive):
+    remote_dir, local_dir = drive
+    service = FakeDriveService(remote_dir)
+    remote = dict(service.entries()[0], md5Checksum="0" * 32)
+    os.makedirs(local_dir)
+    with pytest.raises(IOError, match="Checksum mismatch"):
+        sync_drive.download_file(service, remote, str(local_dir))
+    assert not (local_dir / remote['name']).exists()
+    assert _staged(local_dir) == []
+
+def test_skips_files_unchanged_in_manifest(drive, monkeypatch):
+    remote_dir, local_dir = drive
+    _sync(FakeDriveService(remote_dir), local_dir)
+    # A manifest hit must not even hash the local file
+    monkeypatch.setattr(sync_drive, 'file_md5', lambda path: pytest.fail(f"hashed {path}"))
+
+    service = FakeDriveService(remote_dir)
+    assert _sync(service, local_dir) == []
+    assert service.bytes_served == 0
+
+def test_downloads_files_changed_since_manifest(drive):
+    remote_dir, local_dir = drive
+    _sync(FakeDriveService(remote_dir), local_dir)
+    (remote_dir / "b.wav").write_bytes(b"y" * SIZE)
+
+    service = FakeDriveService(remote_dir)
+    assert _sync(service, local_dir) == ["b.wav"]
+    assert service.bytes_served == SIZE
+    assert (local_dir / "b.wav").read_bytes() == b"y" * SIZE
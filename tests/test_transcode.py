@@ -0,0 +1,67 @@
+"""
+The transcode cache (app/transcode.py) when several processes fill it at
+once, as the sync and the service's hot reload do after new files arrive.
+"""
+import os
+import wave
+import threading
+import multiprocessing
+
+import pytest
+
+from app import config, transcode
+
+TRACKS = 4
+
+class _Sound:
+    def __init__(self, path):
+        with wave.open(path, 'rb') as f:
+            self._pcm = f.readframes(f.getnframes())
+
+    def get_raw(self) -> bytes:
+        return self._pcm
+
+class _Decoder:
+    """Stands in for pygame.mixer: the sources are already in the mixer's format."""
+    Sound = _Sound
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    audio_dir = tmp_path / "audios"
+    audio_dir.mkdir()
+    for n in range(TRACKS):
+        with wave.open(str(audio_dir / f"{n}.wav"), 'wb') as f:
+            f.setnchannels(config.MIXER_CHANNELS)
+            f.setsampwidth(2)
+            f.setframerate(config.MIXER_FREQUENCY)
+            f.writeframes(bytes((n + i) % 256 for i in range(config.MIXER_FREQUENCY)))
+    monkeypatch.setattr(config, 'AUDIO_CACHE_DIR', tmp_path / "cache")
+    monkeypatch.setattr(transcode, '_decoder', lambda init: _Decoder)
+    return audio_dir
+
+def _transcode_library(audio_dir):
+    transcode.transcode_library(audio_dir)
+
+def test_concurrent_processes_share_the_cache(library):
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_transcode_library, args=(library,)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+    assert [worker.exitcode for worker in workers] == [0] * len(workers)
+
+    cached = {transcode.lookup(library / f"{n}.wav") for n in range(TRACKS)}
+    assert None not in cached and len(cached) == TRACKS
+    assert sorted(os.listdir(config.AUDIO_CACHE_DIR)) == sorted(
+        [os.path.basename(path) for path in cached] + ['index.json', 'index.lock'])
+
+def test_concurrent_threads_share_the_cache(library):
+    threads = [threading.Thread(target=transcode.ensure, args=(library / f"{n % TRACKS}.wav",))
+               for n in range(2 * TRACKS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(transcode.lookup(library / f"{n}.wav") for n in range(TRACKS))
+    assert not list(config.AUDIO_CACHE_DIR.glob('*.tmp'))